@@ -0,0 +1,106 @@
+# api/access.py
+from functools import cached_property
+
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import FamilyLink, Memory
+
+
+# ------------- roles ------------- #
+def is_patient(user):
+    return getattr(user, "role", "patient") == "patient"
+
+def is_family(user):
+    return getattr(user, "role", "family") == "family"
+
+
+# ------------- cross-request cache ------------- #
+def _linked_patients_key(user_id):
+    return f"access:linked_patients:{user_id}"
+
+def invalidate_access(user_id):
+    """Forget the cached patient ids for a family user (call whenever their links change)"""
+    cache.delete(_linked_patients_key(user_id))
+
+
+class MemoryAccess:
+    """
+    Resolves which patients' memories a user may read and write.
+
+    Patients read/write their own memories; family users read/write the memories of
+    patients they have an APPROVED FamilyLink to. The linked patient ids are cached
+    across requests (invalidated by the FamilyLink signals in models.py and when a
+    connect code is redeemed) and memoised on the request by get_access().
+    """
+
+    def __init__(self, user):
+        self.user = user
+        if is_patient(user):
+            self.role = "patient"
+        elif is_family(user):
+            self.role = "family"
+        else:
+            self.role = None
+
+    @property
+    def has_role(self):
+        return self.role is not None
+
+    @cached_property
+    def linked_patient_ids(self):
+        key = _linked_patients_key(self.user.pk)
+        ids = cache.get(key)
+        if ids is None:
+            ids = list(
+                FamilyLink.objects.filter(family_member=self.user, status="APPROVED")
+                .values_list("patient_id", flat=True)
+            )
+            cache.set(key, ids, getattr(settings, "ACCESS_CACHE_TIMEOUT", 300))
+        return frozenset(ids)
+
+    @cached_property
+    def readable_patient_ids(self):
+        if self.role == "patient":
+            return frozenset([self.user.pk])
+        if self.role == "family":
+            return self.linked_patient_ids
+        return frozenset()
+
+    @property
+    def writable_patient_ids(self):
+        # Anyone who can see a patient's memories may also edit them today
+        return self.readable_patient_ids
+
+    def can_read(self, patient_id):
+        return self._coerce(patient_id) in self.readable_patient_ids
+
+    def can_write(self, patient_id):
+        return self._coerce(patient_id) in self.writable_patient_ids
+
+    def memories(self, queryset=None):
+        """Memories this user may read, as a queryset (no extra query for the scope itself)"""
+        queryset = Memory.objects.all() if queryset is None else queryset
+        ids = self.readable_patient_ids
+        if not ids:
+            return queryset.none()
+        if len(ids) == 1:
+            return queryset.filter(user_id=next(iter(ids)))
+        return queryset.filter(user_id__in=sorted(ids))
+
+    @staticmethod
+    def _coerce(patient_id):
+        try:
+            return int(patient_id)
+        except (TypeError, ValueError):
+            return None
+
+
+def get_access(request):
+    """The MemoryAccess for the request's user, built once per request"""
+    http_request = getattr(request, "_request", request)
+    access = getattr(http_request, "_memory_access", None)
+    if access is None or access.user != request.user:
+        access = MemoryAccess(request.user)
+        http_request._memory_access = access
+    return access
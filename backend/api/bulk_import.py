@@ -0,0 +1,147 @@
+# api/bulk_import.py
+"""
+Bulk memory import (POST /api/memories/import/ and `manage.py import_memories`).
+
+Rows arrive as NDJSON (one JSON object per line) or CSV (header row). They are read as a
+stream and validated one at a time by a single MemoryImportSerializer, whose fields are
+built once and reused, like ListSerializer does for its child. Every
+settings.IMPORT_BATCH_SIZE valid rows are inserted in one transaction: one bulk_create
+each for memories, tags, people and member links. A failing row is reported and skipped;
+the rest of the import carries on.
+
+Row fields: title and date (required), description, location, tag, image_url, tags,
+people and members. In NDJSON, tags and people are lists of names or objects
+({"tag_name", "color"} / {"name", "relation", "avatar_url"}) and members is a list of the
+patient's family member names. In CSV, these three are ";"-separated, with people written
+as "Name" or "Name:Relation".
+
+bulk_create sends no signals, so each batch does the signal bookkeeping itself. The
+counter columns are set on insert, and the timeline version and the batch's search
+documents are written in the same transaction.
+"""
+import csv
+import json
+
+from django.conf import settings
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+from rest_framework.serializers import as_serializer_error
+
+from .models import FamilyMember, Memory, MemoryPerson, MemoryTag, TimelineVersion
+from .search import reindex_memories
+from .serializers import MemoryImportSerializer
+
+LIST_SEPARATOR = ";"
+LIST_FIELDS = ("tags", "people", "members")
+
+
+def ndjson_rows(lines):
+    """(line number, row) per non-blank line of NDJSON; row is None for invalid JSON"""
+    for number, line in enumerate(lines, start=1):
+        line = _text(line).strip()
+        if not line:
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield number, row if isinstance(row, dict) else None
+
+
+def csv_rows(lines):
+    """(line number, row) per CSV record, list fields split on LIST_SEPARATOR"""
+    reader = csv.DictReader(_text(line) for line in lines)
+    for row in reader:
+        row = {key.strip(): value for key, value in row.items() if key and value not in (None, "")}
+        for field in LIST_FIELDS:
+            if field in row:
+                row[field] = [item.strip() for item in row[field].split(LIST_SEPARATOR) if item.strip()]
+        if "people" in row:
+            row["people"] = [dict(zip(("name", "relation"), item.split(":", 1))) for item in row["people"]]
+        yield reader.line_num, row
+
+
+def _text(line):
+    return line.decode("utf-8-sig") if isinstance(line, bytes) else line
+
+
+def import_memories(patient, rows, batch_size=None):
+    """
+    Import (line number, row) pairs as memories of `patient`.
+    Returns {"created": n, "failed": n, "errors": [{"line": n, "errors": {...}}]}.
+    """
+    batch_size = batch_size or settings.IMPORT_BATCH_SIZE
+    members = dict(FamilyMember.objects.filter(user=patient).values_list("name", "pk"))
+    serializer = MemoryImportSerializer()
+    report = {"created": 0, "failed": 0, "errors": []}
+    batch = []
+    for number, row in rows:
+        data, errors = _validate(serializer, row, members)
+        if errors:
+            report["failed"] += 1
+            report["errors"].append({"line": number, "errors": errors})
+            continue
+        batch.append(data)
+        if len(batch) >= batch_size:
+            report["created"] += _insert(patient, batch, members)
+            batch = []
+    if batch:
+        report["created"] += _insert(patient, batch, members)
+    return report
+
+
+def _validate(serializer, row, members):
+    """(validated data, None) or (None, errors) for one row"""
+    if row is None:
+        return None, {"non_field_errors": ["Row is not a JSON object"]}
+    row = dict(row)
+    if isinstance(row.get("tags"), list):
+        row["tags"] = [{"tag_name": tag} if isinstance(tag, str) else tag for tag in row["tags"]]
+    if isinstance(row.get("people"), list):
+        row["people"] = [{"name": person} if isinstance(person, str) else person for person in row["people"]]
+    try:
+        data = serializer.run_validation(row)
+    except ValidationError as exc:
+        return None, as_serializer_error(exc)
+    unknown = [name for name in data.get("members", []) if name not in members]
+    if unknown:
+        return None, {"members": [f"Unknown family member: {name}" for name in unknown]}
+    return data, None
+
+
+def _insert(patient, batch, members):
+    """Insert one batch of validated rows; returns the number of memories created"""
+    rows = []
+    for data in batch:
+        data = dict(data)
+        # The same name twice in a row would violate unique_together: the first one wins
+        tags = _unique(data.pop("tags", []), "tag_name")
+        people = _unique(data.pop("people", []), "name")
+        member_ids = list(dict.fromkeys(members[name] for name in data.pop("members", [])))
+        memory = Memory(user=patient, tags_count=len(tags), people_count=len(people), **data)
+        rows.append((memory, tags, people, member_ids))
+
+    Through = Memory.members.through
+    with transaction.atomic():
+        memories = Memory.objects.bulk_create([memory for memory, *_ in rows])
+        MemoryTag.objects.bulk_create([
+            MemoryTag(memory=memory, **tag) for memory, tags, _, _ in rows for tag in tags
+        ])
+        MemoryPerson.objects.bulk_create([
+            MemoryPerson(memory=memory, **person) for memory, _, people, _ in rows for person in people
+        ])
+        Through.objects.bulk_create([
+            Through(memory_id=memory.pk, familymember_id=member_id)
+            for memory, _, _, member_ids in rows for member_id in member_ids
+        ])
+        TimelineVersion.bump(patient.pk)
+        # In the same transaction: one commit for the batch's documents instead of one per row
+        reindex_memories([memory.pk for memory in memories])
+    return len(memories)
+
+
+def _unique(items, key):
+    first = {}
+    for item in items:
+        first.setdefault(item[key], item)
+    return list(first.values())
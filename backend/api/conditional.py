@@ -0,0 +1,82 @@
+# api/conditional.py
+import hashlib
+import json
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+from .serving import signing_window
+from .timeline_cache import timeline_versions
+
+
+def _strong_etag(*parts):
+    raw = json.dumps(parts, separators=(",", ":"), default=str).encode("utf-8")
+    return quote_etag(hashlib.sha256(raw).hexdigest()[:40])
+
+
+def _signed_since():
+    """
+    Start of the current URL signing window: payloads carry signed media URLs (api.serving),
+    so validators change with the window and clients never revalidate expired URLs
+    """
+    return datetime.fromtimestamp(signing_window() * settings.MEDIA_URL_SIGNATURE_TTL, timezone.utc)
+
+
+def timeline_validators(request, access):
+    """
+    (etag, last_modified) for the viewer's memory list, from one small query on the
+    timeline versions of every readable patient - nothing is serialized.
+    """
+    rows = timeline_versions(request, access)
+    versions = [(patient_id, version) for patient_id, version, _ in rows]
+    last_modified = max((updated_at for _, _, updated_at in rows if updated_at), default=None)
+    etag = _strong_etag(
+        "timeline",
+        signing_window(),
+        request.user.pk,  # is_liked is per viewer
+        sorted(access.readable_patient_ids),
+        versions,
+        sorted(request.query_params.lists()),
+        getattr(request, "accepted_media_type", None),
+    )
+    return etag, max(filter(None, (last_modified, _signed_since())))
+
+
+def memory_validators(request, memory_id, updated_at, version, version_updated_at):
+    """
+    (etag, last_modified) for one memory's detail payload. The patient's timeline version
+    is part of it: family member edits change the embedded members_detail without touching
+    the memory's updated_at.
+    """
+    etag = _strong_etag(
+        "memory",
+        signing_window(),
+        request.user.pk,
+        memory_id,
+        updated_at,
+        version,
+        sorted(request.query_params.lists()),
+        getattr(request, "accepted_media_type", None),
+    )
+    return etag, max(filter(None, (updated_at, version_updated_at, _signed_since())))
+
+
+def not_modified(request, etag, last_modified):
+    """A 304 (or 412) response when the client's If-None-Match / If-Modified-Since match, else None"""
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(getattr(request, "_request", request), etag=etag, last_modified=timestamp)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified):
+    """Attach validators; clients must revalidate, and the payload differs per viewer"""
+    response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    patch_cache_control(response, private=True, no_cache=True)
+    patch_vary_headers(response, ["Authorization", "Accept"])
+    return response
@@ -0,0 +1,187 @@
+# api/export.py
+"""
+Streaming ZIP export of a patient's whole memory collection (GET /api/memories/export/ and
+`manage.py export_memories`).
+
+The archive holds manifest.json, with every memory and its images, videos, recordings,
+people, tags and comments, followed by the media files under media/<memory id>/. Each
+manifest entry names its file's "archive_path". Files that could not be read are listed
+in export_errors.json at the end. Remote files are only downloaded from the storage hosts
+in settings.EXPORT_FETCH_HOSTS (the URLs are client-supplied), without following redirects. Rows are read with queryset.iterator() and each chunk
+leaves zipfile as soon as it is written, so memory use stays flat however large the
+archive is and the first bytes go out immediately. Media is stored, not deflated: it is
+already compressed.
+"""
+import json
+import os
+import zipfile
+from urllib.parse import urlparse
+
+import requests
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .fast_serializers import FastSerializer
+from .models import Memory
+
+CHUNK_SIZE = 1024 * 1024
+FETCH_TIMEOUT = 30  # seconds, per remote read
+ITERATOR_CHUNK_SIZE = 100
+
+
+class _Sink:
+    """Write-only file zipfile writes into (unseekable, so it streams); drained after each write"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def archive_filename(patient):
+    return f"relive-{patient.username}-{timezone.localdate():%Y-%m-%d}.zip"
+
+
+def export_archive(patient):
+    """Generator of the ZIP archive's bytes for all memories of `patient`"""
+    sink = _Sink()
+    errors = []
+    with zipfile.ZipFile(sink, "w", allowZip64=True) as archive:
+        info = _entry("manifest.json", timezone.now(), zipfile.ZIP_DEFLATED)
+        with archive.open(info, "w") as dest:
+            for piece in _manifest(patient):
+                dest.write(piece.encode("utf-8"))
+                yield sink.drain()
+
+        media = Memory.objects.filter(user=patient).order_by("date", "pk").prefetch_related(
+            "images", "videos", "voice_recordings"
+        )
+        for memory in media.iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+            for path, source, row in memory_files(memory):
+                yield from _write_file(archive, sink, path, source, row.created_at, errors)
+
+        if errors:
+            info = _entry("export_errors.json", timezone.now(), zipfile.ZIP_DEFLATED)
+            archive.writestr(info, json.dumps(errors, indent=2))
+    yield sink.drain()  # central directory
+
+
+def memory_files(memory):
+    """(archive path, FieldFile or URL, row) of every stored file of a memory, cover first"""
+    files = []
+    for kind, rows, url_field, file_field in (
+        ("cover", [memory], "image_url", "image"),
+        ("image", memory.images.all(), "image_url", "image"),
+        ("video", memory.videos.all(), "video_url", "video"),
+        ("recording", memory.voice_recordings.all(), "audio_url", "audio"),
+    ):
+        for row in rows:
+            source = getattr(row, url_field) or getattr(row, file_field)
+            if not source:
+                continue
+            name = source if isinstance(source, str) else source.name
+            ext = os.path.splitext(urlparse(name).path)[1].lower()
+            label = kind if kind == "cover" else f"{kind}-{row.pk}"
+            files.append((f"media/{memory.pk}/{label}{ext}", source, row))
+    return files
+
+
+def _manifest(patient):
+    """manifest.json, one memory at a time"""
+    fast = FastSerializer()
+    header = {"patient": {"id": patient.pk, "username": patient.username}, "exported_at": timezone.now()}
+    yield json.dumps(header, cls=DjangoJSONEncoder, indent=2)[:-2] + ',\n  "memories": ['
+    memories = Memory.objects.filter(user=patient).order_by("date", "pk").prefetch_related(
+        "images", "videos", "voice_recordings", "tagged_people", "event_tags", "comments__user",
+    )
+    for index, memory in enumerate(memories.iterator(chunk_size=ITERATOR_CHUNK_SIZE)):
+        paths = {(type(row), row.pk): path for path, _, row in memory_files(memory)}
+        entry = {
+            "id": memory.pk,
+            "title": memory.title,
+            "description": memory.description,
+            "date": fast.date(memory.date),
+            "location": memory.location,
+            "tag": memory.tag,
+            "image_url": memory.image_url,
+            "archive_path": paths.get((Memory, memory.pk)),
+            "created_at": fast.datetime(memory.created_at),
+            "updated_at": fast.datetime(memory.updated_at),
+        }
+        for key, method, rows in (
+            ("images", fast.image, memory.images.all()),
+            ("videos", fast.video, memory.videos.all()),
+            ("voice_recordings", fast.voice_recording, memory.voice_recordings.all()),
+        ):
+            entry[key] = [{**method(row), "archive_path": paths.get((type(row), row.pk))} for row in rows]
+        entry["tagged_people"] = fast.many(fast.person, memory.tagged_people.all())
+        entry["event_tags"] = fast.many(fast.tag, memory.event_tags.all())
+        entry["comments"] = fast.many(fast.comment, memory.comments.all())
+        yield ("," if index else "") + "\n    " + json.dumps(entry, cls=DjangoJSONEncoder)
+    yield "\n  ]\n}\n"
+
+
+def fetchable(url):
+    """True for http(s) URLs on a storage host this server may download from"""
+    parsed = urlparse(url)
+    hosts = {host.strip().lower() for host in settings.EXPORT_FETCH_HOSTS if host.strip()}
+    media_host = urlparse(settings.MEDIA_URL).hostname
+    if media_host:
+        hosts.add(media_host.lower())
+    return parsed.scheme in ("http", "https") and (parsed.hostname or "").lower() in hosts
+
+
+def _write_file(archive, sink, path, source, created_at, errors):
+    """Copy one media file into the archive, yielding the ZIP bytes as they are produced"""
+    if isinstance(source, str) and not fetchable(source):
+        errors.append({"archive_path": path, "source": source, "error": "not fetched: not a media storage URL"})
+        return
+    try:
+        if isinstance(source, str):
+            response = requests.get(source, stream=True, timeout=FETCH_TIMEOUT, allow_redirects=False)
+            if response.status_code != 200:  # redirects included: they could lead anywhere
+                response.close()
+                raise requests.HTTPError(f"HTTP {response.status_code}", response=response)
+            size = int(response.headers.get("Content-Length") or 0) or None
+            reader, close = response.iter_content(CHUNK_SIZE), response.close
+        else:
+            fh = default_storage.open(source.name, "rb")
+            size = default_storage.size(source.name)
+            reader, close = iter(lambda: fh.read(CHUNK_SIZE), b""), fh.close
+    except (OSError, requests.RequestException, ValueError) as exc:
+        errors.append({"archive_path": path, "source": str(source), "error": str(exc)})
+        return
+
+    info = _entry(path, created_at, zipfile.ZIP_STORED)
+    if size is not None:
+        info.file_size = size
+    try:
+        # Without a known size zipfile must reserve Zip64 fields up front
+        with archive.open(info, "w", force_zip64=size is None) as dest:
+            for chunk in reader:
+                dest.write(chunk)
+                yield sink.drain()
+    except (OSError, requests.RequestException) as exc:
+        errors.append({"archive_path": path, "source": str(source), "error": f"truncated: {exc}"})
+    finally:
+        close()
+
+
+def _entry(path, moment, compress_type):
+    moment = timezone.localtime(moment) if timezone.is_aware(moment) else moment
+    info = zipfile.ZipInfo(path, date_time=max(moment.timetuple()[:6], (1980, 1, 1, 0, 0, 0)))
+    info.compress_type = compress_type
+    info.external_attr = 0o644 << 16
+    return info
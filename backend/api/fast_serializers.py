@@ -0,0 +1,269 @@
+# api/fast_serializers.py
+"""
+Read-only fast path for the hot GET endpoints.
+
+FastSerializer turns prefetched model instances into the exact dicts the DRF serializers
+in serializers.py produce (same keys, order and formatting - see the parity tests in
+tests.py) without per-field dispatch: attributes are read directly, the request origin is
+resolved once instead of calling build_absolute_uri per file, and datetimes are formatted
+the way DRF's DateTimeField does. Writes and validation still go through DRF.
+
+Any change to a serializer's fields must be mirrored here; the parity tests will fail
+until it is.
+"""
+from functools import cached_property
+
+from django.utils import timezone
+from django.utils.duration import duration_string
+from django.utils.encoding import iri_to_uri
+
+from .serializers import avatar_initials, format_duration, speaker_display, user_display
+from .serving import sign_url
+from .variants import image_variants
+from .viewer_state import ViewerState
+from .waveforms import resolution_param, waveform_level
+
+
+class FastSerializer:
+    def __init__(self, context=None):
+        context = context or {}
+        self.request = context.get("request")
+        self.viewer_state = context.get("viewer_state")
+        self.waveform_resolution = context.get("waveform_resolution") or resolution_param(self.request)
+        self.timezone = timezone.get_current_timezone()
+
+    @cached_property
+    def origin(self):
+        """scheme://host of the request - build_absolute_uri("/path") is this plus the IRI-quoted path"""
+        return self.request.build_absolute_uri("/")[:-1] if self.request is not None else None
+
+    def many(self, method, objects):
+        return [method(obj) for obj in objects]
+
+    def _viewer(self, memories=(), family_members=()):
+        """The context's batch resolver; like get_viewer_state, a one-off one without it"""
+        if self.viewer_state is not None:
+            return self.viewer_state
+        return ViewerState(getattr(self.request, "user", None), memories, family_members)
+
+    # ------------- field formats (DRF equivalents) ------------- #
+    def datetime(self, value):
+        """DateTimeField: converted to the current time zone, ISO 8601 with a "Z" for UTC"""
+        if not value:
+            return None
+        if isinstance(value, str):
+            return value
+        if timezone.is_aware(value):
+            value = value.astimezone(self.timezone)
+        else:
+            value = timezone.make_aware(value, self.timezone)
+        value = value.isoformat()
+        return value[:-6] + "Z" if value.endswith("+00:00") else value
+
+    @staticmethod
+    def date(value):
+        if not value:
+            return None
+        return value if isinstance(value, str) else value.isoformat()
+
+    @staticmethod
+    def duration(value):
+        return None if value is None else duration_string(value)
+
+    def file(self, value):
+        """FileField/ImageField: the storage URL, absolute when there is a request"""
+        if not value:
+            return None
+        try:
+            url = value.url
+        except AttributeError:
+            return None
+        return self.absolute(url)
+
+    def absolute(self, url):
+        """request.build_absolute_uri(url) for site-relative URLs, without per-call host checks"""
+        if self.origin is None:
+            return url
+        if url.startswith("/") and not url.startswith("//") and "/./" not in url and "/../" not in url:
+            return self.origin + iri_to_uri(url)
+        return self.request.build_absolute_uri(url)
+
+    def variants(self, url, file):
+        return image_variants(url, file, self.absolute)
+
+    def resolved(self, url, file):
+        """The resolved_*_url fields: the remote URL, else the local file's URL"""
+        if url:
+            return url
+        return self.file(file) if file else None
+
+    # ------------- media ------------- #
+    def image(self, obj):
+        return {
+            "id": obj.id,
+            "memory": obj.memory_id,
+            "image": self.file(obj.image),
+            "image_url": obj.image_url,
+            "resolved_image_url": self.resolved(obj.image_url, obj.image),
+            "image_variants": self.variants(obj.image_url, obj.image),
+            "original_url": sign_url(obj.original_url),
+            "width": obj.width,
+            "height": obj.height,
+            "placeholder": obj.placeholder,
+            "caption": obj.caption,
+            "order": obj.order,
+            "created_at": self.datetime(obj.created_at),
+        }
+
+    def video(self, obj):
+        return {
+            "id": obj.id,
+            "memory": obj.memory_id,
+            "video": self.file(obj.video),
+            "video_url": obj.video_url,
+            "resolved_video_url": self.resolved(obj.video_url, obj.video),
+            "thumbnail_url": obj.thumbnail_url,
+            "caption": obj.caption,
+            "duration": self.duration(obj.duration),
+            "duration_formatted": format_duration(obj.duration),
+            "file_size": obj.file_size,
+            "order": obj.order,
+            "created_at": self.datetime(obj.created_at),
+        }
+
+    def voice_recording(self, obj):
+        return {
+            "id": obj.id,
+            "memory": obj.memory_id,
+            "audio": self.file(obj.audio),
+            "audio_url": obj.audio_url,
+            "resolved_audio_url": self.resolved(obj.audio_url, obj.audio),
+            "speaker_name": obj.speaker_name,
+            "speaker_relation": obj.speaker_relation,
+            "speaker_display": speaker_display(obj.speaker_name, obj.speaker_relation),
+            "duration": self.duration(obj.duration),
+            "duration_formatted": format_duration(obj.duration),
+            "file_size": obj.file_size,
+            "transcript": obj.transcript,
+            "waveform_data": obj.waveform_data,
+            "waveform": waveform_level(obj.waveform_peaks, self.waveform_resolution),
+            "created_at": self.datetime(obj.created_at),
+        }
+
+    def person(self, obj):
+        return {
+            "id": obj.id,
+            "memory": obj.memory_id,
+            "name": obj.name,
+            "relation": obj.relation,
+            "avatar_url": obj.avatar_url,
+            "avatar_initials": avatar_initials(obj.name),
+            "created_at": self.datetime(obj.created_at),
+        }
+
+    def tag(self, obj):
+        return {
+            "id": obj.id,
+            "memory": obj.memory_id,
+            "tag_name": obj.tag_name,
+            "color": obj.color,
+            "created_at": self.datetime(obj.created_at),
+        }
+
+    # ------------- interactions ------------- #
+    def like(self, obj):
+        return {
+            "id": obj.id,
+            "memory": obj.memory_id,
+            "user": obj.user_id,
+            "user_username": obj.user.username,
+            "created_at": self.datetime(obj.created_at),
+        }
+
+    def comment(self, obj):
+        return {
+            "id": obj.id,
+            "memory": obj.memory_id,
+            "user": obj.user_id,
+            "user_username": obj.user.username,
+            "user_display": user_display(obj.user),
+            "content": obj.content,
+            "created_at": self.datetime(obj.created_at),
+            "updated_at": self.datetime(obj.updated_at),
+        }
+
+    # ------------- memories ------------- #
+    def family_member(self, obj):
+        return {
+            "id": obj.id,
+            "name": obj.name,
+            "relation": obj.relation,
+            "avatar": self.file(obj.avatar),
+            "memories_count": self._viewer(family_members=[obj]).memories_count(obj),
+        }
+
+    def memory(self, obj):
+        """MemorySerializer (list views)"""
+        members = list(obj.members.all())
+        return {
+            "id": obj.id,
+            "username": obj.user.username,
+            "title": obj.title,
+            "description": obj.description,
+            "date": self.date(obj.date),
+            "location": obj.location,
+            "tag": obj.tag,
+            "image_url": obj.image_url,
+            "resolved_image_url": self.resolved(obj.image_url, obj.image),
+            "image_variants": self.variants(obj.image_url, obj.image),
+            "image_width": obj.image_width,
+            "image_height": obj.image_height,
+            "image_placeholder": obj.image_placeholder,
+            "members": [member.pk for member in members],
+            "members_detail": [self.family_member(member) for member in members],
+            "images_count": obj.images_count,
+            "videos_count": obj.videos_count,
+            "recordings_count": obj.recordings_count,
+            "likes_count": obj.likes_count,
+            "is_liked": self._viewer(memories=[obj]).is_liked(obj),
+            "created_at": self.datetime(obj.created_at),
+        }
+
+    def memory_detail(self, obj):
+        """MemoryDetailSerializer (detail view) - expects memory_detail_queryset() prefetches"""
+        viewer = self._viewer(memories=[obj])
+        return {
+            "id": obj.id,
+            "title": obj.title,
+            "description": obj.description,
+            "date": self.date(obj.date),
+            "location": obj.location,
+            "tag": obj.tag,
+            "image": self.file(obj.image),
+            "image_url": obj.image_url,
+            "resolved_image_url": self.resolved(obj.image_url, obj.image),
+            "image_variants": self.variants(obj.image_url, obj.image),
+            "original_url": sign_url(obj.original_url),
+            "image_width": obj.image_width,
+            "image_height": obj.image_height,
+            "image_placeholder": obj.image_placeholder,
+            "created_at": self.datetime(obj.created_at),
+            "username": obj.user.username,
+            "user_display": user_display(obj.user),
+            "user": obj.user_id,
+            "images": self.many(self.image, obj.images.all()),
+            "videos": self.many(self.video, obj.videos.all()),
+            "voice_recordings": self.many(self.voice_recording, obj.voice_recordings.all()),
+            "tagged_people": self.many(self.person, obj.tagged_people.all()),
+            "event_tags": self.many(self.tag, obj.event_tags.all()),
+            "likes": self.many(self.like, obj.likes.all()),
+            "comments": self.many(self.comment, obj.comments.all()),
+            "members_detail": self.many(self.family_member, obj.members.all()),
+            "media_counts": {
+                **obj.get_media_counts(),
+                "likes": obj.likes_count,
+                "comments": obj.comments_count,
+            },
+            "is_liked": viewer.is_liked(obj),
+            "can_edit": viewer.can_edit(obj),
+        }
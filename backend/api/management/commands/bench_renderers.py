@@ -0,0 +1,92 @@
+# api/management/commands/bench_renderers.py
+import statistics
+import time
+import uuid
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from api.fast_serializers import FastSerializer
+from api.models import FamilyMember, Memory
+from api.renderers import MessagePackRenderer, ORJSONRenderer, msgpack, orjson
+from api.viewer_state import viewer_context
+
+
+def synthetic_timeline(count):
+    """
+    A real memory-list payload: FastSerializer output (what GET /api/memories/ renders) for
+    `count` generated memories of a throwaway patient. The rows are created in a transaction
+    that is rolled back, so nothing is left in the database.
+    """
+    with transaction.atomic():
+        patient = User.objects.create_user(f"bench-{uuid.uuid4().hex[:12]}")
+        members = [
+            FamilyMember.objects.create(user=patient, name=f"Member {m}", relation="Grandson") for m in (1, 2, 3)
+        ]
+        memories = Memory.objects.bulk_create([
+            Memory(
+                user=patient,
+                title=f"Memory {i} – a day at the beach",
+                description="We walked along the shore and talked about the old house. " * 3,
+                date=date(2020, 1, 1) + timedelta(days=i % 1500),
+                location="Goa, India",
+                tag="Family",
+                image_url=f"https://res.cloudinary.com/demo/image/upload/v1/memories/{i}.jpg",
+                image_width=1600, image_height=1200,
+                images_count=3, videos_count=1, recordings_count=2,
+                people_count=2, tags_count=1, likes_count=4, comments_count=1,
+            )
+            for i in range(count)
+        ])
+        Memory.members.through.objects.bulk_create([
+            Memory.members.through(memory_id=memory.pk, familymember_id=member.pk)
+            for memory in memories for member in members
+        ])
+        request = APIRequestFactory().get("/api/memories/")
+        request.user = patient
+        memories = list(
+            Memory.objects.filter(user=patient).select_related("user").prefetch_related("members").order_by("-id")
+        )
+        fast = FastSerializer(viewer_context(request, memories))
+        payload = fast.many(fast.memory, memories)
+        transaction.set_rollback(True)
+    return payload
+
+
+class Command(BaseCommand):
+    help = "Compare render time and payload size of the API renderers on a generated memory timeline"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--memories", type=int, default=2000)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        data = synthetic_timeline(options["memories"])
+        renderers = [("DRF JSONRenderer", JSONRenderer())]
+        if orjson is not None:
+            renderers.append(("ORJSONRenderer", ORJSONRenderer()))
+        else:
+            self.stdout.write(self.style.WARNING("orjson not installed - ORJSONRenderer would use the stdlib encoder"))
+        if msgpack is not None:
+            renderers.append(("MessagePackRenderer", MessagePackRenderer()))
+        else:
+            self.stdout.write(self.style.WARNING("msgpack not installed - skipping MessagePackRenderer"))
+
+        self.stdout.write(f"{options['memories']} memories, best/median of {options['repeat']} runs")
+        baseline = None
+        for name, renderer in renderers:
+            timings = []
+            for _ in range(options["repeat"]):
+                start = time.perf_counter()
+                body = renderer.render(data, renderer.media_type, {})
+                timings.append((time.perf_counter() - start) * 1000)
+            median = statistics.median(timings)
+            baseline = baseline or median
+            self.stdout.write(
+                f"{name:<22} best {min(timings):8.2f} ms  median {median:8.2f} ms  "
+                f"{len(body) / 1024:9.1f} KiB  x{baseline / median:5.2f}"
+            )
@@ -0,0 +1,111 @@
+# api/management/commands/bench_serializers.py
+import time
+from datetime import date, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory
+
+from api.fast_serializers import FastSerializer
+from api.models import FamilyMember, Memory, MemoryImage, MemoryPerson, MemoryVideo
+from api.serializers import MemoryDetailSerializer, MemorySerializer
+from api.viewer_state import viewer_context
+from api.views import memory_detail_queryset
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare per-object cost of the DRF serializers and the FastSerializer read path "
+        "on a synthetic timeline (created in a transaction that is rolled back)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--memories", type=int, default=2000)
+        parser.add_argument("--detail", type=int, default=200, help="Memories to render with the detail serializer")
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic(), override_settings(ALLOWED_HOSTS=["testserver"]):
+                self.run(options)
+                raise Rollback()
+        except Rollback:
+            pass
+
+    def seed(self, count):
+        patient = User.objects.create_user("bench-serializers-patient")
+        members = [
+            FamilyMember.objects.create(user=patient, name=f"Member {i}", relation="Cousin") for i in range(3)
+        ]
+        memories = Memory.objects.bulk_create(
+            Memory(
+                user=patient, title=f"Memory {i}", description="A long afternoon by the sea. " * 4,
+                date=date(2020, 1, 1) + timedelta(days=i % 1500), location="Goa", tag="Family",
+                image_url=f"https://res.cloudinary.com/demo/image/upload/v1/{i}.jpg",
+            )
+            for i in range(count)
+        )
+        Memory.members.through.objects.bulk_create(
+            Memory.members.through(memory_id=m.pk, familymember_id=fm.pk) for m in memories for fm in members
+        )
+        MemoryImage.objects.bulk_create(
+            MemoryImage(memory=m, image_url=f"https://example.com/{m.pk}/{i}.jpg", order=i)
+            for m in memories for i in range(3)
+        )
+        MemoryVideo.objects.bulk_create(
+            MemoryVideo(memory=m, video_url=f"https://example.com/{m.pk}.mp4", duration=timedelta(seconds=95))
+            for m in memories
+        )
+        MemoryPerson.objects.bulk_create(MemoryPerson(memory=m, name="Grandpa Joe") for m in memories)
+        return patient
+
+    def time(self, render, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            render()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    def report(self, label, objects, drf, fast):
+        per_drf, per_fast = drf / objects * 1e6, fast / objects * 1e6
+        self.stdout.write(
+            f"{label:<8} {objects:>6} objects  DRF {per_drf:8.1f} µs/obj  fast {per_fast:8.1f} µs/obj  "
+            f"x{per_drf / per_fast:5.2f}"
+        )
+
+    def run(self, options):
+        patient = self.seed(options["memories"])
+        request = APIRequestFactory().get("/api/memories/")
+        request.user = patient
+
+        memories = list(
+            Memory.objects.filter(user=patient).select_related("user").prefetch_related("members").order_by("-id")
+        )
+        drf = self.time(
+            lambda: MemorySerializer(memories, many=True, context=viewer_context(request, memories)).data,
+            options["repeat"],
+        )
+        fast = self.time(
+            lambda: (lambda f: f.many(f.memory, memories))(FastSerializer(viewer_context(request, memories))),
+            options["repeat"],
+        )
+        self.report("list", len(memories), drf, fast)
+
+        details = list(memory_detail_queryset().filter(user=patient).order_by("-id")[:options["detail"]])
+        drf = self.time(
+            lambda: [MemoryDetailSerializer(m, context=viewer_context(request, [m])).data for m in details],
+            options["repeat"],
+        )
+        fast = self.time(
+            lambda: [FastSerializer(viewer_context(request, [m])).memory_detail(m) for m in details],
+            options["repeat"],
+        )
+        self.report("detail", len(details), drf, fast)
@@ -0,0 +1,29 @@
+# api/management/commands/export_memories.py
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from api.export import archive_filename, export_archive
+
+
+class Command(BaseCommand):
+    help = "Write a ZIP of all of a patient's memories (manifest.json plus media files), streamed to disk"
+
+    def add_arguments(self, parser):
+        parser.add_argument("patient", help="Patient username or id")
+        parser.add_argument("--output", "-o", help="Archive path (default: relive-<username>-<date>.zip)")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        lookup = {"pk": options["patient"]} if options["patient"].isdigit() else {"username": options["patient"]}
+        try:
+            patient = User.objects.get(**lookup)
+        except User.DoesNotExist:
+            raise CommandError(f"No user {options['patient']!r}")
+
+        output = options["output"] or archive_filename(patient)
+        written = 0
+        with open(output, "wb") as fh:
+            for chunk in export_archive(patient):
+                fh.write(chunk)
+                written += len(chunk)
+        self.stdout.write(self.style.SUCCESS(f"Exported memories of {patient.username} to {output} ({written} bytes)"))
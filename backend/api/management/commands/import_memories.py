@@ -0,0 +1,36 @@
+# api/management/commands/import_memories.py
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from api.bulk_import import csv_rows, import_memories, ndjson_rows
+
+
+class Command(BaseCommand):
+    help = "Bulk-import memories for a patient from an NDJSON or CSV file (see api/bulk_import.py)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("patient", help="Patient username or id")
+        parser.add_argument("path", help="NDJSON (.ndjson/.jsonl) or CSV (.csv) file")
+        parser.add_argument("--format", choices=["ndjson", "csv"], help="Default: from the file extension")
+        parser.add_argument("--batch-size", type=int, help="Rows per insert transaction (default IMPORT_BATCH_SIZE)")
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        lookup = {"pk": options["patient"]} if options["patient"].isdigit() else {"username": options["patient"]}
+        try:
+            patient = User.objects.get(**lookup)
+        except User.DoesNotExist:
+            raise CommandError(f"No user {options['patient']!r}")
+
+        fmt = options["format"] or ("csv" if options["path"].lower().endswith(".csv") else "ndjson")
+        with open(options["path"], "rb") as fh:
+            rows = csv_rows(fh) if fmt == "csv" else ndjson_rows(fh)
+            report = import_memories(patient, rows, batch_size=options["batch_size"])
+
+        for error in report["errors"]:
+            self.stderr.write(f"line {error['line']}: {json.dumps(error['errors'])}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {report['created']} memories for {patient.username} ({report['failed']} failed)"
+        ))
@@ -0,0 +1,55 @@
+# api/management/commands/process_upload_jobs.py
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from api.media import claim_next_job, process_job
+from api.storage import get_media_storage
+
+
+class Command(BaseCommand):
+    help = "Push spooled media uploads to storage and create their media rows (worker pool)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=4, help="Concurrent uploads")
+        parser.add_argument("--once", action="store_true", help="Exit when no job is due instead of polling")
+        parser.add_argument("--poll-interval", type=float, default=2.0, help="Seconds to wait when idle")
+
+    def handle(self, *args, **options):
+        stop = threading.Event()
+        workers = max(1, options["workers"])
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="upload") as pool:
+            futures = [pool.submit(self.work, stop, options) for _ in range(workers)]
+            try:
+                done = [future.result() for future in futures]
+            except KeyboardInterrupt:
+                stop.set()
+                self.stdout.write("Stopping after the current uploads...")
+                return
+        succeeded = sum(ok for ok, _ in done)
+        failed = sum(bad for _, bad in done)
+        self.stdout.write(self.style.SUCCESS(f"Processed {succeeded + failed} upload jobs ({failed} failed or retrying)"))
+
+    def work(self, stop, options):
+        storage = get_media_storage()
+        succeeded = failed = 0
+        try:
+            while not stop.is_set():
+                job = claim_next_job()
+                if job is None:
+                    if options["once"]:
+                        break
+                    stop.wait(options["poll_interval"])
+                    continue
+                if process_job(job, storage=storage):
+                    succeeded += 1
+                    self.stdout.write(f"✅ {job.kind} upload {job.pk} for memory {job.memory_id}")
+                else:
+                    failed += 1
+                    self.stderr.write(f"❌ {job.kind} upload {job.pk} attempt {job.attempts} failed")
+        finally:
+            # Each worker thread has its own database connection
+            connections.close_all()
+        return succeeded, failed
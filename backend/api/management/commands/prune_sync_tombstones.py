@@ -0,0 +1,21 @@
+# api/management/commands/prune_sync_tombstones.py
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import SyncTombstone
+
+
+class Command(BaseCommand):
+    help = "Delete delta-sync tombstones older than SYNC_TOMBSTONE_RETENTION_DAYS"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=None, help="Override the retention window")
+
+    def handle(self, *args, **options):
+        days = options["days"] or settings.SYNC_TOMBSTONE_RETENTION_DAYS
+        cutoff = timezone.now() - timedelta(days=days)
+        deleted, _ = SyncTombstone.objects.filter(deleted_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} tombstones older than {days} days"))
@@ -0,0 +1,14 @@
+# api/management/commands/prune_upload_sessions.py
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import UploadSession
+
+
+class Command(BaseCommand):
+    help = "Delete resumable upload sessions (and their partial files) idle past UPLOAD_SESSION_TTL_HOURS"
+
+    def handle(self, *args, **options):
+        # Queryset delete still sends post_delete, which removes each partial file
+        deleted, _ = UploadSession.objects.filter(expires_at__lt=timezone.now()).delete()
+        self.stdout.write(self.style.SUCCESS(f"Pruned {deleted} expired upload sessions"))
@@ -0,0 +1,20 @@
+# api/management/commands/rebuild_search_index.py
+from django.core.management.base import BaseCommand
+
+from api.search import rebuild_index, reindex_memories
+
+
+class Command(BaseCommand):
+    help = "Rebuild the memory full-text search index (or refresh only the given memories)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("memory_ids", nargs="*", type=int, help="Only reindex these memories")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        if options["memory_ids"]:
+            reindex_memories(options["memory_ids"])
+            self.stdout.write(self.style.SUCCESS(f"Reindexed {len(set(options['memory_ids']))} memories"))
+            return
+        total = rebuild_index(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt search index with {total} memories"))
@@ -0,0 +1,59 @@
+# api/management/commands/reconcile_memory_counters.py
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from api.models import Memory, MEMORY_COUNTER_FIELDS
+
+
+class Command(BaseCommand):
+    help = "Recompute Memory counter columns from the child tables and fix any drift"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true", help="Report drift without writing")
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument("--user", type=int, help="Only reconcile memories of this patient id")
+
+    def handle(self, *args, **options):
+        annotations = {}
+        for model, field in MEMORY_COUNTER_FIELDS.items():
+            counts = (
+                model.objects.filter(memory=OuterRef("pk"))
+                .order_by().values("memory").annotate(c=Count("pk")).values("c")
+            )
+            annotations[f"actual_{field}"] = Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+        qs = Memory.objects.annotate(**annotations)
+        if options["user"]:
+            qs = qs.filter(user_id=options["user"])
+
+        drift = Q()
+        for field in MEMORY_COUNTER_FIELDS.values():
+            drift |= ~Q(**{field: F(f"actual_{field}")})
+        qs = qs.filter(drift).order_by("pk")
+
+        fields = list(MEMORY_COUNTER_FIELDS.values())
+        fixed = 0
+        batch = []
+        for memory in qs.iterator(chunk_size=options["batch_size"]):
+            for field in fields:
+                actual = getattr(memory, f"actual_{field}")
+                if getattr(memory, field) != actual:
+                    self.stdout.write(f"Memory {memory.pk}: {field} {getattr(memory, field)} -> {actual}")
+                    setattr(memory, field, actual)
+            batch.append(memory)
+            fixed += 1
+            if len(batch) >= options["batch_size"]:
+                self._flush(batch, fields, options["dry_run"])
+                batch = []
+        self._flush(batch, fields, options["dry_run"])
+
+        verb = "would be fixed" if options["dry_run"] else "fixed"
+        self.stdout.write(self.style.SUCCESS(f"{fixed} memories {verb}"))
+
+    def _flush(self, batch, fields, dry_run):
+        if batch and not dry_run:
+            with transaction.atomic():
+                Memory.objects.bulk_update(batch, fields)
+
@@ -0,0 +1,19 @@
+# api/management/commands/timeline_cache_stats.py
+from django.core.management.base import BaseCommand
+
+from api import timeline_cache
+
+
+class Command(BaseCommand):
+    help = "Show (or reset) the timeline cache hit/miss counters"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--reset", action="store_true", help="Reset the counters after printing")
+
+    def handle(self, *args, **options):
+        stats = timeline_cache.stats()
+        rate = "n/a" if stats["hit_rate"] is None else f"{stats['hit_rate']:.1%}"
+        self.stdout.write(f"hits: {stats['hits']}  misses: {stats['misses']}  hit rate: {rate}")
+        if options["reset"]:
+            timeline_cache.reset_stats()
+            self.stdout.write(self.style.SUCCESS("Counters reset"))
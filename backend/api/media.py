@@ -0,0 +1,683 @@
+# api/media.py
+"""
+Media upload pipeline shared by the upload views and the upload worker.
+
+Views validate the metadata, then either spool the file and enqueue a MediaUploadJob
+(settings.MEDIA_UPLOADS_ASYNC, answered with 202) or upload inline. Both paths end in
+create_media(), which turns a storage result into the MemoryImage / MemoryVideo /
+MemoryVoiceRecording row (or the memory's own image). Large files can instead arrive in
+chunks through an UploadSession, whose finished file enters the same pipeline.
+
+Uploads for media rows go through store_for(), which skips the upload when the patient
+already has a StoredAsset with identical content (SHA-256 + size) and reuses its URL. The
+asset comes back with a reference already taken for the row about to be created, so a
+concurrent delete of its last row cannot remove it in between; a failed upload gives the
+reference back with release_unused().
+"""
+import hashlib
+import os
+import re
+import shutil
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import (
+    MEMORY_COUNTER_FIELDS, MediaUploadJob, Memory, MemoryImage, MemoryVideo, MemoryVoiceRecording, StoredAsset,
+    UploadSession, acquire_asset, release_assets, touch_memory,
+)
+from .serializers import MemoryImageSerializer, MemoryVideoSerializer, MemoryVoiceRecordingSerializer
+from .normalize import prepare_image
+from .serving import media_url
+from .storage import delete_stored, get_media_storage
+from .uploads import SNIFF_BYTES, sniff_content_type
+from .waveforms import compute_waveform
+
+
+MEDIA_KINDS = {
+    "memory": {
+        "model": Memory, "serializer": None, "upload_field": "image", "label": "Image",
+        "url_field": "image_url", "file_field": "image", "folder": "memories", "resource_type": "image",
+    },
+    "image": {
+        "model": MemoryImage, "serializer": MemoryImageSerializer, "upload_field": "image", "label": "Image",
+        "url_field": "image_url", "file_field": "image", "folder": "memory_images", "resource_type": "image",
+        "metadata": {"caption": "", "order": 0},
+    },
+    "video": {
+        "model": MemoryVideo, "serializer": MemoryVideoSerializer, "upload_field": "video", "label": "Video",
+        "url_field": "video_url", "file_field": "video", "folder": "memory_videos", "resource_type": "video",
+        "metadata": {"caption": "", "order": 0},
+    },
+    "recording": {
+        # Cloudinary uses "video" for audio files
+        "model": MemoryVoiceRecording, "serializer": MemoryVoiceRecordingSerializer, "upload_field": "audio",
+        "label": "Audio", "url_field": "audio_url", "file_field": "audio", "folder": "memory_audio",
+        "resource_type": "video", "metadata": {"speaker_name": "Unknown Speaker", "speaker_relation": ""},
+    },
+}
+
+
+# ------------------ METADATA ------------------ #
+
+def validate_metadata(kind, memory, data):
+    """(metadata, None) with the validated non-file fields for `kind`, or (None, errors)"""
+    spec = MEDIA_KINDS[kind]
+    if spec["serializer"] is None:
+        return {}, None
+    fields = {name: data.get(name, default) for name, default in spec["metadata"].items()}
+    serializer = spec["serializer"](data={"memory": memory.id, **fields})
+    if not serializer.is_valid():
+        return None, serializer.errors
+    return {name: serializer.validated_data[name] for name in fields if name in serializer.validated_data}, None
+
+
+# ------------------ CONTENT CHECKS ------------------ #
+
+# Sniffed content types each kind accepts (browsers record audio notes as WebM/MP4)
+ACCEPTED_TYPES = {
+    "memory": ("image/",), "image": ("image/",), "video": ("video/",), "recording": ("audio/", "video/"),
+}
+
+
+def sniffed_type(file):
+    """Content type from the file's magic bytes: a path, or an uploaded file (rewound after)"""
+    if getattr(file, "sniffed_type", None):
+        return file.sniffed_type  # sniffed by InspectingUploadHandler while streaming
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, "rb") as fh:
+            return sniff_content_type(fh.read(SNIFF_BYTES))
+    file.seek(0)
+    head = file.read(SNIFF_BYTES)
+    file.seek(0)
+    return sniff_content_type(head)
+
+
+def content_type_error(kind, file):
+    """Error message when the bytes are not a file of `kind`, whatever the client claimed"""
+    content_type = sniffed_type(file)
+    if content_type.startswith(ACCEPTED_TYPES[kind]):
+        return None
+    label = MEDIA_KINDS[kind]["label"].lower()
+    return f"Unsupported {label} file (detected {content_type})"
+
+
+# ------------------ STORAGE RESULT -> ROW ------------------ #
+
+def upload_fields(kind, result):
+    """Model field values for a storage upload result"""
+    spec = MEDIA_KINDS[kind]
+    fields = {}
+    if result.get("url"):
+        fields[spec["url_field"]] = result["url"]
+    if result.get("file"):
+        fields[spec["file_field"]] = result["file"]
+    if kind in ("video", "recording") and result.get("duration"):
+        fields["duration"] = timedelta(seconds=int(result["duration"]))
+    if kind in ("video", "recording") and result.get("bytes"):
+        fields["file_size"] = result["bytes"]
+    if kind == "recording":
+        fields["waveform_peaks"] = result.get("waveform")
+    if kind in ("memory", "image"):
+        prefix = "image_" if kind == "memory" else ""
+        fields["original_url"] = result.get("original_url")
+        fields[prefix + "width"] = result.get("width")
+        fields[prefix + "height"] = result.get("height")
+        fields[prefix + "placeholder"] = result.get("placeholder") or ""
+    if kind == "video" and result.get("url") and "/video/upload/" in result["url"]:
+        # Cloudinary auto-generates thumbnail for videos
+        fields["thumbnail_url"] = result["url"].replace("/video/upload/", "/video/upload/c_thumb,w_300,h_200/")
+    return fields
+
+
+def create_media(memory, kind, metadata, result, asset=None):
+    """
+    Create the media row (or set the memory's image) from a storage result. The row takes
+    over the reference store_for() took on `asset`.
+    """
+    spec = MEDIA_KINDS[kind]
+    fields = upload_fields(kind, result)
+    if kind == "memory":
+        for name, value in fields.items():
+            setattr(memory, name, value)
+        memory.save(update_fields=[*fields, "updated_at"])
+        return memory
+    return spec["model"].objects.create(memory=memory, asset=asset, **metadata, **fields)
+
+
+def store(file, kind, filename=None, storage=None):
+    """
+    Upload to storage. Images are normalized first and the result carries their width,
+    height and placeholder (see api.normalize); recordings carry their waveform peaks
+    (see api.waveforms).
+    """
+    spec = MEDIA_KINDS[kind]
+    storage = storage or get_media_storage()
+    if kind == "recording":
+        waveform = compute_waveform(file)
+        result = storage.upload(file, spec["folder"], spec["resource_type"], filename=filename)
+        result["waveform"] = waveform
+        if waveform and not result.get("duration"):
+            result["duration"] = waveform["duration"]  # local storage does not report it
+        return result
+    if spec["resource_type"] != "image":
+        return storage.upload(file, spec["folder"], spec["resource_type"], filename=filename)
+
+    normalized, info = prepare_image(file, filename, normalize=settings.IMAGE_NORMALIZE)
+    if normalized is None:
+        result = storage.upload(file, spec["folder"], "image", filename=filename)
+    else:
+        result = storage.upload(normalized, spec["folder"], "image", filename=normalized.name)
+        if settings.IMAGE_KEEP_ORIGINAL:
+            original = storage.upload(file, f"{spec['folder']}/originals", "image", filename=filename)
+            result["original_url"] = original["url"] or media_url(original["file"])
+            result["original_public_id"] = original["public_id"]
+    result.update(info or {})
+    return result
+
+
+def upload_now(memory, kind, file_obj, metadata):
+    """Synchronous path: upload inside the request and create the row"""
+    result, asset = store_for(memory, kind, file_obj, filename=file_obj.name)
+    try:
+        return create_media(memory, kind, metadata, result, asset)
+    except Exception:
+        release_unused([asset])
+        raise
+
+
+# ------------------ DEDUPLICATION ------------------ #
+
+# Memory cover images are not shared: only media rows hold asset references
+DEDUP_KINDS = ("image", "video", "recording")
+
+
+def content_digest(file):
+    """(sha256 hex, size) of a path or uploaded file; file objects are left rewound"""
+    if getattr(file, "sha256", None):
+        return file.sha256, file.size  # computed by InspectingUploadHandler while streaming
+    digest, size = hashlib.sha256(), 0
+    if isinstance(file, (str, os.PathLike)):
+        with open(file, "rb") as fh:
+            for chunk in iter(lambda: fh.read(1024 * 1024), b""):
+                digest.update(chunk)
+                size += len(chunk)
+    else:
+        for chunk in file.chunks():
+            digest.update(chunk)
+            size += len(chunk)
+        file.seek(0)
+    return digest.hexdigest(), size
+
+
+def _backend_path(storage):
+    return f"{type(storage).__module__}.{type(storage).__qualname__}"
+
+
+def find_assets(patient_id, keys, references=None):
+    """
+    {(kind, digest): StoredAsset} for the (kind, (sha256, size)) keys the patient already has
+    stored. Each asset is returned with references[key] (default 1) references taken for the
+    rows about to use it; one deleted between the lookup and taking them is left out.
+    """
+    if not keys:
+        return {}
+    candidates = StoredAsset.objects.filter(patient_id=patient_id, sha256__in={sha256 for _, (sha256, _) in keys})
+    by_content = {(a.resource_type, a.sha256, a.size): a for a in candidates}
+    found = {}
+    for kind, (sha256, size) in keys:
+        key = (kind, (sha256, size))
+        asset = by_content.get((MEDIA_KINDS[kind]["resource_type"], sha256, size))
+        if asset is not None and acquire_asset(asset, (references or {}).get(key, 1)):
+            found[key] = asset
+    return found
+
+
+def record_asset(patient_id, digest, result, storage, references=1):
+    """
+    The StoredAsset for a fresh upload, with `references` references taken for the rows
+    about to use it. If a concurrent request stored the same content first, its asset wins
+    and the copy just uploaded is deleted again.
+    """
+    sha256, size = digest
+    while True:
+        asset, created = StoredAsset.objects.get_or_create(
+            patient_id=patient_id, sha256=sha256, size=size, resource_type=result["resource_type"],
+            defaults={
+                "storage": _backend_path(storage), "url": result["url"], "file": result["file"] or "",
+                "public_id": result["public_id"] or "", "duration": result["duration"],
+                "original_url": result.get("original_url"),
+                "original_public_id": result.get("original_public_id") or "",
+                "width": result.get("width"), "height": result.get("height"),
+                "placeholder": result.get("placeholder") or "", "waveform": result.get("waveform"),
+                "ref_count": references,
+            },
+        )
+        # An existing asset whose last row was deleted meanwhile is gone: record ours instead
+        if created or acquire_asset(asset, references):
+            break
+    if not created:
+        for public_id in (result["public_id"], result.get("original_public_id")):
+            delete_stored(_backend_path(storage), public_id, result["resource_type"])
+    return asset
+
+
+def release_unused(assets):
+    """Give back the references taken for rows that were never created ([asset or None, ...])"""
+    counts = {}
+    for asset in assets:
+        if asset is not None:
+            counts[asset.pk] = counts.get(asset.pk, 0) + 1
+    release_assets(counts)
+
+
+def store_for(memory, kind, file, filename=None, storage=None, digest=None):
+    """
+    Upload `file` for a row of `memory`, unless the patient already has identical content
+    stored. Returns (result, asset); asset is None for kinds that are not deduplicated, and
+    otherwise carries one reference for the row (release_unused() it if none is created).
+    """
+    storage = storage or get_media_storage()
+    if kind not in DEDUP_KINDS:
+        return store(file, kind, filename, storage), None
+    digest = digest or content_digest(file)
+    asset = find_assets(memory.user_id, [(kind, digest)]).get((kind, digest))
+    if asset is None:
+        asset = record_asset(memory.user_id, digest, store(file, kind, filename, storage), storage)
+    return asset.as_result(), asset
+
+
+# ------------------ BULK ------------------ #
+
+def upload_concurrently(memory, items, concurrency=None, storage=None):
+    """
+    Upload [(kind, file_obj), ...] for rows of `memory` with at most `concurrency` uploads
+    in flight and yield (position, result, asset, error) as each one finishes. Content the
+    patient already has stored, or that repeats within the batch, is not uploaded again.
+    Every yielded asset carries one reference per position, for bulk_create_media() to
+    hand over to the rows. The threads only talk to storage; all queries run on the
+    calling thread.
+    """
+    if not items:
+        return
+    concurrency = max(1, concurrency or settings.BULK_UPLOAD_CONCURRENCY)
+    storage = storage or get_media_storage()
+    groups = {}  # (kind, digest) -> positions with that content
+    for position, (kind, file_obj) in enumerate(items):
+        groups.setdefault((kind, content_digest(file_obj)), []).append(position)
+    existing = find_assets(memory.user_id, list(groups), {key: len(positions) for key, positions in groups.items()})
+    owed = {}  # asset -> references taken for positions not yielded yet
+
+    def take(key, asset):
+        owed[asset] = owed.get(asset, 0) + len(groups[key])
+
+    def hand_out(key, asset):
+        for position in groups[key]:
+            owed[asset] -= 1
+            yield position, asset.as_result(), asset, None
+
+    for key, asset in existing.items():
+        take(key, asset)
+
+    try:
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(groups)), thread_name_prefix="bulk-upload") as pool:
+            futures = {}
+            for key, positions in groups.items():
+                if key not in existing:
+                    kind, file_obj = items[positions[0]]
+                    futures[pool.submit(store, file_obj, kind, file_obj.name, storage)] = key
+            for key, asset in existing.items():
+                yield from hand_out(key, asset)
+            for future in as_completed(futures):
+                key = futures[future]
+                try:
+                    asset = record_asset(
+                        memory.user_id, key[1], future.result(), storage, references=len(groups[key])
+                    )
+                except Exception as e:
+                    for position in groups[key]:
+                        yield position, None, None, e
+                    continue
+                take(key, asset)
+                yield from hand_out(key, asset)
+    finally:
+        # The caller stopped early: give back what was taken for positions it never saw
+        release_assets({asset.pk: n for asset, n in owed.items() if n})
+
+
+def bulk_create_media(memory, kind, rows):
+    """
+    Create the rows for [(metadata, result, asset), ...] with one INSERT, then apply the
+    memory's counter and timeline version once (bulk_create sends no post_save signals).
+    The rows take over the asset references upload_concurrently() took; if the INSERT
+    fails they are given back.
+    """
+    model = MEDIA_KINDS[kind]["model"]
+    try:
+        objs = model.objects.bulk_create([
+            model(memory=memory, asset=asset, **metadata, **upload_fields(kind, result))
+            for metadata, result, asset in rows
+        ])
+    except Exception:
+        release_unused(asset for _, _, asset in rows)
+        raise
+    if objs:
+        touch_memory(memory.id, memory.user_id, **{MEMORY_COUNTER_FIELDS[model]: len(objs)})
+    return objs
+
+
+# ------------------ SPOOL + JOBS ------------------ #
+
+def spool_upload(file_obj):
+    """Move/copy an uploaded file into MEDIA_SPOOL_DIR; returns the spooled path"""
+    os.makedirs(settings.MEDIA_SPOOL_DIR, exist_ok=True)
+    ext = os.path.splitext(file_obj.name or "")[1][:16]
+    path = os.path.join(settings.MEDIA_SPOOL_DIR, f"{uuid.uuid4().hex}{ext}")
+    if hasattr(file_obj, "temporary_file_path"):
+        # Large uploads are already on disk - a rename instead of a second copy
+        shutil.move(file_obj.temporary_file_path(), path)
+    else:
+        with open(path, "wb") as out:
+            for chunk in file_obj.chunks():
+                out.write(chunk)
+    return path
+
+
+def enqueue_upload(memory, kind, file_obj, metadata, user=None):
+    sha256 = getattr(file_obj, "sha256", "")  # hashed while streaming in: the worker needs no re-read
+    path = spool_upload(file_obj)
+    return enqueue_spooled(memory, kind, path, file_obj.name, file_obj.size or 0, metadata, user, sha256)
+
+
+def enqueue_spooled(memory, kind, path, original_name, size, metadata, user=None, sha256=""):
+    """Queue a file that is already in the spool directory (the job owns it from now on)"""
+    return MediaUploadJob.objects.create(
+        memory=memory, created_by=user if user and user.is_authenticated else None,
+        kind=kind, spool_path=path, original_name=(original_name or "")[:255],
+        size=size, sha256=sha256, metadata=metadata,
+    )
+
+
+def claim_next_job():
+    """
+    Atomically take the next due job (or one whose worker died mid-upload); None when idle.
+    The conditional UPDATE makes concurrent workers skip jobs another worker just claimed.
+    """
+    now = timezone.now()
+    stale = now - timedelta(seconds=settings.UPLOAD_JOB_STALE_SECONDS)
+    candidates = MediaUploadJob.objects.filter(
+        Q(status="pending", available_at__lte=now) | Q(status="processing", updated_at__lt=stale)
+    ).order_by("available_at", "id").values_list("id", "status", "updated_at")[:10]
+    for pk, current_status, updated_at in candidates:
+        claimed = MediaUploadJob.objects.filter(pk=pk, status=current_status, updated_at=updated_at).update(
+            status="processing", updated_at=now, attempts=F("attempts") + 1
+        )
+        if claimed:
+            return MediaUploadJob.objects.select_related("memory").get(pk=pk)
+    return None
+
+
+class JobSuperseded(Exception):
+    """The job was reclaimed by another worker while this one was uploading it"""
+
+
+def _owned(job):
+    """The job's row while this claim still owns it: every claim increments attempts"""
+    return MediaUploadJob.objects.filter(pk=job.pk, status="processing", attempts=job.attempts)
+
+
+def _finish(job, **fields):
+    # Queryset update: a job deleted with its memory meanwhile is not re-inserted by save().
+    # Conditional on the claim, so a superseded worker cannot overwrite the new owner's state.
+    return _owned(job).update(updated_at=timezone.now(), **fields)
+
+
+@contextmanager
+def _heartbeat(job):
+    """
+    Refresh the claimed job's updated_at every UPLOAD_JOB_HEARTBEAT_SECONDS while the upload
+    runs, so a long upload is never mistaken for one whose worker died.
+    """
+    stop = threading.Event()
+
+    def beat():
+        try:
+            while not stop.wait(settings.UPLOAD_JOB_HEARTBEAT_SECONDS):
+                if not _owned(job).update(updated_at=timezone.now()):
+                    return  # reclaimed, or deleted with its memory
+        finally:
+            connection.close()  # this thread's own connection
+
+    thread = threading.Thread(target=beat, name=f"upload-job-{job.pk}-heartbeat", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def process_job(job, storage=None):
+    """
+    Upload a claimed job and create its row; failures are retried with exponential backoff.
+    If the job was reclaimed meanwhile (the worker stalled past UPLOAD_JOB_STALE_SECONDS),
+    only the claim that finishes first creates the row; the other returns False.
+    """
+    storage = storage or get_media_storage()
+    result = asset = None
+    try:
+        digest = (job.sha256, job.size) if job.sha256 else None
+        with _heartbeat(job):
+            result, asset = store_for(
+                job.memory, job.kind, job.spool_path, filename=job.original_name or None,
+                storage=storage, digest=digest,
+            )
+        with transaction.atomic():
+            # Marking it done first locks the row: of two claims racing to finish, only
+            # one gets past here and creates the media row
+            if not _finish(job, status="succeeded", last_error="", finished_at=timezone.now()):
+                raise JobSuperseded()
+            instance = create_media(job.memory, job.kind, job.metadata, result, asset)
+            MediaUploadJob.objects.filter(pk=job.pk).update(result_id=instance.pk)
+    except JobSuperseded:
+        print(f"⚠️ {job.kind} upload {job.pk} was reclaimed by another worker; discarding this copy")
+        if asset is None:  # not shared through a StoredAsset: nothing else references it
+            for public_id in (result["public_id"], result.get("original_public_id")):
+                delete_stored(_backend_path(storage), public_id, result["resource_type"])
+        release_unused([asset])
+        return False
+    except Exception as e:
+        # A retry takes a new reference; a fresh asset nobody else uses goes with this one
+        release_unused([asset])
+        error = f"{type(e).__name__}: {e}"[:2000]
+        if job.attempts >= settings.UPLOAD_JOB_MAX_ATTEMPTS:
+            if _finish(job, status="failed", last_error=error, finished_at=timezone.now()):
+                _remove_spool(job)
+        else:
+            delay = settings.UPLOAD_JOB_RETRY_DELAY * 2 ** (job.attempts - 1)
+            _finish(job, status="pending", last_error=error, available_at=timezone.now() + timedelta(seconds=delay))
+        return False
+    _remove_spool(job)
+    return True
+
+
+def _remove_spool(job):
+    try:
+        os.remove(job.spool_path)
+    except FileNotFoundError:
+        pass
+
+
+# ------------------ RESUMABLE SESSIONS ------------------ #
+
+SESSION_READ_SIZE = 1024 * 1024  # bytes read from the request body per write
+
+
+def session_expiry():
+    return timezone.now() + timedelta(hours=settings.UPLOAD_SESSION_TTL_HOURS)
+
+
+def open_session(memory, kind, filename, size, metadata, user):
+    session = UploadSession.objects.create(
+        memory=memory, created_by=user, kind=kind, filename=filename[:255], size=size,
+        metadata=metadata, expires_at=session_expiry(),
+    )
+    os.makedirs(settings.MEDIA_SPOOL_DIR, exist_ok=True)
+    session.path = os.path.join(settings.MEDIA_SPOOL_DIR, f"{session.pk.hex}.part")
+    open(session.path, "wb").close()
+    UploadSession.objects.filter(pk=session.pk).update(path=session.path)
+    return session
+
+
+def write_chunk(session, offset, stream, length):
+    """
+    Stream `length` bytes from `stream` into the session file at `offset` (the caller checked
+    it equals session.received). Bytes that arrived before a dropped connection are kept, so
+    the client resumes from wherever the transfer stopped. Returns (received, complete) where
+    complete is False if the body ended early or another request advanced the offset first.
+    """
+    written = 0
+    with open(session.path, "r+b") as out:
+        out.seek(offset)
+        try:
+            while written < length:
+                chunk = stream.read(min(SESSION_READ_SIZE, length - written))
+                if not chunk:
+                    break
+                out.write(chunk)
+                written += len(chunk)
+        except OSError:  # UnreadablePostError: client went away mid-chunk
+            pass
+        out.truncate()
+    # Conditional update: of two requests racing for the same offset only one advances it
+    advanced = UploadSession.objects.filter(pk=session.pk, status="active", received=offset).update(
+        received=offset + written, expires_at=session_expiry(), updated_at=timezone.now()
+    )
+    session.refresh_from_db()
+    return session.received, bool(advanced) and written == length
+
+
+def complete_session(session, user=None):
+    """
+    Hand a fully received file to the upload pipeline: a MediaUploadJob that takes over the
+    file (MEDIA_UPLOADS_ASYNC), or an inline upload. Returns the updated session, or None if
+    the upload is not complete or another request already completed it.
+    """
+    claimed = UploadSession.objects.filter(pk=session.pk, status="active", received=F("size")).update(
+        status="completed", updated_at=timezone.now()
+    )
+    if not claimed:
+        return None
+    if settings.MEDIA_UPLOADS_ASYNC:
+        job = enqueue_spooled(session.memory, session.kind, session.path, session.filename, session.size,
+                              session.metadata, user)
+        UploadSession.objects.filter(pk=session.pk).update(job=job, path="")
+    else:
+        try:
+            result, asset = store_for(session.memory, session.kind, session.path, filename=session.filename)
+            try:
+                instance = create_media(session.memory, session.kind, session.metadata, result, asset)
+            except Exception:
+                release_unused([asset])
+                raise
+        except Exception:
+            # Keep the received file so completing can simply be retried
+            UploadSession.objects.filter(pk=session.pk).update(status="active")
+            raise
+        os.remove(session.path)
+        UploadSession.objects.filter(pk=session.pk).update(result_id=instance.pk, path="")
+    session.refresh_from_db()
+    return session
+
+
+# ------------------ DIRECT (SIGNED) UPLOADS ------------------ #
+
+DIRECT_UPLOAD_SALT = "api.media.direct-upload"
+DIRECT_UPLOAD_KINDS = ("image", "video", "recording")
+
+
+class DirectUploadError(Exception):
+    pass
+
+
+def sign_direct_upload(memory, kind, metadata, user, storage=None):
+    """
+    Let the client upload one file straight to storage. The storage signature pins the
+    public_id (folder/memory_<id>/<random>); the token carries the memory, kind, user and
+    validated metadata to confirm_direct_upload(), signed with SECRET_KEY.
+    """
+    spec = MEDIA_KINDS[kind]
+    storage = storage or get_media_storage()
+    if not hasattr(storage, "sign_upload"):
+        raise DirectUploadError("The configured media storage does not accept direct uploads")
+    public_id = f"{spec['folder']}/memory_{memory.id}/{uuid.uuid4().hex}"
+    upload = storage.sign_upload(public_id, spec["resource_type"])
+    token = signing.dumps(
+        {"memory": memory.id, "kind": kind, "user": user.id, "public_id": public_id, "metadata": metadata},
+        salt=DIRECT_UPLOAD_SALT, compress=True,
+    )
+    return {**upload, "public_id": public_id, "token": token}
+
+
+def read_direct_upload_token(token):
+    try:
+        return signing.loads(token, salt=DIRECT_UPLOAD_SALT, max_age=settings.DIRECT_UPLOAD_TTL_SECONDS)
+    except signing.SignatureExpired:
+        raise DirectUploadError("Upload token expired")
+    except signing.BadSignature:
+        raise DirectUploadError("Invalid upload token")
+
+
+def confirm_direct_upload(memory, claim, response, storage=None):
+    """
+    Create the media row for a finished direct upload. `claim` is the decoded token and
+    `response` what storage returned to the client (public_id, version, signature, format,
+    duration). Confirming the same upload twice returns the existing row: (instance, created).
+    """
+    kind = claim["kind"]
+    spec = MEDIA_KINDS[kind]
+    storage = storage or get_media_storage()
+    public_id = response.get("public_id")
+    if public_id != claim["public_id"]:
+        raise DirectUploadError("public_id does not match the issued upload")
+    if not storage.verify_upload(public_id, response.get("version"), response.get("signature") or ""):
+        raise DirectUploadError("Upload signature verification failed")
+    fmt = str(response.get("format") or "")
+    if fmt and not re.fullmatch(r"[A-Za-z0-9]{1,10}", fmt):
+        raise DirectUploadError("Invalid format")
+
+    try:
+        duration = float(response.get("duration") or 0) or None
+    except (TypeError, ValueError):
+        duration = None
+    result = {
+        "url": storage.delivery_url(public_id, spec["resource_type"], response.get("version"), fmt or None),
+        "file": None,
+        "duration": duration,
+        "public_id": public_id,
+        "resource_type": spec["resource_type"],
+        "bytes": _positive_int(response.get("bytes")),
+        # The file never passes through us, so images get no placeholder here
+        "width": _positive_int(response.get("width")),
+        "height": _positive_int(response.get("height")),
+    }
+    fields = upload_fields(kind, result)
+    existing = spec["model"].objects.filter(memory=memory, **{spec["url_field"]: fields[spec["url_field"]]}).first()
+    if existing:
+        return existing, False
+    return create_media(memory, kind, claim["metadata"], result), True
+
+
+def _positive_int(value):
+    try:
+        return max(int(value), 0) or None
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-16 22:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_memorycomment_memoryimage_memorylike_memoryperson_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='memory',
+            index=models.Index(fields=['user', '-id'], name='memory_user_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='memory',
+            index=models.Index(fields=['user', '-date', '-id'], name='memory_user_date_id_idx'),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 5.2.4 on 2026-10-16 22:23
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+COUNTER_SOURCES = {
+    "images_count": "MemoryImage",
+    "videos_count": "MemoryVideo",
+    "recordings_count": "MemoryVoiceRecording",
+    "people_count": "MemoryPerson",
+    "tags_count": "MemoryTag",
+    "likes_count": "MemoryLike",
+    "comments_count": "MemoryComment",
+}
+
+
+def backfill_counters(apps, schema_editor):
+    Memory = apps.get_model("api", "Memory")
+    updates = {}
+    for field, model_name in COUNTER_SOURCES.items():
+        child = apps.get_model("api", model_name)
+        counts = (
+            child.objects.filter(memory=OuterRef("pk"))
+            .order_by().values("memory").annotate(c=Count("pk")).values("c")
+        )
+        updates[field] = Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+    Memory.objects.update(**updates)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_memory_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='memory',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='memory',
+            name='images_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='memory',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='memory',
+            name='people_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='memory',
+            name='recordings_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='memory',
+            name='tags_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='memory',
+            name='videos_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.2.4 on 2026-10-16 22:26
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F, Max
+
+
+def backfill(apps, schema_editor):
+    Memory = apps.get_model("api", "Memory")
+    TimelineVersion = apps.get_model("api", "TimelineVersion")
+    Memory.objects.update(updated_at=F("created_at"))
+    TimelineVersion.objects.bulk_create([
+        TimelineVersion(patient_id=row["user_id"], version=1, updated_at=row["latest"])
+        for row in Memory.objects.values("user_id").annotate(latest=Max("created_at")).order_by()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_memory_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='memory',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.CreateModel(
+            name='TimelineVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('patient', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='timeline_version', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
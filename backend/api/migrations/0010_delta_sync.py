@@ -0,0 +1,65 @@
+# Generated by Django 5.2.4 on 2026-10-16 22:29
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_media_updated_at(apps, schema_editor):
+    for name in ("MemoryImage", "MemoryVideo", "MemoryVoiceRecording"):
+        apps.get_model("api", name).objects.update(updated_at=F("created_at"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_memory_updated_at_timeline_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('object_type', models.CharField(choices=[('memory', 'Memory'), ('image', 'Image'), ('video', 'Video'), ('recording', 'Voice recording')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('memory_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'ordering': ['deleted_at', 'id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='memoryimage',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='memoryvideo',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='memoryvoicerecording',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='memory',
+            index=models.Index(fields=['user', 'updated_at'], name='memory_user_updated_idx'),
+        ),
+        migrations.AddField(
+            model_name='synctombstone',
+            name='patient',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sync_tombstones', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='synctombstone',
+            index=models.Index(fields=['patient', 'deleted_at'], name='api_synctom_patient_bb0531_idx'),
+        ),
+        migrations.RunPython(backfill_media_updated_at, migrations.RunPython.noop),
+    ]
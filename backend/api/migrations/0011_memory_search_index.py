@@ -0,0 +1,26 @@
+# Generated by Django 5.2.4 on 2026-10-16 22:31
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    from api.search import rebuild_index
+    # FTS5 table on SQLite, tsvector + GIN table on PostgreSQL, nothing elsewhere
+    rebuild_index(apps=apps, conn=schema_editor.connection)
+
+
+def drop_search_index(apps, schema_editor):
+    from api.search import get_backend
+    with schema_editor.connection.cursor() as cursor:
+        get_backend(schema_editor.connection).drop(cursor)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_delta_sync'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
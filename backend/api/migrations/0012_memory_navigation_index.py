@@ -0,0 +1,19 @@
+# Generated by Django 5.2.4 on 2026-10-16 22:33
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_memory_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='memory',
+            index=models.Index(fields=['user', '-created_at', '-id'], name='memory_user_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,52 @@
+# Generated by Django 5.2.4 on 2026-10-16 22:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_upload_sessions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredAsset',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64)),
+                ('size', models.PositiveBigIntegerField()),
+                ('resource_type', models.CharField(max_length=10)),
+                ('storage', models.CharField(max_length=200)),
+                ('url', models.URLField(blank=True, max_length=600, null=True)),
+                ('file', models.CharField(blank=True, max_length=500)),
+                ('public_id', models.CharField(blank=True, max_length=500)),
+                ('duration', models.FloatField(blank=True, null=True)),
+                ('ref_count', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stored_assets', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='memoryimage',
+            name='asset',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.storedasset'),
+        ),
+        migrations.AddField(
+            model_name='memoryvideo',
+            name='asset',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.storedasset'),
+        ),
+        migrations.AddField(
+            model_name='memoryvoicerecording',
+            name='asset',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.storedasset'),
+        ),
+        migrations.AddConstraint(
+            model_name='storedasset',
+            constraint=models.UniqueConstraint(fields=('patient', 'sha256', 'size', 'resource_type'), name='stored_asset_content_uniq'),
+        ),
+    ]
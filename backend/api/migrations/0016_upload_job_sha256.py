@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-16 22:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_stored_assets'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediauploadjob',
+            name='sha256',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
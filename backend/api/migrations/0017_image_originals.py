@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-16 22:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_upload_job_sha256'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='memory',
+            name='original_url',
+            field=models.URLField(blank=True, max_length=600, null=True),
+        ),
+        migrations.AddField(
+            model_name='memoryimage',
+            name='original_url',
+            field=models.URLField(blank=True, max_length=600, null=True),
+        ),
+        migrations.AddField(
+            model_name='storedasset',
+            name='original_public_id',
+            field=models.CharField(blank=True, max_length=500),
+        ),
+        migrations.AddField(
+            model_name='storedasset',
+            name='original_url',
+            field=models.URLField(blank=True, max_length=600, null=True),
+        ),
+    ]
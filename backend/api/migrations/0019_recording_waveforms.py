@@ -0,0 +1,23 @@
+# Generated by Django 5.2.4 on 2026-10-16 23:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0018_image_dimensions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='memoryvoicerecording',
+            name='waveform_peaks',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='storedasset',
+            name='waveform',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
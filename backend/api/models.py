@@ -1,10 +1,15 @@
 # api/models.py
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils import timezone
-from django.db.models.signals import post_delete
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+from django.db.models.signals import m2m_changed, post_delete, post_save
 from django.dispatch import receiver
+import os
 import secrets
+import uuid
+import weakref
 
 
 class FamilyMember(models.Model):
@@ -43,20 +48,49 @@ class Memory(models.Model):
 
     # Cloudinary delivery URL (preferred going forward)
     image_url = models.URLField(max_length=600, blank=True, null=True)
+    # Unmodified upload, when IMAGE_KEEP_ORIGINAL keeps it next to the normalized image
+    original_url = models.URLField(max_length=600, blank=True, null=True)
+    # Measured at upload (api.normalize): layout size and inline LQIP data URI of the cover
+    image_width = models.PositiveIntegerField(blank=True, null=True)
+    image_height = models.PositiveIntegerField(blank=True, null=True)
+    image_placeholder = models.TextField(blank=True)
 
     # Optional: people tagging
     members = models.ManyToManyField('FamilyMember', blank=True, related_name="memories")
 
     created_at = models.DateTimeField(auto_now_add=True)
+    # Advances on any change to the memory or its media, people, tags, likes and comments
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Denormalized counters - kept in sync by the signals at the bottom of this module.
+    # Run `manage.py reconcile_memory_counters` to repair any drift.
+    images_count = models.PositiveIntegerField(default=0)
+    videos_count = models.PositiveIntegerField(default=0)
+    recordings_count = models.PositiveIntegerField(default=0)
+    people_count = models.PositiveIntegerField(default=0)
+    tags_count = models.PositiveIntegerField(default=0)
+    likes_count = models.PositiveIntegerField(default=0)
+    comments_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination: WHERE user_id IN (...) ORDER BY id / date, id
+            models.Index(fields=["user", "-id"], name="memory_user_id_idx"),
+            models.Index(fields=["user", "-date", "-id"], name="memory_user_date_id_idx"),
+            # Delta sync: WHERE user_id IN (...) AND updated_at >= since
+            models.Index(fields=["user", "updated_at"], name="memory_user_updated_idx"),
+            # Detail view navigation: seek to the neighbours in (created_at, id) order
+            models.Index(fields=["user", "-created_at", "-id"], name="memory_user_created_id_idx"),
+        ]
 
     def get_media_counts(self):
-        """Get counts of all media types for this memory"""
+        """Get counts of all media types for this memory (no queries - reads the counters)"""
         return {
-            'images': self.images.count(),
-            'videos': self.videos.count(), 
-            'voice_recordings': self.voice_recordings.count(),
-            'people': self.tagged_people.count(),
-            'tags': self.event_tags.count()
+            'images': self.images_count,
+            'videos': self.videos_count,
+            'voice_recordings': self.recordings_count,
+            'people': self.people_count,
+            'tags': self.tags_count
         }
 
     def __str__(self):
@@ -65,14 +99,67 @@ class Memory(models.Model):
 
 # ------------------ MEMORY MEDIA MODELS ------------------ #
 
+class StoredAsset(models.Model):
+    """
+    One uploaded file in media storage, shared by every media row of the patient with the
+    same content (SHA-256 + size). ref_count counts the rows pointing at it plus uploads
+    about to create one: the reference is taken when the asset is found or recorded (see
+    api.media) and handed over to the new row, or released if the row is never created.
+    The stored file is deleted with the asset when the last reference goes.
+    """
+    patient = models.ForeignKey(User, on_delete=models.CASCADE, related_name="stored_assets")
+    sha256 = models.CharField(max_length=64)
+    size = models.PositiveBigIntegerField()
+    resource_type = models.CharField(max_length=10)  # storage resource type: "image" or "video"
+    storage = models.CharField(max_length=200)  # MEDIA_STORAGE_BACKEND that holds the file
+    url = models.URLField(max_length=600, blank=True, null=True)
+    file = models.CharField(max_length=500, blank=True)  # default_storage name (local storage)
+    public_id = models.CharField(max_length=500, blank=True)
+    duration = models.FloatField(blank=True, null=True)  # seconds, as reported by storage
+    original_url = models.URLField(max_length=600, blank=True, null=True)  # kept unnormalized upload
+    original_public_id = models.CharField(max_length=500, blank=True)
+    width = models.PositiveIntegerField(blank=True, null=True)  # images: see Memory.image_width
+    height = models.PositiveIntegerField(blank=True, null=True)
+    placeholder = models.TextField(blank=True)
+    waveform = models.JSONField(blank=True, null=True)  # audio: see MemoryVoiceRecording.waveform_peaks
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["patient", "sha256", "size", "resource_type"], name="stored_asset_content_uniq"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.resource_type} {self.sha256[:12]} ({self.size} bytes, {self.ref_count} refs)"
+
+    def as_result(self):
+        """The storage upload result this asset was created from (see api.storage)"""
+        return {
+            "url": self.url, "file": self.file or None, "duration": self.duration,
+            "public_id": self.public_id, "resource_type": self.resource_type, "bytes": self.size,
+            "original_url": self.original_url, "original_public_id": self.original_public_id,
+            "width": self.width, "height": self.height, "placeholder": self.placeholder,
+            "waveform": self.waveform,
+        }
+
+
 class MemoryImage(models.Model):
     """Multiple images per memory"""
     memory = models.ForeignKey(Memory, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to="memory_images/", blank=True, null=True)
     image_url = models.URLField(max_length=600, blank=True, null=True)  # Cloudinary URL
+    original_url = models.URLField(max_length=600, blank=True, null=True)  # see Memory.original_url
+    width = models.PositiveIntegerField(blank=True, null=True)  # see Memory.image_width
+    height = models.PositiveIntegerField(blank=True, null=True)
+    placeholder = models.TextField(blank=True)
+    asset = models.ForeignKey(StoredAsset, on_delete=models.SET_NULL, blank=True, null=True, related_name="+")
     caption = models.CharField(max_length=255, blank=True)
     order = models.PositiveIntegerField(default=0)  # For ordering images
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # Delta sync
 
     class Meta:
         ordering = ['order', 'created_at']
@@ -89,12 +176,14 @@ class MemoryVideo(models.Model):
     memory = models.ForeignKey(Memory, on_delete=models.CASCADE, related_name='videos')
     video = models.FileField(upload_to="memory_videos/", blank=True, null=True)
     video_url = models.URLField(max_length=600, blank=True, null=True)  # Cloudinary URL
+    asset = models.ForeignKey(StoredAsset, on_delete=models.SET_NULL, blank=True, null=True, related_name="+")
     thumbnail_url = models.URLField(max_length=600, blank=True, null=True)
     caption = models.CharField(max_length=255, blank=True)
     duration = models.DurationField(blank=True, null=True)
     file_size = models.PositiveBigIntegerField(blank=True, null=True)  # File size in bytes
     order = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # Delta sync
 
     class Meta:
         ordering = ['order', 'created_at']
@@ -111,13 +200,16 @@ class MemoryVoiceRecording(models.Model):
     memory = models.ForeignKey(Memory, on_delete=models.CASCADE, related_name='voice_recordings')
     audio = models.FileField(upload_to="memory_audio/", blank=True, null=True)
     audio_url = models.URLField(max_length=600, blank=True, null=True)  # Cloudinary URL
+    asset = models.ForeignKey(StoredAsset, on_delete=models.SET_NULL, blank=True, null=True, related_name="+")
     speaker_name = models.CharField(max_length=100, blank=True)  # Who's speaking
     speaker_relation = models.CharField(max_length=100, blank=True)  # e.g., "Daughter", "Son"
     duration = models.DurationField(blank=True, null=True)
     file_size = models.PositiveBigIntegerField(blank=True, null=True)  # File size in bytes
     transcript = models.TextField(blank=True)  # Optional transcript
     waveform_data = models.JSONField(blank=True, null=True)  # For audio waveform visualization
+    waveform_peaks = models.JSONField(blank=True, null=True)  # computed at upload, see api.waveforms
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # Delta sync
 
     class Meta:
         ordering = ['created_at']
@@ -222,6 +314,138 @@ class PatientConnectCode(models.Model):
         return f"{raw[:4]}-{raw[4:]}"
 
 
+# ------------------ PATIENT TIMELINE VERSION ------------------ #
+class TimelineVersion(models.Model):
+    """
+    Monotonic version of a patient's timeline, bumped on every write to the patient's
+    memories or their media. Used for ETags and as part of cache keys.
+    """
+    patient = models.OneToOneField(User, on_delete=models.CASCADE, related_name="timeline_version")
+    version = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.patient_id} v{self.version}"
+
+    @classmethod
+    def bump(cls, patient_id):
+        now = timezone.now()
+        updates = {"version": F("version") + 1, "updated_at": now}
+        if cls.objects.filter(patient_id=patient_id).update(**updates):
+            return
+        _, created = cls.objects.get_or_create(patient_id=patient_id, defaults={"version": 1, "updated_at": now})
+        if not created:
+            # Lost a creation race - still record our write
+            cls.objects.filter(patient_id=patient_id).update(**updates)
+
+
+# ------------------ DELTA SYNC TOMBSTONES ------------------ #
+class SyncTombstone(models.Model):
+    """Records a hard delete so /api/memories/changes/ can tell clients what disappeared"""
+    TYPE_CHOICES = [
+        ("memory", "Memory"),
+        ("image", "Image"),
+        ("video", "Video"),
+        ("recording", "Voice recording"),
+    ]
+    patient = models.ForeignKey(User, on_delete=models.CASCADE, related_name="sync_tombstones")
+    object_type = models.CharField(max_length=10, choices=TYPE_CHOICES)
+    object_id = models.BigIntegerField()
+    memory_id = models.BigIntegerField()
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ["deleted_at", "id"]
+        indexes = [
+            models.Index(fields=["patient", "deleted_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.object_type} {self.object_id} deleted {self.deleted_at:%Y-%m-%d %H:%M}"
+
+
+# ------------------ ASYNC MEDIA UPLOADS ------------------ #
+class MediaUploadJob(models.Model):
+    """An upload spooled to disk, pushed to storage by `manage.py process_upload_jobs`"""
+    KIND_CHOICES = [
+        ("memory", "Memory image"),
+        ("image", "Image"),
+        ("video", "Video"),
+        ("recording", "Voice recording"),
+    ]
+    STATUS_CHOICES = [
+        ("pending", "Pending"),
+        ("processing", "Processing"),
+        ("succeeded", "Succeeded"),
+        ("failed", "Failed"),
+    ]
+    memory = models.ForeignKey(Memory, on_delete=models.CASCADE, related_name="upload_jobs")
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name="upload_jobs")
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="pending")
+    spool_path = models.CharField(max_length=500)
+    original_name = models.CharField(max_length=255, blank=True)
+    size = models.PositiveBigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True)  # from the upload handler, if it hashed the file
+    metadata = models.JSONField(default=dict, blank=True)  # validated caption/order/speaker fields
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    result_id = models.BigIntegerField(blank=True, null=True)  # pk of the created media row
+    available_at = models.DateTimeField(default=timezone.now)  # retry backoff
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        ordering = ["created_at", "id"]
+        indexes = [
+            models.Index(fields=["status", "available_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} upload {self.pk} for memory {self.memory_id} ({self.status})"
+
+
+class UploadSession(models.Model):
+    """
+    A resumable chunked upload: chunks are appended to `path` at the offset the client sends,
+    and the finished file is handed to the upload pipeline (MediaUploadJob or inline upload).
+    """
+    KIND_CHOICES = [
+        ("image", "Image"),
+        ("video", "Video"),
+        ("recording", "Voice recording"),
+    ]
+    STATUS_CHOICES = [
+        ("active", "Active"),
+        ("completed", "Completed"),
+    ]
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)  # unguessable upload URL
+    memory = models.ForeignKey(Memory, on_delete=models.CASCADE, related_name="upload_sessions")
+    created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name="upload_sessions")
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default="active")
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()  # declared total
+    received = models.PositiveBigIntegerField(default=0)  # bytes on disk = next expected offset
+    path = models.CharField(max_length=500, blank=True)  # partial file; cleared once handed over
+    metadata = models.JSONField(default=dict, blank=True)
+    job = models.ForeignKey(MediaUploadJob, on_delete=models.SET_NULL, null=True, blank=True, related_name="+")
+    result_id = models.BigIntegerField(blank=True, null=True)  # media row created inline
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    expires_at = models.DateTimeField()  # pushed forward by every chunk
+
+    class Meta:
+        ordering = ["created_at"]
+        indexes = [
+            models.Index(fields=["expires_at"]),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} upload session {self.pk} ({self.received}/{self.size} bytes)"
+
+
 # ------------------ MEMORY INTERACTION MODELS (Optional - for likes, comments, etc.) ------------------ #
 
 class MemoryLike(models.Model):
@@ -319,12 +543,22 @@ def delete_corresponding_family_member(sender, instance, **kwargs):
         post_delete.connect(delete_corresponding_family_link, sender=FamilyMember)
 
 
+# ------------------ ACCESS CACHE INVALIDATION ------------------ #
+
+@receiver(post_save, sender=FamilyLink)
+@receiver(post_delete, sender=FamilyLink)
+def invalidate_family_access(sender, instance, **kwargs):
+    """Any change to a link changes which patients the family user can see"""
+    from .access import invalidate_access
+    invalidate_access(instance.family_member_id)
+
+
 # ------------------ CASCADE DELETION FOR MEMORY MEDIA ------------------ #
 
 @receiver(post_delete, sender=MemoryImage)
 def cleanup_memory_image_files(sender, instance, **kwargs):
     """Clean up image files when MemoryImage is deleted"""
-    if instance.image:
+    if instance.image and not instance.asset_id:  # shared files are released with their asset
         try:
             instance.image.delete(save=False)
         except:
@@ -334,7 +568,7 @@ def cleanup_memory_image_files(sender, instance, **kwargs):
 @receiver(post_delete, sender=MemoryVideo)
 def cleanup_memory_video_files(sender, instance, **kwargs):
     """Clean up video files when MemoryVideo is deleted"""
-    if instance.video:
+    if instance.video and not instance.asset_id:  # shared files are released with their asset
         try:
             instance.video.delete(save=False)
         except:
@@ -344,8 +578,264 @@ def cleanup_memory_video_files(sender, instance, **kwargs):
 @receiver(post_delete, sender=MemoryVoiceRecording)
 def cleanup_memory_audio_files(sender, instance, **kwargs):
     """Clean up audio files when MemoryVoiceRecording is deleted"""
-    if instance.audio:
+    if instance.audio and not instance.asset_id:  # shared files are released with their asset
         try:
             instance.audio.delete(save=False)
         except:
             pass  # File might not exist
+
+
+# ------------------ STORED ASSET REFERENCES ------------------ #
+
+def acquire_asset(asset, n=1):
+    """
+    Take `n` references on `asset` for rows about to be created. False if the asset was
+    deleted meanwhile (its last row went): the caller must upload the content again.
+    """
+    return StoredAsset.objects.filter(pk=asset.pk).update(ref_count=F("ref_count") + n) == 1
+
+
+def release_assets(asset_counts):
+    """
+    Drop references ({asset_id: n}) - for deleted rows, or for references taken by
+    acquire_asset() whose rows were never created. An asset left without references is
+    deleted together with its stored file.
+    """
+    for asset_id, n in asset_counts.items():
+        StoredAsset.objects.filter(pk=asset_id).update(ref_count=Greatest(F("ref_count") - n, Value(0)))
+        # Conditional delete: a reference taken meanwhile keeps it alive
+        StoredAsset.objects.filter(pk=asset_id, ref_count=0).delete()
+
+
+@receiver(post_delete, sender=MemoryImage)
+@receiver(post_delete, sender=MemoryVideo)
+@receiver(post_delete, sender=MemoryVoiceRecording)
+def release_stored_asset(sender, instance, **kwargs):
+    if not instance.asset_id or _deleting_patient(kwargs, instance):
+        return  # the patient's assets are cascade-deleted themselves
+    release_assets({instance.asset_id: 1})
+
+
+@receiver(post_delete, sender=StoredAsset)
+def delete_stored_asset_file(sender, instance, **kwargs):
+    """Remove the file from media storage once the deletion is committed"""
+    from .storage import delete_stored
+
+    transaction.on_commit(lambda: delete_stored(instance.storage, instance.public_id, instance.resource_type))
+    if instance.original_public_id:
+        transaction.on_commit(
+            lambda: delete_stored(instance.storage, instance.original_public_id, instance.resource_type)
+        )
+
+
+# ------------------ DENORMALIZED MEMORY COUNTERS ------------------ #
+
+# Child model -> counter column on Memory
+MEMORY_COUNTER_FIELDS = {
+    MemoryImage: "images_count",
+    MemoryVideo: "videos_count",
+    MemoryVoiceRecording: "recordings_count",
+    MemoryPerson: "people_count",
+    MemoryTag: "tags_count",
+    MemoryLike: "likes_count",
+    MemoryComment: "comments_count",
+}
+
+
+def touch_memory(memory_id, patient_id=None, **counter_deltas):
+    """
+    Record a change to a memory's children: apply counter deltas (e.g. images_count=3) with
+    F() expressions so concurrent writers never lose an update, advance the memory's
+    updated_at and bump the patient's timeline version.
+    Paths that bypass model signals (bulk_create, queryset.update) must call this themselves.
+    """
+    updates = {
+        field: Greatest(F(field) + delta, Value(0))
+        for field, delta in counter_deltas.items() if delta
+    }
+    updates["updated_at"] = timezone.now()
+    Memory.objects.filter(pk=memory_id).update(**updates)
+    if patient_id is None:
+        patient_id = Memory.objects.filter(pk=memory_id).values_list("user_id", flat=True).first()
+    if patient_id is not None:
+        TimelineVersion.bump(patient_id)
+
+
+def touch_memories(counter, deltas, patient_ids=()):
+    """
+    touch_memory for many memories at once: `deltas` maps memory id -> change of `counter`.
+    One UPDATE per distinct delta, then one timeline bump per patient in `patient_ids`
+    (callers that bump themselves leave it empty).
+    """
+    now = timezone.now()
+    by_delta = {}
+    for memory_id, delta in deltas.items():
+        by_delta.setdefault(delta, []).append(memory_id)
+    for delta, memory_ids in by_delta.items():
+        Memory.objects.filter(pk__in=memory_ids).update(
+            **{counter: Greatest(F(counter) + delta, Value(0))}, updated_at=now
+        )
+    for patient_id in sorted(set(patient_ids)):
+        TimelineVersion.bump(patient_id)
+
+
+# QuerySet origin of a user delete -> ids of the users it removes (read once per delete)
+_deleted_user_ids = weakref.WeakKeyDictionary()
+
+
+def _deleting_patient(signal_kwargs, instance):
+    """
+    True while the patient owning `instance` is being deleted with their account, by
+    user.delete() or a queryset delete such as the admin's "Delete selected users". Their
+    timeline version and tombstones are cascade-deleted too, so bookkeeping rows written
+    now would violate their FK. Deleting anyone else (e.g. a family user, taking their
+    likes and comments along) still updates the patient's bookkeeping.
+    """
+    origin = signal_kwargs.get("origin")
+    if isinstance(origin, User):
+        user_ids = {origin.pk}
+    elif isinstance(origin, models.QuerySet) and issubclass(origin.model, User):
+        user_ids = _deleted_user_ids.get(origin)
+        if user_ids is None:
+            user_ids = _deleted_user_ids[origin] = set(origin.values_list("pk", flat=True))
+    else:
+        return False
+    if isinstance(instance, (Memory, FamilyMember)):
+        return instance.user_id in user_ids
+    patient_id = _patient_id_of(instance)
+    if patient_id is None:
+        # Children are deleted before their memory, so the row is still there
+        patient_id = Memory.objects.filter(pk=instance.memory_id).values_list("user_id", flat=True).first()
+    return patient_id is None or patient_id in user_ids
+
+
+def _patient_id_of(instance):
+    """The owning patient of a memory child, without a query when the memory is already loaded"""
+    if type(instance).memory.is_cached(instance):
+        return instance.memory.user_id
+    return None
+
+
+def memory_child_saved(sender, instance, created, **kwargs):
+    deltas = {MEMORY_COUNTER_FIELDS[sender]: 1} if created else {}
+    touch_memory(instance.memory_id, _patient_id_of(instance), **deltas)
+
+
+def memory_child_deleted(sender, instance, **kwargs):
+    if _deleting_patient(kwargs, instance):
+        return
+    touch_memory(instance.memory_id, _patient_id_of(instance), **{MEMORY_COUNTER_FIELDS[sender]: -1})
+
+
+for _model in MEMORY_COUNTER_FIELDS:
+    post_save.connect(memory_child_saved, sender=_model, dispatch_uid=f"memory_child_saved_{_model.__name__}")
+    post_delete.connect(memory_child_deleted, sender=_model, dispatch_uid=f"memory_child_deleted_{_model.__name__}")
+
+
+# ------------------ TIMELINE VERSION BUMPS ------------------ #
+
+@receiver(post_save, sender=Memory)
+@receiver(post_delete, sender=Memory)
+def bump_timeline_for_memory(sender, instance, **kwargs):
+    if _deleting_patient(kwargs, instance):
+        return
+    TimelineVersion.bump(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Memory.members.through)
+def touch_memory_members(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if reverse:
+        # instance is a FamilyMember; its memories all belong to the same patient
+        for memory_id in pk_set or ():
+            touch_memory(memory_id, instance.user_id)
+    else:
+        touch_memory(instance.pk, instance.user_id)
+
+
+@receiver(post_save, sender=FamilyMember)
+@receiver(post_delete, sender=FamilyMember)
+def bump_timeline_for_family_member(sender, instance, **kwargs):
+    """members_detail is embedded in the patient's memories"""
+    if _deleting_patient(kwargs, instance):
+        return
+    TimelineVersion.bump(instance.user_id)
+
+
+# ------------------ DELTA SYNC TOMBSTONES ------------------ #
+
+TOMBSTONE_TYPES = {
+    MemoryImage: "image",
+    MemoryVideo: "video",
+    MemoryVoiceRecording: "recording",
+}
+
+
+@receiver(post_delete, sender=Memory)
+def record_memory_tombstone(sender, instance, **kwargs):
+    if _deleting_patient(kwargs, instance):
+        return
+    SyncTombstone.objects.create(
+        patient_id=instance.user_id, object_type="memory", object_id=instance.pk, memory_id=instance.pk
+    )
+
+
+def record_media_tombstone(sender, instance, **kwargs):
+    if _deleting_patient(kwargs, instance):
+        return
+    patient_id = _patient_id_of(instance)
+    if patient_id is None:
+        patient_id = Memory.objects.filter(pk=instance.memory_id).values_list("user_id", flat=True).first()
+    if patient_id is not None:
+        SyncTombstone.objects.create(
+            patient_id=patient_id, object_type=TOMBSTONE_TYPES[sender],
+            object_id=instance.pk, memory_id=instance.memory_id,
+        )
+
+
+for _model in TOMBSTONE_TYPES:
+    post_delete.connect(record_media_tombstone, sender=_model, dispatch_uid=f"sync_tombstone_{_model.__name__}")
+
+
+# ------------------ SEARCH INDEX ------------------ #
+
+SEARCH_INDEXED_CHILDREN = (MemoryTag, MemoryPerson, MemoryVoiceRecording)
+
+
+@receiver(post_save, sender=Memory)
+@receiver(post_delete, sender=Memory)
+def reindex_memory_search(sender, instance, **kwargs):
+    from .search import schedule_reindex
+    schedule_reindex(instance.pk)
+
+
+def reindex_memory_search_for_child(sender, instance, **kwargs):
+    from .search import schedule_reindex
+    schedule_reindex(instance.memory_id)
+
+
+for _model in SEARCH_INDEXED_CHILDREN:
+    post_save.connect(reindex_memory_search_for_child, sender=_model, dispatch_uid=f"search_reindex_{_model.__name__}")
+    post_delete.connect(reindex_memory_search_for_child, sender=_model, dispatch_uid=f"search_reindex_delete_{_model.__name__}")
+
+
+# ------------------ UPLOAD SPOOL CLEANUP ------------------ #
+
+@receiver(post_delete, sender=MediaUploadJob)
+def remove_upload_spool_file(sender, instance, **kwargs):
+    """Jobs deleted with their memory (or pruned) must not leave spooled files behind"""
+    try:
+        os.remove(instance.spool_path)
+    except (FileNotFoundError, IsADirectoryError):
+        pass
+
+
+@receiver(post_delete, sender=UploadSession)
+def remove_upload_session_file(sender, instance, **kwargs):
+    if not instance.path:
+        return
+    try:
+        os.remove(instance.path)
+    except (FileNotFoundError, IsADirectoryError):
+        pass
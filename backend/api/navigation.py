@@ -0,0 +1,65 @@
+# api/navigation.py
+"""
+Previous/next navigation through a timeline ordered newest first by (created_at, id).
+
+Each neighbour is one indexed seek on memory_user_created_id_idx; the position counter is
+a range count cached under the viewer's timeline versions, so it is recomputed only after
+the timeline changes.
+"""
+from django.db.models import OuterRef, Q, Subquery
+
+from . import timeline_cache
+from .models import MemoryImage
+from .variants import local_variant_url, remote_variant_url
+
+def _with_cover(queryset):
+    first_image = MemoryImage.objects.filter(memory=OuterRef("pk")).order_by("order", "created_at")
+    return queryset.annotate(
+        first_image_url=Subquery(first_image.values("image_url")[:1]),
+        first_image_file=Subquery(first_image.values("image")[:1]),
+    ).only("id", "title", "date", "created_at", "image", "image_url")
+
+
+def _newer(memory):
+    return Q(created_at__gt=memory.created_at) | Q(created_at=memory.created_at, id__gt=memory.pk)
+
+
+def _older(memory):
+    return Q(created_at__lt=memory.created_at) | Q(created_at=memory.created_at, id__lt=memory.pk)
+
+
+def neighbours(timeline, memory):
+    """(previous, next) memories around `memory` - previous is the newer one, as in the timeline"""
+    timeline = _with_cover(timeline)
+    previous = timeline.filter(_newer(memory)).order_by("created_at", "id").first()
+    following = timeline.filter(_older(memory)).order_by("-created_at", "-id").first()
+    return previous, following
+
+
+def position(request, access, timeline, memory):
+    """(1-based position, total) of `memory`, cached until one of the viewer's timelines changes"""
+    versions = timeline_cache.timeline_versions(request, access)
+    key = timeline_cache.navigation_key(versions, memory.pk)
+    payload, _ = timeline_cache.get_or_build(
+        key, lambda: [timeline.filter(_newer(memory)).count() + 1, timeline.count()]
+    )
+    return tuple(payload)
+
+
+def summary(request, memory):
+    """id/title/date plus a cover thumbnail: the memory's own image, else its first gallery image"""
+    if memory is None:
+        return None
+    cover = memory.image_url or memory.first_image_url
+    if cover:
+        cover = remote_variant_url(cover, "thumbnail")
+    else:
+        path = memory.image.name if memory.image else memory.first_image_file
+        if path:
+            cover = request.build_absolute_uri(local_variant_url("thumbnail", path))
+    return {
+        "id": memory.id,
+        "title": memory.title,
+        "date": memory.date,
+        "cover_thumbnail_url": cover,
+    }
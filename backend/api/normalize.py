@@ -0,0 +1,83 @@
+# api/normalize.py
+"""
+Image preparation before upload. Normalization (settings.IMAGE_NORMALIZE) applies the EXIF
+orientation, caps the longest edge at IMAGE_MAX_EDGE and re-encodes to
+IMAGE_NORMALIZE_FORMAT at IMAGE_NORMALIZE_QUALITY. EXIF (including GPS) is not carried
+over. The same pass measures the stored image and renders its placeholder, so clients can
+reserve layout before the image loads. HEIC photos are handled when the optional
+pillow-heif package is installed.
+"""
+import base64
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+try:
+    from pillow_heif import register_heif_opener
+except ImportError:  # optional: without it HEIC uploads are stored as they are
+    register_heif_opener = None
+else:
+    register_heif_opener()
+
+EXTENSIONS = {"WEBP": ".webp", "JPEG": ".jpg"}
+PLACEHOLDER_EDGE = 16  # px, longest edge of the LQIP
+
+
+def prepare_image(file, filename=None, normalize=True):
+    """
+    (normalized, info) for an image about to be uploaded; `file` is a path or a file object
+    (left rewound). normalized is a ContentFile with the normalized image, or None to store
+    `file` unchanged: normalization off, not an image Pillow can read, animated, or already
+    upright, small enough and smaller than its re-encoding. info has the stored image's
+    width, height and placeholder, or is None when Pillow cannot read the file.
+    """
+    fmt = settings.IMAGE_NORMALIZE_FORMAT.upper()
+    options = {"method": 4} if fmt == "WEBP" else {"optimize": True}
+    out = None
+    try:
+        with Image.open(file) as img:
+            animated = getattr(img, "is_animated", False)
+            original_size = img.size
+            orientation = img.getexif().get(0x0112, 1)
+            if normalize and not animated:  # re-encoding an animation would keep only the first frame
+                img = ImageOps.exif_transpose(img)
+                img.thumbnail((settings.IMAGE_MAX_EDGE, settings.IMAGE_MAX_EDGE), Image.Resampling.LANCZOS)
+                if img.mode not in ("RGB", "RGBA") or (fmt == "JPEG" and img.mode == "RGBA"):
+                    has_alpha = "A" in img.getbands() or "transparency" in img.info
+                    img = img.convert("RGBA" if has_alpha and fmt != "JPEG" else "RGB")
+                out = BytesIO()
+                img.save(out, fmt, quality=settings.IMAGE_NORMALIZE_QUALITY, **options)
+                if img.size == original_size and orientation == 1 and out.tell() >= _size(file):
+                    out = None
+            if out is None:
+                img = ImageOps.exif_transpose(img)  # what browsers display for the stored original
+            info = {"width": img.width, "height": img.height, "placeholder": placeholder(img)}
+    except (OSError, Image.DecompressionBombError):
+        return None, None
+    finally:
+        if not isinstance(file, (str, os.PathLike)):
+            file.seek(0)
+
+    if out is None:
+        return None, info
+    stem = os.path.splitext(os.path.basename(filename or getattr(file, "name", None) or str(file)))[0] or "image"
+    return ContentFile(out.getvalue(), name=stem + EXTENSIONS.get(fmt, f".{fmt.lower()}")), info
+
+
+def placeholder(img):
+    """Low-quality image placeholder: a ~16px WebP as a data URI (typically 100-300 bytes)"""
+    tiny = img.copy()
+    tiny.thumbnail((PLACEHOLDER_EDGE, PLACEHOLDER_EDGE), Image.Resampling.BOX)
+    tiny = tiny.convert("RGBA" if "A" in tiny.getbands() or "transparency" in tiny.info else "RGB")
+    out = BytesIO()
+    tiny.save(out, "WEBP", quality=30)
+    return "data:image/webp;base64," + base64.b64encode(out.getvalue()).decode("ascii")
+
+
+def _size(file):
+    if isinstance(file, (str, os.PathLike)):
+        return os.path.getsize(file)
+    return file.size
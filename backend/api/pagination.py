@@ -0,0 +1,208 @@
+# api/pagination.py
+import base64
+import json
+from datetime import date
+
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+# ------------- opaque tokens ------------- #
+def encode_cursor(payload):
+    """Encode a small dict as an opaque, URL-safe token"""
+    raw = json.dumps(payload, separators=(",", ":"), default=str).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token):
+    """Decode a token produced by encode_cursor; raises ValueError when malformed"""
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception as e:
+        raise ValueError(f"Malformed cursor: {e}")
+    if not isinstance(payload, dict):
+        raise ValueError("Malformed cursor")
+    return payload
+
+
+# ------------- keyset pagination ------------- #
+class MemoryCursorPagination(BasePagination):
+    """
+    Keyset (seek) pagination for memory timelines.
+
+    Every ordering ends with "-id" so the position of a row is unique; the cursor
+    stores that position (not an offset), so each page is a single indexed range
+    scan no matter how deep into the timeline the client is.
+    """
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    ordering_query_param = "ordering"
+
+    # ordering name -> model fields (all descending)
+    orderings = {
+        "-id": ("id",),
+        "-date": ("date", "id"),
+    }
+    default_ordering = "-id"
+
+    def __init__(self):
+        self.page_size = getattr(settings, "MEMORIES_PAGE_SIZE", 50)
+        self.max_page_size = getattr(settings, "MEMORIES_MAX_PAGE_SIZE", 200)
+
+    def is_requested(self, request):
+        """Legacy clients that send none of the paging params still get a plain list"""
+        params = request.query_params
+        return any(
+            p in params
+            for p in (self.cursor_query_param, self.page_size_query_param, self.ordering_query_param)
+        )
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def get_ordering(self, request):
+        ordering = request.query_params.get(self.ordering_query_param, self.default_ordering)
+        if ordering not in self.orderings:
+            raise NotFound(f"Unsupported ordering '{ordering}'")
+        return ordering
+
+    def decode_position(self, request, ordering):
+        token = request.query_params.get(self.cursor_query_param)
+        if not token:
+            return None, False
+        try:
+            payload = decode_cursor(token)
+            fields = self.orderings[ordering]
+            if payload.get("o") != ordering or len(payload.get("p", [])) != len(fields):
+                raise ValueError("Cursor does not match ordering")
+            position = [
+                date.fromisoformat(value) if field == "date" else int(value)
+                for field, value in zip(fields, payload["p"])
+            ]
+        except (ValueError, TypeError):
+            raise NotFound("Invalid cursor")
+        return position, bool(payload.get("r"))
+
+    def _seek(self, fields, position, reverse):
+        """Build the row-value comparison (a, b) < (x, y) as OR-ed conjunctions"""
+        lookup = "gt" if reverse else "lt"
+        condition = Q()
+        for i, field in enumerate(fields):
+            clause = Q(**{f"{field}__{lookup}": position[i]})
+            for prev_field, prev_value in zip(fields[:i], position[:i]):
+                clause &= Q(**{prev_field: prev_value})
+            condition |= clause
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.ordering = self.get_ordering(request)
+        self.page_size_used = self.get_page_size(request)
+        fields = self.orderings[self.ordering]
+        position, reverse = self.decode_position(request, self.ordering)
+
+        if position is not None:
+            queryset = queryset.filter(self._seek(fields, position, reverse))
+        if reverse:
+            queryset = queryset.order_by(*fields)
+        else:
+            queryset = queryset.order_by(*[f"-{f}" for f in fields])
+
+        # One extra row tells us whether another page exists; prefetches only run for this slice
+        rows = list(queryset[: self.page_size_used + 1])
+        has_more = len(rows) > self.page_size_used
+        rows = rows[: self.page_size_used]
+        if reverse:
+            rows.reverse()
+            self.has_next = position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        self.page = rows
+        return rows
+
+    def _position(self, obj):
+        return [getattr(obj, f) for f in self.orderings[self.ordering]]
+
+    def _link(self, obj, reverse):
+        url = self.request.build_absolute_uri()
+        token = encode_cursor({"o": self.ordering, "p": self._position(obj), "r": int(reverse)})
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self._link(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self._link(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            "next": self.get_next_link(),
+            "previous": self.get_previous_link(),
+            "page_size": self.page_size_used,
+            "results": data,
+        })
+
+
+# ------------- search pagination ------------- #
+class SearchPagination:
+    """
+    Page-number pagination for ranked search results. Search backends return one page of
+    ids plus the total match count, so this only parses the params and builds the links.
+    """
+    page_query_param = "page"
+    page_size_query_param = "page_size"
+
+    def __init__(self, request):
+        self.request = request
+        self.page_size = self._positive_int(
+            request.query_params.get(self.page_size_query_param),
+            settings.SEARCH_PAGE_SIZE, cutoff=settings.SEARCH_MAX_PAGE_SIZE,
+        )
+        self.page = self._positive_int(request.query_params.get(self.page_query_param), 1)
+
+    @staticmethod
+    def _positive_int(raw, default, cutoff=None):
+        try:
+            value = int(raw)
+        except (TypeError, ValueError):
+            return default
+        if value < 1:
+            return default
+        return min(value, cutoff) if cutoff else value
+
+    @property
+    def offset(self):
+        return (self.page - 1) * self.page_size
+
+    def _link(self, page):
+        url = self.request.build_absolute_uri()
+        if page == 1:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, page)
+
+    def get_paginated_response(self, data, count):
+        return Response({
+            "count": count,
+            "next": self._link(self.page + 1) if self.offset + self.page_size < count else None,
+            "previous": self._link(self.page - 1) if self.page > 1 else None,
+            "page_size": self.page_size,
+            "results": data,
+        })
@@ -0,0 +1,62 @@
+# api/renderers.py
+"""
+Faster renderers for API responses.
+
+ORJSONRenderer is a drop-in replacement for DRF's JSONRenderer (same media type, same
+output for the values our serializers and views emit); MessagePackRenderer answers
+`Accept: application/msgpack`. Values JSON/MessagePack cannot represent natively
+(datetime, date, Decimal, timedelta, lazy strings, ...) are converted by DRF's own
+encoder, so every renderer produces the same representation.
+"""
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # optional - falls back to the stdlib encoder
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional - MessagePack is only offered when installed
+    msgpack = None
+
+
+_drf_default = JSONEncoder().default
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer backed by orjson; falls back to DRF's encoder for anything orjson rejects"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        renderer_context = renderer_context or {}
+        # DRF's datetime format ("Z" suffix, no forced microseconds) instead of orjson's
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.get_indent(accepted_media_type, renderer_context):
+            options |= orjson.OPT_INDENT_2  # the only indent orjson supports
+
+        try:
+            ret = orjson.dumps(data, default=_drf_default, option=options)
+        except orjson.JSONEncodeError:
+            # e.g. integers beyond 64 bits - let the stdlib encoder have a go
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # Keep the output a strict JavaScript subset, as JSONRenderer does
+        if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+        return ret
+
+
+class MessagePackRenderer(BaseRenderer):
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=_drf_default, use_bin_type=True, datetime=False)
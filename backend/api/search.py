@@ -0,0 +1,278 @@
+# api/search.py
+"""
+Full-text search over memories.
+
+One document per memory holds its title, description, location and tag plus the names
+of its event tags, tagged people and recording transcripts. SQLite uses an FTS5 virtual
+table, PostgreSQL a tsvector column with a GIN index; other databases fall back to
+icontains filters. Documents are refreshed on commit by the signals in models.py.
+"""
+import re
+
+from django.db import connection, transaction
+from django.utils.html import escape
+
+FTS_TABLE = "api_memory_fts"        # SQLite FTS5 virtual table (rowid = memory id)
+PG_TABLE = "api_memory_search"      # PostgreSQL table with a tsvector column
+
+HIGHLIGHT_START = "<mark>"
+HIGHLIGHT_END = "</mark>"
+# What the backends put around matches. Documents never contain them (see _clean), so the
+# snippet can be HTML-escaped as a whole before they are turned into <mark> tags.
+MATCH_START = "\x02"
+MATCH_END = "\x03"
+
+
+def _terms(query):
+    """Plain word tokens only - user input never reaches the FTS query syntax"""
+    return re.findall(r"\w+", query or "", re.UNICODE)[:16]
+
+
+def _clean(text):
+    return text.replace(MATCH_START, " ").replace(MATCH_END, " ")
+
+
+def highlight(snippet):
+    """HTML for a backend snippet: the user's text escaped, matches wrapped in <mark>"""
+    if snippet is None:
+        return None
+    return escape(snippet).replace(MATCH_START, HIGHLIGHT_START).replace(MATCH_END, HIGHLIGHT_END)
+
+
+# ------------------ DOCUMENTS ------------------ #
+
+def _models(apps=None):
+    names = ("Memory", "MemoryTag", "MemoryPerson", "MemoryVoiceRecording")
+    if apps is not None:
+        return [apps.get_model("api", name) for name in names]
+    from . import models
+    return [getattr(models, name) for name in names]
+
+
+def build_documents(memory_ids, apps=None):
+    """{memory_id: document dict} for the given memories - four queries for any batch size"""
+    Memory, MemoryTag, MemoryPerson, MemoryVoiceRecording = _models(apps)
+    docs = {
+        row["id"]: {
+            "patient_id": row["user_id"],
+            "title": row["title"],
+            "description": row["description"] or "",
+            "location": " ".join(filter(None, [row["location"], row["tag"]])),
+            "tags": [], "people": [], "transcripts": [],
+        }
+        for row in Memory.objects.filter(pk__in=memory_ids).values(
+            "id", "user_id", "title", "description", "location", "tag"
+        )
+    }
+    related = [
+        (MemoryTag, "tag_name", "tags"),
+        (MemoryPerson, "name", "people"),
+        (MemoryVoiceRecording, "transcript", "transcripts"),
+    ]
+    for model, field, key in related:
+        for memory_id, value in model.objects.filter(memory_id__in=list(docs)).values_list("memory_id", field):
+            if value:
+                docs[memory_id][key].append(value)
+    for doc in docs.values():
+        for key in ("tags", "people", "transcripts"):
+            doc[key] = " ".join(doc[key])
+        for key in ("title", "description", "location", "tags", "people", "transcripts"):
+            doc[key] = _clean(doc[key])
+    return docs
+
+
+# ------------------ BACKENDS ------------------ #
+
+class SqliteSearchBackend:
+    columns = ("title", "description", "location", "tags", "people", "transcripts")
+    # bm25 weights: patient_id (unindexed), then the columns above
+    weights = (0.0, 10.0, 3.0, 2.0, 5.0, 5.0, 1.0)
+
+    def create(self, cursor):
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"patient_id UNINDEXED, {', '.join(self.columns)}, "
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+
+    def drop(self, cursor):
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+
+    def upsert(self, cursor, docs):
+        self.delete(cursor, list(docs))
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, patient_id, {', '.join(self.columns)}) "
+            f"VALUES (%s, %s, {', '.join(['%s'] * len(self.columns))})",
+            [(memory_id, doc["patient_id"], *(doc[c] for c in self.columns)) for memory_id, doc in docs.items()],
+        )
+
+    def delete(self, cursor, memory_ids):
+        if memory_ids:
+            cursor.execute(
+                f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({', '.join(['%s'] * len(memory_ids))})",
+                list(memory_ids),
+            )
+
+    def search(self, cursor, query, patient_ids, limit, offset):
+        terms = _terms(query)
+        if not terms or not patient_ids:
+            return [], 0
+        match = " ".join(f'"{term}"*' for term in terms)
+        scope = ", ".join(["%s"] * len(patient_ids))
+        where = f"{FTS_TABLE} MATCH %s AND patient_id IN ({scope})"
+        params = [match, *patient_ids]
+
+        cursor.execute(f"SELECT count(*) FROM {FTS_TABLE} WHERE {where}", params)
+        total = cursor.fetchone()[0]
+        cursor.execute(
+            f"SELECT rowid, bm25({FTS_TABLE}, {', '.join(map(str, self.weights))}) AS score, "
+            f"snippet({FTS_TABLE}, -1, %s, %s, '…', 12) "
+            f"FROM {FTS_TABLE} WHERE {where} ORDER BY score LIMIT %s OFFSET %s",
+            [MATCH_START, MATCH_END, *params, limit, offset],
+        )
+        # bm25 is "lower is better"; expose a "higher is better" rank like PostgreSQL
+        return [(row[0], -row[1], highlight(row[2])) for row in cursor.fetchall()], total
+
+
+class PostgresSearchBackend:
+    config = "simple"  # no stemming: names and places matter more than English morphology
+
+    def create(self, cursor):
+        cursor.execute(
+            f"CREATE TABLE IF NOT EXISTS {PG_TABLE} ("
+            "memory_id bigint PRIMARY KEY REFERENCES api_memory(id) ON DELETE CASCADE DEFERRABLE INITIALLY DEFERRED, "
+            "patient_id bigint NOT NULL, "
+            "body text NOT NULL, "
+            "document tsvector NOT NULL)"
+        )
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {PG_TABLE}_document_gin ON {PG_TABLE} USING GIN (document)")
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {PG_TABLE}_patient_idx ON {PG_TABLE} (patient_id)")
+
+    def drop(self, cursor):
+        cursor.execute(f"DROP TABLE IF EXISTS {PG_TABLE}")
+
+    def upsert(self, cursor, docs):
+        weighted = " || ".join(
+            f"setweight(to_tsvector('{self.config}', %s), '{weight}')"
+            for weight in ("A", "B", "C", "A", "B", "D")
+        )
+        cursor.executemany(
+            f"INSERT INTO {PG_TABLE} (memory_id, patient_id, body, document) VALUES (%s, %s, %s, {weighted}) "
+            "ON CONFLICT (memory_id) DO UPDATE SET patient_id = EXCLUDED.patient_id, "
+            "body = EXCLUDED.body, document = EXCLUDED.document",
+            [
+                (
+                    memory_id, doc["patient_id"],
+                    " · ".join(filter(None, [doc["title"], doc["description"], doc["location"],
+                                             doc["tags"], doc["people"], doc["transcripts"]])),
+                    doc["title"], doc["description"], doc["location"],
+                    doc["tags"], doc["people"], doc["transcripts"],
+                )
+                for memory_id, doc in docs.items()
+            ],
+        )
+
+    def delete(self, cursor, memory_ids):
+        if memory_ids:
+            cursor.execute(f"DELETE FROM {PG_TABLE} WHERE memory_id = ANY(%s)", [list(memory_ids)])
+
+    def search(self, cursor, query, patient_ids, limit, offset):
+        terms = _terms(query)
+        if not terms or not patient_ids:
+            return [], 0
+        tsquery = " & ".join(f"{term}:*" for term in terms)
+        where = f"document @@ to_tsquery('{self.config}', %s) AND patient_id = ANY(%s)"
+        params = [tsquery, list(patient_ids)]
+
+        cursor.execute(f"SELECT count(*) FROM {PG_TABLE} WHERE {where}", params)
+        total = cursor.fetchone()[0]
+        cursor.execute(
+            f"SELECT memory_id, ts_rank_cd(document, to_tsquery('{self.config}', %s)) AS score, "
+            f"ts_headline('{self.config}', body, to_tsquery('{self.config}', %s), "
+            "'StartSel=' || %s || ', StopSel=' || %s || ', MaxWords=24, MinWords=8') "
+            f"FROM {PG_TABLE} WHERE {where} ORDER BY score DESC, memory_id DESC LIMIT %s OFFSET %s",
+            [tsquery, tsquery, MATCH_START, MATCH_END, *params, limit, offset],
+        )
+        return [(row[0], float(row[1]), highlight(row[2])) for row in cursor.fetchall()], total
+
+
+class FallbackSearchBackend:
+    """Unranked icontains search for databases without a native full-text index"""
+
+    def create(self, cursor):
+        pass
+
+    def drop(self, cursor):
+        pass
+
+    def upsert(self, cursor, docs):
+        pass
+
+    def delete(self, cursor, memory_ids):
+        pass
+
+    def search(self, cursor, query, patient_ids, limit, offset):
+        from django.db.models import Q
+        from .models import Memory
+        terms = _terms(query)
+        if not terms or not patient_ids:
+            return [], 0
+        qs = Memory.objects.filter(user_id__in=patient_ids)
+        for term in terms:
+            qs = qs.filter(
+                Q(title__icontains=term) | Q(description__icontains=term) | Q(location__icontains=term)
+                | Q(tag__icontains=term) | Q(event_tags__tag_name__icontains=term)
+                | Q(tagged_people__name__icontains=term) | Q(voice_recordings__transcript__icontains=term)
+            )
+        ids = qs.values_list("id", flat=True).distinct().order_by("-id")
+        return [(memory_id, 0.0, None) for memory_id in ids[offset:offset + limit]], ids.count()
+
+
+def get_backend(conn=None):
+    vendor = (conn or connection).vendor
+    if vendor == "sqlite":
+        return SqliteSearchBackend()
+    if vendor == "postgresql":
+        return PostgresSearchBackend()
+    return FallbackSearchBackend()
+
+
+# ------------------ INDEX MAINTENANCE ------------------ #
+
+def reindex_memories(memory_ids, apps=None, conn=None):
+    """Refresh the documents of the given memories; ids that no longer exist are removed"""
+    memory_ids = sorted(set(memory_ids))
+    if not memory_ids:
+        return
+    conn = conn or connection
+    backend = get_backend(conn)
+    docs = build_documents(memory_ids, apps=apps)
+    with conn.cursor() as cursor:
+        backend.delete(cursor, [pk for pk in memory_ids if pk not in docs])
+        if docs:
+            backend.upsert(cursor, docs)
+
+
+def schedule_reindex(memory_id):
+    """Reindex after the surrounding transaction commits (no-op work is never indexed)"""
+    transaction.on_commit(lambda: reindex_memories([memory_id]))
+
+
+def rebuild_index(apps=None, conn=None, batch_size=500):
+    """Drop, recreate and fully repopulate the index; returns the number of documents"""
+    conn = conn or connection
+    Memory = _models(apps)[0]
+    backend = get_backend(conn)
+    with conn.cursor() as cursor:
+        backend.drop(cursor)
+        backend.create(cursor)
+    ids = list(Memory.objects.order_by("pk").values_list("pk", flat=True))
+    for start in range(0, len(ids), batch_size):
+        reindex_memories(ids[start:start + batch_size], apps=apps, conn=conn)
+    return len(ids)
+
+
+def search_memories(query, patient_ids, limit=20, offset=0):
+    """[(memory_id, rank, highlight)] best first, plus the total number of matches"""
+    with connection.cursor() as cursor:
+        return get_backend().search(cursor, query, sorted(patient_ids), limit, offset)
@@ -5,9 +5,67 @@ from .models import (
     MemoryImage, MemoryVideo, MemoryVoiceRecording, MemoryPerson, MemoryTag,
     MemoryLike, MemoryComment
 )
+from .serving import sign_url
+from .variants import image_variants
+from .viewer_state import ViewerState
+from .waveforms import resolution_param, waveform_level
 
 User = get_user_model()
 
+
+def get_viewer_state(serializer, memories=(), family_members=()):
+    """
+    The request's batch resolver from context["viewer_state"]; falls back to a
+    resolver for just the given objects when a caller did not provide one.
+    """
+    viewer_state = serializer.context.get("viewer_state")
+    if viewer_state is None:
+        request = serializer.context.get("request")
+        viewer_state = ViewerState(getattr(request, "user", None), memories, family_members)
+    return viewer_state
+
+
+# Display helpers shared with the read-only fast path in fast_serializers.py
+def format_duration(duration):
+    """Format duration for display (e.g., "2:30")"""
+    if duration:
+        total_seconds = int(duration.total_seconds())
+        minutes = total_seconds // 60
+        seconds = total_seconds % 60
+        return f"{minutes}:{seconds:02d}"
+    return None
+
+def avatar_initials(name):
+    """Generate avatar initials from name"""
+    if not name:
+        return "??"
+    parts = name.strip().split()
+    if len(parts) >= 2:
+        return (parts[0][0] + parts[1][0]).upper()
+    elif len(parts) == 1:
+        return parts[0][:2].upper()
+    return "??"
+
+def speaker_display(speaker_name, speaker_relation):
+    """Get formatted speaker display name"""
+    if speaker_name and speaker_relation:
+        return f"{speaker_name} ({speaker_relation})"
+    return speaker_name or "Unknown Speaker"
+
+def user_display(user):
+    """Get user display name"""
+    return getattr(user, 'first_name', None) or user.username
+
+def absolute_url_builder(request):
+    """build_absolute_uri of the request, or site-relative URLs unchanged without one"""
+    return request.build_absolute_uri if request else (lambda url: url)
+
+class StoredURLField(serializers.ReadOnlyField):
+    """A stored *_url; local MEDIA_URL ones get their access signature (see api.serving)"""
+
+    def to_representation(self, value):
+        return sign_url(value)
+
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
         model = User
@@ -40,7 +98,7 @@ class FamilyMemberSerializer(serializers.ModelSerializer):
         fields = ["id", "name", "relation", "avatar", "memories_count"]
 
     def get_memories_count(self, obj):
-        return obj.memories.count() if hasattr(obj, "memories") else 0
+        return get_viewer_state(self, family_members=[obj]).memories_count(obj)
 
     def create(self, validated_data):
         user = self.context["request"].user
@@ -59,11 +117,16 @@ class MemoryImageSerializer(serializers.ModelSerializer):
     image = serializers.ImageField(required=False, allow_null=True)
     image_url = serializers.URLField(required=False, allow_blank=True, allow_null=True)
     resolved_image_url = serializers.SerializerMethodField(read_only=True)
+    image_variants = serializers.SerializerMethodField(read_only=True)
+    original_url = StoredURLField()
 
     class Meta:
         model = MemoryImage
-        fields = ['id', 'memory', 'image', 'image_url', 'resolved_image_url', 'caption', 'order', 'created_at']
-        read_only_fields = ['created_at']
+        fields = [
+            'id', 'memory', 'image', 'image_url', 'resolved_image_url', 'image_variants',
+            'original_url', 'width', 'height', 'placeholder', 'caption', 'order', 'created_at'
+        ]
+        read_only_fields = ['width', 'height', 'placeholder', 'created_at']
 
     def get_resolved_image_url(self, obj):
         """Return the best available image URL"""
@@ -74,6 +137,10 @@ class MemoryImageSerializer(serializers.ModelSerializer):
             return request.build_absolute_uri(obj.image.url) if request else obj.image.url
         return None
 
+    def get_image_variants(self, obj):
+        """Thumbnail / medium / full renditions of the image"""
+        return image_variants(obj.image_url, obj.image, absolute_url_builder(self.context.get("request")))
+
 class MemoryVideoSerializer(serializers.ModelSerializer):
     """Serializer for memory videos"""
     video = serializers.FileField(required=False, allow_null=True)
@@ -101,12 +168,7 @@ class MemoryVideoSerializer(serializers.ModelSerializer):
 
     def get_duration_formatted(self, obj):
         """Format duration for display (e.g., "2:30")"""
-        if obj.duration:
-            total_seconds = int(obj.duration.total_seconds())
-            minutes = total_seconds // 60
-            seconds = total_seconds % 60
-            return f"{minutes}:{seconds:02d}"
-        return None
+        return format_duration(obj.duration)
 
 class MemoryVoiceRecordingSerializer(serializers.ModelSerializer):
     """Serializer for memory voice recordings"""
@@ -115,6 +177,7 @@ class MemoryVoiceRecordingSerializer(serializers.ModelSerializer):
     resolved_audio_url = serializers.SerializerMethodField(read_only=True)
     duration_formatted = serializers.SerializerMethodField(read_only=True)
     speaker_display = serializers.SerializerMethodField(read_only=True)
+    waveform = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = MemoryVoiceRecording
@@ -122,7 +185,7 @@ class MemoryVoiceRecordingSerializer(serializers.ModelSerializer):
             'id', 'memory', 'audio', 'audio_url', 'resolved_audio_url',
             'speaker_name', 'speaker_relation', 'speaker_display',
             'duration', 'duration_formatted', 'file_size', 'transcript',
-            'waveform_data', 'created_at'
+            'waveform_data', 'waveform', 'created_at'
         ]
         read_only_fields = ['created_at']
 
@@ -137,18 +200,16 @@ class MemoryVoiceRecordingSerializer(serializers.ModelSerializer):
 
     def get_duration_formatted(self, obj):
         """Format duration for display (e.g., "2:30")"""
-        if obj.duration:
-            total_seconds = int(obj.duration.total_seconds())
-            minutes = total_seconds // 60
-            seconds = total_seconds % 60
-            return f"{minutes}:{seconds:02d}"
-        return None
+        return format_duration(obj.duration)
 
     def get_speaker_display(self, obj):
         """Get formatted speaker display name"""
-        if obj.speaker_name and obj.speaker_relation:
-            return f"{obj.speaker_name} ({obj.speaker_relation})"
-        return obj.speaker_name or "Unknown Speaker"
+        return speaker_display(obj.speaker_name, obj.speaker_relation)
+
+    def get_waveform(self, obj):
+        """One level of the computed peaks: context["waveform_resolution"] or ?waveform_resolution="""
+        resolution = self.context.get("waveform_resolution") or resolution_param(self.context.get("request"))
+        return waveform_level(obj.waveform_peaks, resolution)
 
 class MemoryPersonSerializer(serializers.ModelSerializer):
     """Serializer for people tagged in memories"""
@@ -161,14 +222,7 @@ class MemoryPersonSerializer(serializers.ModelSerializer):
 
     def get_avatar_initials(self, obj):
         """Generate avatar initials from name"""
-        if not obj.name:
-            return "??"
-        parts = obj.name.strip().split()
-        if len(parts) >= 2:
-            return (parts[0][0] + parts[1][0]).upper()
-        elif len(parts) == 1:
-            return parts[0][:2].upper()
-        return "??"
+        return avatar_initials(obj.name)
 
 class MemoryTagSerializer(serializers.ModelSerializer):
     """Serializer for memory event tags"""
@@ -198,7 +252,7 @@ class MemoryCommentSerializer(serializers.ModelSerializer):
 
     def get_user_display(self, obj):
         """Get user display name"""
-        return getattr(obj.user, 'first_name', None) or obj.user.username
+        return user_display(obj.user)
 
 # ------------------ ENHANCED MEMORY SERIALIZERS ------------------ #
 
@@ -208,12 +262,13 @@ class MemorySerializer(serializers.ModelSerializer):
     image_url = serializers.CharField(required=False, allow_blank=True, allow_null=True)
     description = serializers.CharField(required=False, allow_blank=True, allow_null=True)
     resolved_image_url = serializers.SerializerMethodField(read_only=True)
+    image_variants = serializers.SerializerMethodField(read_only=True)
     
-    # Basic counts for quick overview
-    images_count = serializers.SerializerMethodField(read_only=True)
-    videos_count = serializers.SerializerMethodField(read_only=True)
-    recordings_count = serializers.SerializerMethodField(read_only=True)
-    likes_count = serializers.SerializerMethodField(read_only=True)
+    # Basic counts for quick overview (denormalized columns on Memory)
+    images_count = serializers.IntegerField(read_only=True)
+    videos_count = serializers.IntegerField(read_only=True)
+    recordings_count = serializers.IntegerField(read_only=True)
+    likes_count = serializers.IntegerField(read_only=True)
     is_liked = serializers.SerializerMethodField(read_only=True)
 
     members = serializers.PrimaryKeyRelatedField(
@@ -225,10 +280,12 @@ class MemorySerializer(serializers.ModelSerializer):
         model = Memory
         fields = [
             "id", "username", "title", "description", "date", "location", "tag",
-            "image_url", "resolved_image_url", "members", "members_detail",
+            "image_url", "resolved_image_url", "image_variants",
+            "image_width", "image_height", "image_placeholder", "members", "members_detail",
             "images_count", "videos_count", "recordings_count", 
             "likes_count", "is_liked", "created_at"
         ]
+        read_only_fields = ["image_width", "image_height", "image_placeholder"]
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -245,23 +302,14 @@ class MemorySerializer(serializers.ModelSerializer):
             return request.build_absolute_uri(url) if request else url
         return None
 
-    def get_images_count(self, obj):
-        return getattr(obj, 'images_count', obj.images.count())
-
-    def get_videos_count(self, obj):
-        return getattr(obj, 'videos_count', obj.videos.count())
-
-    def get_recordings_count(self, obj):
-        return getattr(obj, 'recordings_count', obj.voice_recordings.count())
-
-    def get_likes_count(self, obj):
-        return getattr(obj, 'likes_count', obj.likes.count())
+    def get_image_variants(self, obj):
+        return image_variants(
+            getattr(obj, "image_url", None), getattr(obj, "image", None),
+            absolute_url_builder(self.context.get("request")),
+        )
 
     def get_is_liked(self, obj):
-        request = self.context.get("request")
-        if request and request.user.is_authenticated:
-            return obj.likes.filter(user=request.user).exists()
-        return False
+        return get_viewer_state(self, memories=[obj]).is_liked(obj)
 
     def create(self, validated_data):
         members = validated_data.pop("members", [])
@@ -286,6 +334,8 @@ class MemoryDetailSerializer(serializers.ModelSerializer):
     username = serializers.ReadOnlyField(source="user.username")
     user_display = serializers.SerializerMethodField(read_only=True)
     resolved_image_url = serializers.SerializerMethodField(read_only=True)
+    image_variants = serializers.SerializerMethodField(read_only=True)
+    original_url = StoredURLField()
     
     # Related media
     images = MemoryImageSerializer(many=True, read_only=True)
@@ -308,7 +358,8 @@ class MemoryDetailSerializer(serializers.ModelSerializer):
         model = Memory
         fields = [
             'id', 'title', 'description', 'date', 'location', 'tag',
-            'image', 'image_url', 'resolved_image_url', 'created_at',
+            'image', 'image_url', 'resolved_image_url', 'image_variants', 'original_url',
+            'image_width', 'image_height', 'image_placeholder', 'created_at',
             'username', 'user_display', 'user',
             'images', 'videos', 'voice_recordings', 'tagged_people', 'event_tags',
             'likes', 'comments', 'members_detail',
@@ -317,7 +368,7 @@ class MemoryDetailSerializer(serializers.ModelSerializer):
         
     def get_user_display(self, obj):
         """Get user display name"""
-        return getattr(obj.user, 'first_name', None) or obj.user.username
+        return user_display(obj.user)
 
     def get_resolved_image_url(self, obj):
         """Return the best available main image URL"""
@@ -328,42 +379,52 @@ class MemoryDetailSerializer(serializers.ModelSerializer):
             return request.build_absolute_uri(obj.image.url) if request else obj.image.url
         return None
 
+    def get_image_variants(self, obj):
+        """Thumbnail / medium / full renditions of the main image"""
+        return image_variants(obj.image_url, obj.image, absolute_url_builder(self.context.get("request")))
+
     def get_media_counts(self, obj):
-        """Get counts of all media types"""
+        """Get counts of all media types (read from the denormalized counters)"""
         return {
-            'images': obj.images.count(),
-            'videos': obj.videos.count(),
-            'voice_recordings': obj.voice_recordings.count(),
-            'people': obj.tagged_people.count(),
-            'tags': obj.event_tags.count(),
-            'likes': obj.likes.count(),
-            'comments': obj.comments.count()
+            **obj.get_media_counts(),
+            'likes': obj.likes_count,
+            'comments': obj.comments_count
         }
 
     def get_is_liked(self, obj):
         """Check if current user liked this memory"""
-        request = self.context.get("request")
-        if request and request.user.is_authenticated:
-            return obj.likes.filter(user=request.user).exists()
-        return False
+        return get_viewer_state(self, memories=[obj]).is_liked(obj)
 
     def get_can_edit(self, obj):
-        """Check if current user can edit this memory"""
-        request = self.context.get("request")
-        if not request or not request.user.is_authenticated:
-            return False
-        
-        # Memory owner can always edit
-        if obj.user == request.user:
-            return True
-            
-        # Family members with approved links can edit
-        from .models import FamilyLink
-        return FamilyLink.objects.filter(
-            patient=obj.user,
-            family_member=request.user,
-            status="APPROVED"
-        ).exists()
+        """Memory owner or family members with approved links can edit"""
+        return get_viewer_state(self, memories=[obj]).can_edit(obj)
+
+# ------------------ PEOPLE / TAG INPUT SERIALIZERS ------------------ #
+# Validate people and tags before they are attached to memories in bulk (api/tagging.py,
+# api/bulk_import.py); memory is set by the caller and unique_together is left to the insert
+
+class PersonInputSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = MemoryPerson
+        fields = ['name', 'relation', 'avatar_url']
+
+class TagInputSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = MemoryTag
+        fields = ['tag_name', 'color']
+
+# ------------------ BULK IMPORT SERIALIZERS ------------------ #
+
+class MemoryImportSerializer(serializers.ModelSerializer):
+    """One row of a bulk memory import (see api/bulk_import.py); members are family member names"""
+    image_url = serializers.URLField(max_length=600, required=False, allow_blank=True, allow_null=True)
+    tags = TagInputSerializer(many=True, required=False)
+    people = PersonInputSerializer(many=True, required=False)
+    members = serializers.ListField(child=serializers.CharField(max_length=120), required=False)
+
+    class Meta:
+        model = Memory
+        fields = ['title', 'description', 'date', 'location', 'tag', 'image_url', 'tags', 'people', 'members']
 
 # ------------------ EXISTING SERIALIZERS (Updated) ------------------ #
 
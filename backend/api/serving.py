@@ -0,0 +1,242 @@
+# api/serving.py
+"""
+Access-checked serving of locally stored media (everything under MEDIA_URL).
+
+The serve_media view maps a storage name to the patient who owns it (MEDIA_OWNERS) and
+serves it to users who can read that patient's memories. <img>/<video> tags cannot send
+an Authorization header, so the URLs the API hands out carry a short-lived signature
+instead: ?expires=&signature= is an HMAC over the storage name and the expiry, added by
+SignedFileSystemStorage.url() (the default storage) and checked by SignedMediaURL. Expiries
+are rounded up to MEDIA_URL_SIGNATURE_TTL windows, so a URL stays the same - and cacheable -
+for a whole window and then lives at least one more.
+
+The body is handed off in one of three ways. settings.MEDIA_SENDFILE="x-accel-redirect"
+sends it through an nginx `internal` location at MEDIA_ACCEL_REDIRECT_PREFIX.
+"x-sendfile" hands it to Apache/lighttpd by absolute path. Either way the web server then
+answers Range requests itself. Without one, Django serves the file: a plain FileResponse
+(sendfile under gunicorn), or single and multipart/byteranges 206 responses for Range
+requests. Both paths honour If-Range, ETag and Last-Modified.
+"""
+import mimetypes
+import os
+import re
+import secrets
+import stat
+import time
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.crypto import constant_time_compare, salted_hmac
+from django.utils.encoding import filepath_to_uri
+from django.utils.http import http_date, parse_http_date_safe, urlencode
+from rest_framework.permissions import BasePermission
+
+from .models import FamilyMember, Memory, MemoryImage, MemoryVideo, MemoryVoiceRecording
+
+# Storage name prefix -> (model, field holding the name or its URL, path to the patient id)
+MEDIA_OWNERS = [
+    ("avatars/", FamilyMember, "avatar", "user_id"),
+    ("memories/originals/", Memory, "original_url", "user_id"),
+    ("memories/", Memory, "image", "user_id"),
+    ("memory_images/originals/", MemoryImage, "original_url", "memory__user_id"),
+    ("memory_images/", MemoryImage, "image", "memory__user_id"),
+    ("memory_videos/", MemoryVideo, "video", "memory__user_id"),
+    ("memory_audio/", MemoryVoiceRecording, "audio", "memory__user_id"),
+]
+
+MAX_RANGES = 16  # more parts than this and the Range header is ignored (full 200 response)
+BLOCK_SIZE = 64 * 1024
+RANGE_SPEC = re.compile(r"(\d*)-(\d*)")
+
+
+SIGNATURE_SALT = "api.serving.media_url"
+
+
+def signing_window(now=None):
+    """Index of the current signing window; URLs signed within one window are identical"""
+    return int(time.time() if now is None else now) // settings.MEDIA_URL_SIGNATURE_TTL
+
+
+def _signature(name, expires):
+    return salted_hmac(SIGNATURE_SALT, f"{name}\n{expires}", algorithm="sha256").hexdigest()
+
+
+def signed_query(name, now=None):
+    """expires=&signature= for stored file `name`, valid until the end of the next window"""
+    expires = (signing_window(now) + 2) * settings.MEDIA_URL_SIGNATURE_TTL
+    return urlencode({"expires": expires, "signature": _signature(name, expires)})
+
+
+def valid_signature(name, expires, signature):
+    """True if `signature` was issued for `name` and `expires` has not passed"""
+    try:
+        expires = int(expires)
+    except (TypeError, ValueError):
+        return False
+    return expires > time.time() and constant_time_compare(_signature(name, expires), signature or "")
+
+
+def media_url(name):
+    """Unsigned site-relative URL of stored file `name` (what original_url keeps)"""
+    return settings.MEDIA_URL + filepath_to_uri(name)
+
+
+def sign_url(url):
+    """A stored site-relative MEDIA_URL URL with its signature added; other URLs unchanged"""
+    if not url or not url.startswith(settings.MEDIA_URL):
+        return url
+    return f"{url}?{signed_query(unquote(url[len(settings.MEDIA_URL):]))}"
+
+
+def is_signed(request, name):
+    params = request.query_params
+    return valid_signature(name, params.get("expires"), params.get("signature"))
+
+
+class SignedFileSystemStorage(FileSystemStorage):
+    """MEDIA_ROOT storage whose url() is signed, so FieldFile.url can be fetched by <img> tags"""
+
+    def url(self, name):
+        return f"{super().url(name)}?{signed_query(name)}"
+
+
+class SignedMediaURL(BasePermission):
+    """Admits requests for the view's `name` that carry a valid ?expires=&signature="""
+
+    def has_permission(self, request, view):
+        return is_signed(request, view.kwargs["name"])
+
+
+def media_owner(name):
+    """Patient id owning the stored file `name`, or None when no row references it"""
+    for prefix, model, field, patient in MEDIA_OWNERS:
+        if not name.startswith(prefix):
+            continue
+        if field == "original_url":  # stored as a URL (see api.media.store)
+            lookup = {"original_url__endswith": media_url(name)}
+        else:
+            lookup = {field: name}
+        return model.objects.filter(**lookup).values_list(patient, flat=True).first()
+    return None
+
+
+def file_response(request, name):
+    """Response serving stored file `name`; None when there is no such file"""
+    try:
+        path = default_storage.path(name)
+        info = os.stat(path)
+    except (NotImplementedError, OSError):
+        return None
+    if not stat.S_ISREG(info.st_mode):
+        return None
+
+    etag = f'"{info.st_mtime_ns:x}-{info.st_size:x}"'
+    last_modified = int(info.st_mtime)
+    content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    response = get_conditional_response(
+        getattr(request, "_request", request), etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        response = _body_response(request, name, path, info.st_size, content_type, etag, last_modified)
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    response["Accept-Ranges"] = "bytes"
+    response["Cache-Control"] = "private, max-age=86400"  # stored names are never reused
+    return response
+
+
+def _body_response(request, name, path, size, content_type, etag, last_modified):
+    sendfile = settings.MEDIA_SENDFILE.lower()
+    if sendfile == "x-accel-redirect":
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = settings.MEDIA_ACCEL_REDIRECT_PREFIX + filepath_to_uri(name)
+        return response
+    if sendfile == "x-sendfile":
+        response = HttpResponse(content_type=content_type)
+        response["X-Sendfile"] = path
+        return response
+
+    header = request.META.get("HTTP_RANGE")
+    ranges = parse_ranges(header, size) if header and _if_range(request, etag, last_modified) else None
+    if ranges is None:
+        return FileResponse(open(path, "rb"), content_type=content_type)
+    if not ranges:
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        response = StreamingHttpResponse(_read(path, ranges), status=206, content_type=content_type)
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = str(end - start + 1)
+        return response
+
+    boundary = secrets.token_hex(16)
+    heads = [
+        f"--{boundary}\r\nContent-Type: {content_type}\r\nContent-Range: bytes {start}-{end}/{size}\r\n\r\n".encode()
+        for start, end in ranges
+    ]
+    tail = f"--{boundary}--\r\n".encode()
+    length = sum(len(head) + end - start + 1 + 2 for head, (start, end) in zip(heads, ranges)) + len(tail)
+    response = StreamingHttpResponse(
+        _read(path, ranges, heads, tail), status=206, content_type=f"multipart/byteranges; boundary={boundary}"
+    )
+    response["Content-Length"] = str(length)
+    return response
+
+
+def parse_ranges(header, size):
+    """
+    [(first, last)] byte positions of a Range header against a file of `size` bytes, [] when
+    none is satisfiable, or None to ignore the header (malformed, not bytes, too many parts).
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes":
+        return None
+    ranges = []
+    for part in spec.split(","):
+        match = RANGE_SPEC.fullmatch(part.strip())
+        if not match or match.group(1) == match.group(2) == "":
+            return None
+        first, last = match.groups()
+        if not first:  # suffix range: the last N bytes
+            if int(last) > 0 and size:
+                ranges.append((max(size - int(last), 0), size - 1))
+            continue
+        if last and int(last) < int(first):
+            return None
+        if int(first) < size:
+            ranges.append((int(first), min(int(last), size - 1) if last else size - 1))
+    return ranges if len(ranges) <= MAX_RANGES else None
+
+
+def _if_range(request, etag, last_modified):
+    """False when an If-Range validator no longer matches, so the whole file is sent"""
+    validator = request.META.get("HTTP_IF_RANGE")
+    if not validator:
+        return True
+    if validator.startswith(('"', "W/")):
+        return validator == etag  # strong comparison: weak tags never match
+    return parse_http_date_safe(validator) == last_modified
+
+
+def _read(path, ranges, heads=None, tail=None):
+    with open(path, "rb") as fh:
+        for index, (start, end) in enumerate(ranges):
+            if heads:
+                yield heads[index]
+            fh.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = fh.read(min(BLOCK_SIZE, remaining))
+                if not chunk:
+                    return  # truncated underneath us
+                remaining -= len(chunk)
+                yield chunk
+            if heads:
+                yield b"\r\n"
+        if tail:
+            yield tail
@@ -0,0 +1,99 @@
+# api/storage.py
+"""
+Swappable storage clients for uploaded media (settings.MEDIA_STORAGE_BACKEND).
+
+upload() takes a path or file object and returns a dict:
+    url           remote delivery URL (stored in the *_url field), or None
+    file          storage name for the local FileField/ImageField, or None
+    duration      seconds, when the storage reports it (video/audio)
+    public_id     identifier to delete the asset again
+    resource_type "image" or "video" (Cloudinary stores audio as video)
+    bytes         stored size, when known
+
+Backends that accept uploads straight from the browser also implement sign_upload(),
+verify_upload() and delivery_url() (see media.sign_direct_upload).
+"""
+import hmac
+import os
+import time
+
+import cloudinary
+import cloudinary.uploader
+import cloudinary.utils
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.utils.module_loading import import_string
+
+
+class CloudinaryMediaStorage:
+    def upload(self, file, folder, resource_type="image", filename=None):
+        res = cloudinary.uploader.upload(file, folder=folder, resource_type=resource_type)
+        return {
+            "url": res.get("secure_url") or res.get("url"),
+            "file": None,
+            "duration": res.get("duration"),
+            "public_id": res.get("public_id"),
+            "resource_type": res.get("resource_type", resource_type),
+            "bytes": res.get("bytes"),
+        }
+
+    def delete(self, public_id, resource_type="image"):
+        cloudinary.uploader.destroy(public_id, resource_type=resource_type, invalidate=True)
+
+    def sign_upload(self, public_id, resource_type="image"):
+        """
+        Form fields for a browser upload straight to Cloudinary, pinned to `public_id`.
+        Signed locally with the API secret (no network); Cloudinary rejects the signature
+        once the timestamp is an hour old.
+        """
+        config = cloudinary.config()
+        fields = {"public_id": public_id, "timestamp": int(time.time())}
+        fields["signature"] = cloudinary.utils.api_sign_request(fields, config.api_secret, config.signature_algorithm)
+        fields["api_key"] = config.api_key
+        return {"upload_url": cloudinary.utils.cloudinary_api_url("upload", resource_type=resource_type), "fields": fields}
+
+    def verify_upload(self, public_id, version, signature):
+        """True if (public_id, version, signature) is a genuine Cloudinary upload response"""
+        config = cloudinary.config()
+        expected = cloudinary.utils.api_sign_request(
+            {"public_id": public_id, "version": version}, config.api_secret, config.signature_algorithm,
+            signature_version=1,  # what Cloudinary uses for response signatures
+        )
+        return hmac.compare_digest(expected, str(signature))
+
+    def delivery_url(self, public_id, resource_type, version, format):
+        return cloudinary.utils.cloudinary_url(
+            public_id, resource_type=resource_type, version=version, format=format, secure=True
+        )[0]
+
+
+class LocalMediaStorage:
+    """Keeps files in Django's default storage (MEDIA_ROOT) - for development and offline tests"""
+
+    def upload(self, file, folder, resource_type="image", filename=None):
+        if isinstance(file, (str, os.PathLike)):
+            with open(file, "rb") as fh:
+                return self.upload(fh, folder, resource_type, filename or os.path.basename(file))
+        name = default_storage.save(f"{folder}/{filename or os.path.basename(file.name)}", File(file))
+        return {
+            "url": None, "file": name, "duration": None, "public_id": name, "resource_type": resource_type,
+            "bytes": default_storage.size(name),
+        }
+
+    def delete(self, public_id, resource_type="image"):
+        default_storage.delete(public_id)
+
+
+def get_media_storage(backend=None):
+    return import_string(backend or settings.MEDIA_STORAGE_BACKEND)()
+
+
+def delete_stored(backend, public_id, resource_type="image"):
+    """Best-effort removal of a file that is no longer referenced"""
+    if not public_id:
+        return
+    try:
+        get_media_storage(backend).delete(public_id, resource_type)
+    except Exception as e:
+        print(f"⚠️ Could not delete stored {resource_type} {public_id}: {e}")
@@ -0,0 +1,77 @@
+# api/sync.py
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Memory, MemoryImage, MemoryVideo, MemoryVoiceRecording, SyncTombstone
+from .pagination import decode_cursor, encode_cursor
+
+
+class SyncTokenExpired(Exception):
+    """The token predates the tombstone retention window; the client must resync from scratch"""
+
+
+def _overlap():
+    # Rows are stamped when saved but become visible at commit; re-sending a few seconds of
+    # changes means a slow transaction can never fall between two tokens
+    return timedelta(seconds=getattr(settings, "SYNC_TOKEN_OVERLAP_SECONDS", 5))
+
+def _retention():
+    return timedelta(days=getattr(settings, "SYNC_TOMBSTONE_RETENTION_DAYS", 30))
+
+
+def make_token(started_at, patient_ids):
+    return encode_cursor({"t": (started_at - _overlap()).isoformat(), "p": sorted(patient_ids)})
+
+
+def read_token(token):
+    """(since, patient_ids) from a token; raises ValueError when malformed, SyncTokenExpired when too old"""
+    payload = decode_cursor(token)
+    since = datetime.fromisoformat(payload["t"])
+    if timezone.is_naive(since):
+        raise ValueError("Malformed sync token")
+    if since < timezone.now() - _retention():
+        raise SyncTokenExpired()
+    return since, set(int(pid) for pid in payload.get("p", []))
+
+
+def collect_changes(access, token=None):
+    """
+    Everything that changed for the viewer since `token`:
+    memories and media created/updated, tombstones for deletions, and patients whose
+    access was revoked. Patients the viewer gained access to since the token are sent
+    in full. Returns a dict of querysets/lists plus the next token.
+    """
+    started_at = timezone.now()
+    readable = set(access.readable_patient_ids)
+
+    if token:
+        since, known = read_token(token)
+    else:
+        since, known = None, set()
+
+    delta_patients = sorted(readable & known) if since else []
+    full_patients = sorted(readable - set(delta_patients))
+
+    def changed(queryset, patient_field, stamp_field):
+        condition = Q(**{f"{patient_field}__in": full_patients})
+        if delta_patients:
+            condition |= Q(**{f"{patient_field}__in": delta_patients, f"{stamp_field}__gte": since})
+        return queryset.filter(condition) if (full_patients or delta_patients) else queryset.none()
+
+    tombstones = SyncTombstone.objects.none()
+    if delta_patients:
+        tombstones = SyncTombstone.objects.filter(patient_id__in=delta_patients, deleted_at__gte=since)
+
+    return {
+        "memories": changed(Memory.objects.all(), "user_id", "updated_at").order_by("updated_at", "id"),
+        "images": changed(MemoryImage.objects.all(), "memory__user_id", "updated_at"),
+        "videos": changed(MemoryVideo.objects.all(), "memory__user_id", "updated_at"),
+        "voice_recordings": changed(MemoryVoiceRecording.objects.all(), "memory__user_id", "updated_at"),
+        "tombstones": tombstones,
+        "revoked_patients": sorted(known - readable),
+        "full_patients": full_patients,
+        "sync_token": make_token(started_at, readable),
+    }
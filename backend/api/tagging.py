@@ -0,0 +1,83 @@
+# api/tagging.py
+"""
+Set-based attachment of people and event tags to memories (POST /api/memories/<id>/people/,
+/api/memories/<id>/tags/ and /api/memories/bulk-tag/).
+
+The whole payload is validated in one pass by the caller. Names a memory already has, or
+that appear twice in the payload, are reported as skipped instead of failing against
+unique_together. Everything else is inserted with one bulk_create(ignore_conflicts=True)
+per model, so a concurrent request that adds the same name first is skipped as well.
+
+bulk_create sends no signals, so the bookkeeping happens here, in the same transaction as
+the inserts. Counters and updated_at take one UPDATE per distinct delta. Each patient's
+timeline version is bumped once, and the changed memories' search documents are rewritten
+once, however many kinds were attached.
+"""
+from django.db import transaction
+
+from .models import MemoryPerson, MemoryTag, TimelineVersion, touch_memories
+from .search import reindex_memories
+
+# kind -> (model, name field, counter column on Memory)
+KINDS = {
+    "people": (MemoryPerson, "name", "people_count"),
+    "tags": (MemoryTag, "tag_name", "tags_count"),
+}
+
+
+def attach(memories, items_by_kind):
+    """
+    Add validated items to every memory in `memories`; `items_by_kind` maps "people" and/or
+    "tags" to their items. Returns {kind: (created rows, skipped [{"memory": id, <name
+    field>: name}])}.
+    """
+    result, changed = {}, set()
+    with transaction.atomic():
+        for kind, items in items_by_kind.items():
+            created, skipped = _attach(memories, kind, items)
+            result[kind] = (created, skipped)
+            changed.update(row.memory_id for row in created)
+        if changed:
+            for patient_id in sorted({memory.user_id for memory in memories if memory.pk in changed}):
+                TimelineVersion.bump(patient_id)
+            reindex_memories(changed)
+    return result
+
+
+def _attach(memories, kind, items):
+    model, key, counter = KINDS[kind]
+    memory_ids = [memory.pk for memory in memories]
+    names = {item[key] for item in items}
+    if not memory_ids or not names:
+        return [], []
+
+    existing = model.objects.filter(memory_id__in=memory_ids, **{f"{key}__in": names})
+    taken = set(existing.values_list("memory_id", key))
+    rows, skipped = [], []
+    for memory_id in memory_ids:
+        for item in items:
+            pair = (memory_id, item[key])
+            if pair in taken:
+                skipped.append({"memory": memory_id, key: item[key]})
+                continue
+            taken.add(pair)
+            rows.append(model(memory_id=memory_id, **item))
+    if not rows:
+        return [], skipped
+
+    planned = {(row.memory_id, getattr(row, key)) for row in rows}
+    model.objects.bulk_create(rows, ignore_conflicts=True)
+    # ignore_conflicts leaves pks unset: read back the planned pairs, all missing before the
+    # insert in this transaction (no clock involved, so created_at skew cannot hide rows)
+    created = [
+        row for row in existing.order_by("memory_id", "pk")
+        if (row.memory_id, getattr(row, key)) in planned
+    ]
+    lost = planned - {(row.memory_id, getattr(row, key)) for row in created}
+    skipped.extend({"memory": memory_id, key: name} for memory_id, name in sorted(lost))
+
+    deltas = {}
+    for row in created:
+        deltas[row.memory_id] = deltas.get(row.memory_id, 0) + 1
+    touch_memories(counter, deltas)
+    return created, skipped
@@ -1,3 +1,1286 @@
-from django.test import TestCase
+import base64
+import io
+import json
+import os
+import shutil
+import tempfile
+import struct
+import threading
+import time
+import wave
+import zipfile
+from datetime import date, timedelta
+from unittest import mock
+from urllib.parse import parse_qsl
 
-# Create your tests here.
+import cloudinary
+import cloudinary.utils
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import AccessToken
+
+from . import media, serving
+from .export import export_archive
+from .access import MemoryAccess
+from .fast_serializers import FastSerializer
+from .media import claim_next_job, process_job
+from .normalize import prepare_image
+from .waveforms import compute_waveform, resolution_param, waveform_level
+from .models import (
+    FamilyLink, FamilyMember, MediaUploadJob, Memory, MemoryComment, MemoryImage, MemoryLike,
+    MemoryPerson, MemoryTag, MemoryVideo, MemoryVoiceRecording, StoredAsset, SyncTombstone, TimelineVersion,
+    UploadSession,
+)
+from .serializers import (
+    MemoryDetailSerializer, MemoryImageSerializer, MemoryPersonSerializer, MemorySerializer,
+    MemoryTagSerializer, MemoryVideoSerializer, MemoryVoiceRecordingSerializer,
+)
+from .viewer_state import viewer_context
+from .views import memory_detail_queryset
+
+GIF = (
+    b"GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x01\x00"
+    b"\x00\x00\x00,\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;"
+)
+
+
+def png(color, size=(4, 4)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class FastSerializerParityTests(TestCase):
+    """FastSerializer must render byte-for-byte what the DRF serializers render"""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.patient = User.objects.create_user("ann", first_name="Ann")
+        cls.family = User.objects.create_user("ben")
+        cls.family.role = "family"  # can_edit through the approved link
+        FamilyLink.objects.create(patient=cls.patient, family_member=cls.family, status="APPROVED")
+
+        zoe = FamilyMember.objects.create(
+            user=cls.patient, name="Zoë", relation="Granddaughter",
+            avatar=SimpleUploadedFile("zoë avatar.gif", GIF, content_type="image/gif"),
+        )
+        sam = FamilyMember.objects.create(user=cls.patient, name="Sam")
+
+        cls.remote = Memory.objects.create(
+            user=cls.patient, title="Beach", description="Sunny", date=date(2020, 7, 1),
+            location="Goa", tag="Trip", image_url="https://res.cloudinary.com/demo/image/upload/v1/a.jpg",
+            image_width=1600, image_height=1200, image_placeholder="data:image/webp;base64,UklGRg==",
+        )
+        cls.remote.members.set([zoe, sam])
+        cls.local = Memory.objects.create(
+            user=cls.patient, title="Kitchen", date=date(1999, 12, 31),
+            image=SimpleUploadedFile("kitchen.gif", GIF, content_type="image/gif"),
+        )
+
+        MemoryImage.objects.create(
+            memory=cls.remote, image_url="https://example.com/1.webp", original_url="https://example.com/1.jpg",
+            width=800, height=600, placeholder="data:image/webp;base64,UklGRg==", caption="One",
+        )
+        MemoryImage.objects.create(
+            memory=cls.remote, order=1, image=SimpleUploadedFile("two.gif", GIF, content_type="image/gif"),
+        )
+        MemoryVideo.objects.create(
+            memory=cls.remote, video_url="https://example.com/v.mp4", thumbnail_url="https://example.com/t.jpg",
+            duration=timedelta(minutes=2, seconds=30, microseconds=250), file_size=10 ** 10,
+        )
+        MemoryVideo.objects.create(
+            memory=cls.remote, order=1, video=SimpleUploadedFile("clip.mp4", b"\x00" * 16),
+        )
+        MemoryVoiceRecording.objects.create(
+            memory=cls.remote, audio_url="https://example.com/a.mp3", speaker_name="Ben",
+            speaker_relation="Son", duration=timedelta(seconds=61), transcript="We swam",
+            waveform_data=[0, 12, -7],
+            waveform_peaks={"duration": 61.0, "levels": [
+                {"resolution": 2, "peaks": "gX8AAQ=="}, {"resolution": 4, "peaks": "gX8AAQIDBAU="},
+            ]},
+        )
+        MemoryVoiceRecording.objects.create(memory=cls.remote, audio=SimpleUploadedFile("note.mp3", b"\x00" * 16))
+        MemoryPerson.objects.create(memory=cls.remote, name="Grandpa Joe", relation="Grandfather")
+        MemoryPerson.objects.create(memory=cls.remote, name="  ", avatar_url="https://example.com/p.jpg")
+        MemoryTag.objects.create(memory=cls.remote, tag_name="summer")
+        MemoryLike.objects.create(memory=cls.remote, user=cls.family)
+        MemoryComment.objects.create(memory=cls.remote, user=cls.patient, content="Lovely")
+        MemoryComment.objects.create(memory=cls.remote, user=cls.family, content="Yes!")
+
+    def request_for(self, user):
+        request = APIRequestFactory().get("/api/memories/")
+        request.user = user
+        return request
+
+    def assertRendersSame(self, fast, drf):
+        self.assertEqual(JSONRenderer().render(fast), JSONRenderer().render(drf))
+
+    def test_memory_list(self):
+        for user in (self.patient, self.family):
+            request = self.request_for(user)
+            memories = list(Memory.objects.select_related("user").prefetch_related("members").order_by("-id"))
+            drf = MemorySerializer(memories, many=True, context=viewer_context(request, memories)).data
+            fast = FastSerializer(viewer_context(request, memories))
+            self.assertRendersSame(fast.many(fast.memory, memories), drf)
+
+    def test_memory_detail(self):
+        for user in (self.patient, self.family):
+            request = self.request_for(user)
+            for pk in (self.remote.pk, self.local.pk):
+                memory = memory_detail_queryset().get(pk=pk)
+                drf = MemoryDetailSerializer(memory, context=viewer_context(request, [memory])).data
+                fast = FastSerializer(viewer_context(request, [memory])).memory_detail(memory)
+                self.assertRendersSame(fast, drf)
+
+    def test_without_viewer_state(self):
+        request = self.request_for(self.family)
+        memories = list(Memory.objects.order_by("id"))
+        drf = MemorySerializer(memories, many=True, context={"request": request}).data
+        fast = FastSerializer({"request": request})
+        self.assertRendersSame(fast.many(fast.memory, memories), drf)
+
+    def test_media_without_request(self):
+        fast = FastSerializer()
+        cases = [
+            (fast.image, MemoryImageSerializer, MemoryImage),
+            (fast.video, MemoryVideoSerializer, MemoryVideo),
+            (fast.voice_recording, MemoryVoiceRecordingSerializer, MemoryVoiceRecording),
+            (fast.person, MemoryPersonSerializer, MemoryPerson),
+            (fast.tag, MemoryTagSerializer, MemoryTag),
+        ]
+        for method, serializer_class, model in cases:
+            objects = list(model.objects.all())
+            self.assertTrue(objects)
+            self.assertRendersSame(fast.many(method, objects), serializer_class(objects, many=True).data)
+
+
+class ApiTestCase(TestCase):
+    """A patient with an approved family member; the process-wide cache starts empty"""
+
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        self.enterContext(self.settings(
+            MEDIA_ROOT=self.media_root, MEDIA_SPOOL_DIR=os.path.join(self.media_root, "spool"),
+            MEDIA_STORAGE_BACKEND="api.storage.LocalMediaStorage",
+        ))
+        self.patient = User.objects.create_user("ann")
+        self.family = User.objects.create_user("ben")
+        self.family.role = "family"
+        FamilyLink.objects.create(patient=self.patient, family_member=self.family, status="APPROVED")
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def memory(self, title="Beach", user=None, **fields):
+        fields.setdefault("date", date(2020, 7, 1))
+        return Memory.objects.create(user=user or self.patient, title=title, **fields)
+
+
+class ConditionalGetTests(ApiTestCase):
+    def test_list_revalidates_after_write(self):
+        memory = self.memory()
+        client = self.client_for(self.patient)
+        etag = client.get("/api/memories/")["ETag"]
+        self.assertEqual(client.get("/api/memories/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        MemoryComment.objects.create(memory=memory, user=self.family, content="Lovely")
+        response = client.get("/api/memories/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_detail_revalidates_after_family_member_edit(self):
+        zoe = FamilyMember.objects.create(user=self.patient, name="Zoë")
+        memory = self.memory()
+        memory.members.add(zoe)
+        client = self.client_for(self.patient)
+        url = f"/api/memories/{memory.pk}/detail/"
+        etag = client.get(url)["ETag"]
+        self.assertEqual(client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Renaming the member changes members_detail but not the memory's updated_at
+        zoe.name = "Zoe"
+        zoe.save()
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["members_detail"][0]["name"], "Zoe")
+
+    def test_list_revalidates_in_a_new_signing_window(self):
+        self.memory(image=SimpleUploadedFile("photo.gif", GIF, content_type="image/gif"))
+        client = self.client_for(self.patient)
+        response = client.get("/api/memories/")
+        etag, url = response["ETag"], response.json()[0]["resolved_image_url"]
+        self.assertEqual(client.get("/api/memories/", HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        # Cached and 304 payloads must not outlive their signed media URLs
+        with mock.patch("api.serving.time") as clock:
+            clock.time.return_value = time.time() + 2 * settings.MEDIA_URL_SIGNATURE_TTL
+            response = client.get("/api/memories/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.json()[0]["resolved_image_url"], url)
+
+
+class SyncTombstoneTests(ApiTestCase):
+    def test_deletions_since_token(self):
+        memory = self.memory()
+        image = MemoryImage.objects.create(memory=self.memory("Kitchen"), image_url="https://example.com/1.webp")
+        client = self.client_for(self.family)
+        token = client.get("/api/memories/changes/").json()["sync_token"]
+
+        expected = [("image", image.pk), ("memory", memory.pk)]
+        memory.delete()
+        image.delete()
+        deleted = client.get("/api/memories/changes/", {"since": token}).json()["deleted"]
+        self.assertEqual(sorted((item["type"], item["id"]) for item in deleted), expected)
+        self.assertEqual(client.get("/api/memories/changes/", {"since": "garbage"}).status_code, 400)
+
+    def assertPatientGone(self, patient_id):
+        connection.check_constraints()  # no bookkeeping rows left pointing at deleted users
+        self.assertFalse(SyncTombstone.objects.filter(patient_id=patient_id).exists())
+        self.assertFalse(TimelineVersion.objects.filter(patient_id=patient_id).exists())
+
+    def test_delete_patient(self):
+        MemoryImage.objects.create(memory=self.memory(), image_url="https://example.com/1.webp")
+        patient_id = self.patient.pk
+        self.patient.delete()
+        self.assertPatientGone(patient_id)
+
+    def test_delete_patient_through_queryset(self):
+        MemoryImage.objects.create(memory=self.memory(), image_url="https://example.com/1.webp")
+        User.objects.filter(pk=self.patient.pk).delete()
+        self.assertPatientGone(self.patient.pk)
+
+    def test_delete_patient_and_commenter_together(self):
+        memory = self.memory()
+        MemoryComment.objects.create(memory=memory, user=self.family, content="Lovely")
+        MemoryLike.objects.create(memory=memory, user=self.family)
+        User.objects.filter(pk__in=[self.patient.pk, self.family.pk]).delete()
+        self.assertPatientGone(self.patient.pk)
+
+    def test_delete_family_user_updates_patient(self):
+        memory = self.memory()
+        MemoryComment.objects.create(memory=memory, user=self.family, content="Lovely")
+        version = TimelineVersion.objects.get(patient=self.patient).version
+        self.family.delete()
+        memory.refresh_from_db()
+        self.assertEqual(memory.comments_count, 0)
+        self.assertGreater(TimelineVersion.objects.get(patient=self.patient).version, version)
+
+
+class SearchTests(ApiTestCase):
+    def search(self, user, query):
+        response = self.client_for(user).get("/api/memories/search/", {"q": query})
+        self.assertEqual(response.status_code, 200)
+        return response.json()["results"]
+
+    def test_scoped_to_readable_patients(self):
+        stranger = User.objects.create_user("cat")
+        with self.captureOnCommitCallbacks(execute=True):
+            mine = self.memory("Picnic at the lake")
+            self.memory("Picnic in the park", user=stranger)
+        for user in (self.patient, self.family):
+            self.assertEqual([item["id"] for item in self.search(user, "picnic")], [mine.pk])
+
+    def test_highlight_is_escaped(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.memory("<img src=x onerror=alert(1)> picnic & cake")
+        highlight = self.search(self.patient, "picnic")[0]["highlight"]
+        self.assertNotIn("<img", highlight)
+        self.assertIn("&lt;img src=x onerror=alert(1)&gt; <mark>picnic</mark> &amp; cake", highlight)
+
+
+class UploadJobTests(ApiTestCase):
+    def spooled_job(self):
+        os.makedirs(settings.MEDIA_SPOOL_DIR, exist_ok=True)
+        path = os.path.join(settings.MEDIA_SPOOL_DIR, "photo.gif")
+        with open(path, "wb") as fh:
+            fh.write(GIF)
+        return MediaUploadJob.objects.create(
+            memory=self.memory(), kind="image", spool_path=path, original_name="photo.gif", size=len(GIF),
+        )
+
+    def test_claim_and_process(self):
+        job = self.spooled_job()
+        claimed = claim_next_job()
+        self.assertEqual((claimed.pk, claimed.status, claimed.attempts), (job.pk, "processing", 1))
+        self.assertIsNone(claim_next_job())  # not stale yet
+
+        self.assertTrue(process_job(claimed))
+        job.refresh_from_db()
+        self.assertEqual(job.status, "succeeded")
+        self.assertEqual(MemoryImage.objects.get(memory=job.memory).pk, job.result_id)
+        self.assertFalse(os.path.exists(job.spool_path))
+
+    def test_reclaimed_job_creates_one_row(self):
+        job = self.spooled_job()
+        first = claim_next_job()
+        stale = timezone.now() - timedelta(seconds=settings.UPLOAD_JOB_STALE_SECONDS + 1)
+        MediaUploadJob.objects.filter(pk=job.pk).update(updated_at=stale)
+        second = claim_next_job()
+        self.assertEqual((second.pk, second.attempts), (job.pk, 2))
+
+        self.assertFalse(process_job(first))  # superseded: creates nothing
+        self.assertTrue(process_job(second))
+        self.assertEqual(MemoryImage.objects.filter(memory=job.memory).count(), 1)
+        job.memory.refresh_from_db()
+        self.assertEqual(job.memory.images_count, 1)
+
+
+class MediaServingTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.image = MemoryImage.objects.create(
+            memory=self.memory(), image=SimpleUploadedFile("photo.gif", GIF, content_type="image/gif"),
+        )
+        self.url = f"/media/{self.image.image.name}"
+        self.stranger = User.objects.create_user("cat")
+
+    def test_access_checked(self):
+        self.assertEqual(APIClient().get(self.url).status_code, 401)
+        self.assertEqual(self.client_for(self.stranger).get(self.url).status_code, 404)
+        response = self.client_for(self.family).get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), GIF)
+        # The access token is not accepted from the query string
+        token = str(AccessToken.for_user(self.patient))
+        self.assertEqual(APIClient().get(self.url, {"access_token": token}).status_code, 401)
+
+    def test_signed_urls_from_the_api(self):
+        payload = self.client_for(self.family).get(f"/api/memories/{self.image.memory_id}/detail/").json()
+        image = payload["images"][0]
+        self.assertIn("signature=", image["image"])
+        response = APIClient().get(image["image"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), GIF)
+        response = APIClient().get(image["image_variants"]["thumbnail"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/webp")
+
+    def test_bad_signatures_refused(self):
+        query = dict(parse_qsl(serving.signed_query(self.image.image.name)))
+        client = APIClient()
+        self.assertEqual(client.get(self.url, query).status_code, 200)
+        self.assertEqual(client.get(self.url, {**query, "signature": "0" * 64}).status_code, 401)
+        self.assertEqual(client.get(self.url, {**query, "expires": int(query["expires"]) + 1}).status_code, 401)
+        other = MemoryImage.objects.create(
+            memory=self.image.memory, image=SimpleUploadedFile("other.gif", GIF, content_type="image/gif"),
+        )
+        self.assertEqual(client.get(f"/media/{other.image.name}", query).status_code, 401)
+        with mock.patch("api.serving.time") as clock:
+            clock.time.return_value = int(query["expires"])
+            self.assertEqual(client.get(self.url, query).status_code, 401)
+
+    def test_range(self):
+        client = self.client_for(self.patient)
+        response = client.get(self.url, HTTP_RANGE="bytes=0-5")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes 0-5/{len(GIF)}")
+        self.assertEqual(b"".join(response.streaming_content), GIF[:6])
+        response = client.get(self.url, HTTP_RANGE="bytes=-4")
+        self.assertEqual(b"".join(response.streaming_content), GIF[-4:])
+        self.assertEqual(client.get(self.url, HTTP_RANGE=f"bytes={len(GIF)}-").status_code, 416)
+        # A stale If-Range validator gets the whole file
+        response = client.get(self.url, HTTP_RANGE="bytes=0-5", HTTP_IF_RANGE='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_variants_access_checked(self):
+        url = f"/api/media/variants/full/{self.image.image.name}"
+        self.assertEqual(APIClient().get(url).status_code, 401)
+        self.assertEqual(self.client_for(self.stranger).get(url).status_code, 404)
+        response = self.client_for(self.family).get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "image/webp")
+
+
+class ExportTests(ApiTestCase):
+    def archive(self):
+        return zipfile.ZipFile(io.BytesIO(b"".join(export_archive(self.patient))))
+
+    def test_only_storage_urls_are_fetched(self):
+        self.memory(image_url="http://169.254.169.254/latest/meta-data/")
+        self.memory(image_url="https://res.cloudinary.com/demo/image/upload/v1/a.jpg")
+        redirect = mock.Mock(status_code=302, headers={"Location": "http://10.0.0.1/"})
+        with mock.patch("api.export.requests.get", return_value=redirect) as get:
+            archive = self.archive()
+        get.assert_called_once_with(
+            "https://res.cloudinary.com/demo/image/upload/v1/a.jpg", stream=True, timeout=mock.ANY,
+            allow_redirects=False,
+        )
+        errors = json.loads(archive.read("export_errors.json"))
+        self.assertEqual(
+            sorted((error["source"], error["error"]) for error in errors),
+            [
+                ("http://169.254.169.254/latest/meta-data/", "not fetched: not a media storage URL"),
+                ("https://res.cloudinary.com/demo/image/upload/v1/a.jpg", "HTTP 302"),
+            ],
+        )
+        self.assertEqual([name for name in archive.namelist() if name.startswith("media/")], [])
+
+
+class CursorPaginationTests(ApiTestCase):
+    def ids(self, response):
+        self.assertEqual(response.status_code, 200)
+        return [item["id"] for item in response.json()["results"]]
+
+    def test_next_and_previous(self):
+        ids = [self.memory(f"M{i}").pk for i in range(5)][::-1]
+        client = self.client_for(self.patient)
+        first = client.get("/api/memories/", {"page_size": 2})
+        self.assertEqual(self.ids(first), ids[:2])
+        self.assertIsNone(first.json()["previous"])
+
+        second = client.get(first.json()["next"])
+        self.assertEqual(self.ids(second), ids[2:4])
+        third = client.get(second.json()["next"])
+        self.assertEqual(self.ids(third), ids[4:])
+        self.assertIsNone(third.json()["next"])
+
+        self.assertEqual(self.ids(client.get(third.json()["previous"])), ids[2:4])
+        self.assertEqual(self.ids(client.get(second.json()["previous"])), ids[:2])
+
+    def test_date_ordering(self):
+        newer = self.memory("Newer", date=date(2000, 1, 1))
+        older = self.memory("Older", date=date(1980, 1, 1))
+        client = self.client_for(self.patient)
+        first = client.get("/api/memories/", {"page_size": 1, "ordering": "-date"})
+        self.assertEqual(self.ids(first), [newer.pk])
+        self.assertEqual(self.ids(client.get(first.json()["next"])), [older.pk])
+
+    def test_invalid_cursor(self):
+        client = self.client_for(self.patient)
+        self.assertEqual(client.get("/api/memories/", {"cursor": "not-a-cursor"}).status_code, 404)
+        self.assertEqual(client.get("/api/memories/", {"ordering": "title"}).status_code, 404)
+        # A cursor made for another ordering is rejected too
+        self.memory("A")
+        self.memory("B")
+        next_link = client.get("/api/memories/", {"page_size": 1}).json()["next"]
+        self.assertEqual(client.get(next_link.replace("page_size=1", "page_size=1&ordering=-date")).status_code, 404)
+
+    def test_legacy_list(self):
+        self.memory()
+        response = self.client_for(self.patient).get("/api/memories/")
+        self.assertIsInstance(response.json(), list)
+
+
+class MemoryCounterTests(ApiTestCase):
+    def counts(self, memory):
+        memory.refresh_from_db()
+        return memory.get_media_counts(), memory.likes_count, memory.comments_count
+
+    def test_signals_keep_counters(self):
+        memory = self.memory()
+        image = MemoryImage.objects.create(memory=memory, image_url="https://example.com/1.webp")
+        MemoryVideo.objects.create(memory=memory, video_url="https://example.com/v.mp4")
+        MemoryPerson.objects.create(memory=memory, name="Ann")
+        MemoryTag.objects.create(memory=memory, tag_name="summer")
+        like = MemoryLike.objects.create(memory=memory, user=self.family)
+        MemoryComment.objects.create(memory=memory, user=self.family, content="Lovely")
+        self.assertEqual(
+            self.counts(memory),
+            ({"images": 1, "videos": 1, "voice_recordings": 0, "people": 1, "tags": 1}, 1, 1),
+        )
+        image.delete()
+        like.delete()
+        self.assertEqual(
+            self.counts(memory),
+            ({"images": 0, "videos": 1, "voice_recordings": 0, "people": 1, "tags": 1}, 0, 1),
+        )
+
+    def test_reconcile_fixes_drift(self):
+        memory = self.memory()
+        MemoryTag.objects.create(memory=memory, tag_name="summer")
+        MemoryComment.objects.create(memory=memory, user=self.family, content="Lovely")
+        Memory.objects.filter(pk=memory.pk).update(tags_count=7, comments_count=0, images_count=3)
+
+        out = io.StringIO()
+        call_command("reconcile_memory_counters", "--dry-run", stdout=out)
+        self.assertIn("1 memories would be fixed", out.getvalue())
+        self.assertEqual(Memory.objects.get(pk=memory.pk).tags_count, 7)
+
+        call_command("reconcile_memory_counters", stdout=io.StringIO())
+        memory.refresh_from_db()
+        self.assertEqual((memory.tags_count, memory.comments_count, memory.images_count), (1, 1, 0))
+
+
+class AccessCacheTests(ApiTestCase):
+    def visible(self, user):
+        return [item["id"] for item in self.client_for(user).get("/api/memories/").json()]
+
+    def test_link_changes_invalidate_cached_access(self):
+        memory = self.memory()
+        self.assertEqual(self.visible(self.family), [memory.pk])
+        with self.assertNumQueries(0):
+            MemoryAccess(self.family).readable_patient_ids  # served from the cross-request cache
+
+        link = FamilyLink.objects.get(family_member=self.family)
+        link.status = "REJECTED"
+        link.save()
+        self.assertEqual(self.visible(self.family), [])
+
+        link.status = "APPROVED"
+        link.save()
+        self.assertEqual(self.visible(self.family), [memory.pk])
+
+        link.delete()
+        self.assertEqual(self.visible(self.family), [])
+        self.assertEqual(self.client_for(self.family).get(f"/api/memories/{memory.pk}/detail/").status_code, 404)
+
+
+class TimelineCacheTests(ApiTestCase):
+    def get(self, user, url="/api/memories/"):
+        response = self.client_for(user).get(url)
+        return response["X-Timeline-Cache"], response.json()
+
+    def test_write_bumps_version(self):
+        memory = self.memory()
+        self.assertEqual(self.get(self.patient)[0], "miss")
+        self.assertEqual(self.get(self.patient)[0], "hit")
+
+        memory.title = "Lake"
+        memory.save()
+        state, payload = self.get(self.patient)
+        self.assertEqual((state, payload[0]["title"]), ("miss", "Lake"))
+
+        url = f"/api/memories/{memory.pk}/detail/"
+        self.assertEqual(self.get(self.patient, url)[0], "miss")
+        MemoryTag.objects.create(memory=memory, tag_name="summer")
+        state, payload = self.get(self.patient, url)
+        self.assertEqual((state, [tag["tag_name"] for tag in payload["event_tags"]]), ("miss", ["summer"]))
+
+    def test_viewer_fields_on_shared_entry(self):
+        memory = self.memory()
+        MemoryLike.objects.create(memory=memory, user=self.family)
+        self.assertEqual(self.get(self.patient)[1][0]["is_liked"], False)
+        # Same patient, same version: the family user reuses the entry with their own is_liked
+        state, payload = self.get(self.family)
+        self.assertEqual((state, payload[0]["is_liked"]), ("hit", True))
+
+
+class UploadInspectionTests(ApiTestCase):
+    def upload(self, content, name="photo.gif", content_type="image/gif"):
+        memory = self.memory()
+        response = self.client_for(self.patient).post(
+            f"/api/memories/{memory.pk}/images/",
+            {"image": SimpleUploadedFile(name, content, content_type=content_type)}, format="multipart",
+        )
+        return memory, response
+
+    def test_oversize_upload_rejected(self):
+        limits = {**settings.MEDIA_MAX_UPLOAD_SIZE, "image": len(GIF) - 1}
+        with self.settings(MEDIA_MAX_UPLOAD_SIZE=limits):
+            memory, response = self.upload(GIF)
+        self.assertEqual(response.status_code, 413)
+        self.assertFalse(MediaUploadJob.objects.filter(memory=memory).exists())
+
+    def test_every_form_view_answers_413(self):
+        limits = {**settings.MEDIA_MAX_UPLOAD_SIZE, "avatar": 10, "import": 10, "other": 10}
+        client = self.client_for(self.patient)
+        with self.settings(MEDIA_MAX_UPLOAD_SIZE=limits):
+            avatar = client.post("/api/family-members/", {
+                "name": "Zoë", "avatar": SimpleUploadedFile("zoe.gif", GIF, content_type="image/gif"),
+            }, format="multipart")
+            imported = client.post("/api/memories/import/", {
+                "file": SimpleUploadedFile("memories.csv", b"title,date\nBeach,2020-07-01\n"),
+            }, format="multipart")
+            unexpected = client.post("/api/memories/", {
+                "title": "Beach", "date": "2020-07-01", "attachment": SimpleUploadedFile("notes.txt", b"x" * 11),
+            }, format="multipart")
+        for response, field in ((avatar, "avatar"), (imported, "file"), (unexpected, "attachment")):
+            self.assertEqual(response.status_code, 413)
+            self.assertEqual((response.data["field"], response.data["limit"]), (field, 10))
+        self.assertFalse(FamilyMember.objects.exists())
+        self.assertFalse(Memory.objects.exists())
+
+    def test_sniffed_type_decides(self):
+        memory, response = self.upload(b"#!/bin/sh\necho not an image\n")
+        self.assertEqual(response.status_code, 415)
+        self.assertFalse(MediaUploadJob.objects.filter(memory=memory).exists())
+
+    def test_accepted_upload_is_hashed(self):
+        memory, response = self.upload(GIF, content_type="application/octet-stream")
+        self.assertEqual(response.status_code, 202)
+        job = MediaUploadJob.objects.get(memory=memory)
+        self.assertEqual((job.size, len(job.sha256)), (len(GIF), 64))
+
+    def test_memory_form_with_image(self):
+        response = self.client_for(self.patient).post("/api/memories/", {
+            "title": "Beach", "date": "2020-07-01",
+            "image": SimpleUploadedFile("photo.gif", GIF, content_type="image/gif"),
+        }, format="multipart")
+        self.assertEqual(response.status_code, 202, response.content)
+        self.assertEqual(response.data["title"], "Beach")
+        self.assertEqual(response.data["upload_job"]["kind"], "memory")
+
+
+class ImportTests(ApiTestCase):
+    def post(self, body, content_type="application/x-ndjson", user=None):
+        return self.client_for(user or self.patient).generic(
+            "POST", "/api/memories/import/", body.encode(), content_type=content_type,
+        )
+
+    def test_bad_rows_are_reported_per_line(self):
+        FamilyMember.objects.create(user=self.patient, name="Mum")
+        body = "\n".join([
+            json.dumps({"title": "Beach", "date": "2020-07-01", "tags": ["sea", "sea"], "members": ["Mum"]}),
+            "",
+            "{not json",
+            json.dumps({"title": "No date"}),
+            json.dumps({"title": "Party", "date": "2021-01-01", "members": ["Ghost"]}),
+            json.dumps(["a", "list"]),
+        ])
+        response = self.post(body)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data["created"], response.data["failed"]), (1, 4))
+        errors = {error["line"]: error["errors"] for error in response.data["errors"]}
+        self.assertEqual(sorted(errors), [3, 4, 5, 6])
+        self.assertIn("non_field_errors", errors[3])
+        self.assertIn("date", errors[4])
+        self.assertEqual(errors[5], {"members": ["Unknown family member: Ghost"]})
+
+        memory = Memory.objects.get(user=self.patient)
+        self.assertEqual((memory.title, memory.tags_count), ("Beach", 1))
+        self.assertEqual(list(memory.members.values_list("name", flat=True)), ["Mum"])
+
+    def test_nothing_created_is_bad_request(self):
+        response = self.post("{not json\n")
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual((response.data["created"], response.data["failed"]), (0, 1))
+
+    def test_csv_lists(self):
+        body = "title,date,tags,people\nBeach,2020-07-01,sea;sun,Ben:Son;Cat\nBad,not-a-date,,\n"
+        response = self.post(body, content_type="text/csv")
+        self.assertEqual((response.data["created"], response.data["failed"]), (1, 1))
+        self.assertEqual(response.data["errors"][0]["line"], 3)
+        memory = Memory.objects.get(user=self.patient)
+        self.assertEqual(sorted(memory.event_tags.values_list("tag_name", flat=True)), ["sea", "sun"])
+        self.assertEqual(
+            sorted(MemoryPerson.objects.filter(memory=memory).values_list("name", "relation")),
+            [("Ben", "Son"), ("Cat", "")],
+        )
+
+    def test_family_imports_for_linked_patient(self):
+        body = json.dumps({"title": "Beach", "date": "2020-07-01"})
+        self.assertEqual(self.post(body, user=self.family).status_code, 400)
+        url = f"/api/memories/import/?patient_id={self.patient.pk}"
+        response = self.client_for(self.family).generic("POST", url, body.encode(), content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(Memory.objects.filter(user=self.patient, title="Beach").exists())
+
+        stranger = User.objects.create_user("eve")
+        stranger.role = "family"
+        response = self.client_for(stranger).generic("POST", url, body.encode(), content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, 403)
+
+
+class TaggingTests(ApiTestCase):
+    def test_existing_and_repeated_names_are_skipped(self):
+        memory = self.memory()
+        MemoryTag.objects.create(memory=memory, tag_name="sea")
+        response = self.client_for(self.patient).post(f"/api/memories/{memory.pk}/tags/", {
+            "tags": [{"tag_name": "sea"}, {"tag_name": "sun"}, {"tag_name": "sun", "color": "#fff"}],
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([tag["tag_name"] for tag in response.data["created"]], ["sun"])
+        self.assertEqual(response.data["skipped"], [
+            {"memory": memory.pk, "tag_name": "sea"}, {"memory": memory.pk, "tag_name": "sun"},
+        ])
+        memory.refresh_from_db()
+        self.assertEqual(memory.tags_count, 2)
+
+    def test_created_rows_found_when_the_clock_steps_back(self):
+        memory = self.memory()
+        start = timezone.now()
+        ticks = iter(range(0, -1000, -1))
+        with mock.patch("django.utils.timezone.now", side_effect=lambda: start + timedelta(seconds=next(ticks))):
+            response = self.client_for(self.patient).post(f"/api/memories/{memory.pk}/tags/", {
+                "tags": [{"tag_name": "sea"}, {"tag_name": "sun"}],
+            }, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([tag["tag_name"] for tag in response.data["created"]], ["sea", "sun"])
+        self.assertEqual(response.data["skipped"], [])
+        memory.refresh_from_db()
+        self.assertEqual(memory.tags_count, 2)
+
+    def test_invalid_item_attaches_nothing(self):
+        memory = self.memory()
+        response = self.client_for(self.patient).post(f"/api/memories/{memory.pk}/people/", {
+            "people": [{"name": "Ben"}, {"relation": "Son"}],
+        }, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("people", response.data)
+        self.assertFalse(MemoryPerson.objects.filter(memory=memory).exists())
+
+    def test_bulk_tag(self):
+        first, second = self.memory("Beach"), self.memory("Party")
+        MemoryPerson.objects.create(memory=first, name="Ben")
+        version = TimelineVersion.objects.get(patient=self.patient).version
+        response = self.client_for(self.family).post("/api/memories/bulk-tag/", {
+            "memory_ids": [first.pk, second.pk, first.pk],
+            "people": [{"name": "Ben", "relation": "Son"}],
+            "tags": [{"tag_name": "summer"}],
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["people"]["skipped"], [{"memory": first.pk, "name": "Ben"}])
+        self.assertEqual(len(response.data["people"]["created"]), 1)
+        self.assertEqual(len(response.data["tags"]["created"]), 2)
+        self.assertEqual(TimelineVersion.objects.get(patient=self.patient).version, version + 1)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.people_count, first.tags_count), (1, 1))
+        self.assertEqual((second.people_count, second.tags_count), (1, 1))
+
+    def test_bulk_tag_other_patients_memories(self):
+        other = User.objects.create_user("cat")
+        theirs = self.memory(user=other)
+        response = self.client_for(self.patient).post("/api/memories/bulk-tag/", {
+            "memory_ids": [self.memory().pk, theirs.pk], "tags": [{"tag_name": "summer"}],
+        }, format="json")
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.data["memory_ids"], [theirs.pk])
+        self.assertFalse(MemoryTag.objects.exists())
+
+
+class ViewerStateQueryTests(ApiTestCase):
+    """Viewer-dependent fields are resolved per page, not per row"""
+
+    def queries(self, user, url, params=None, rows=None):
+        cache.clear()  # a cached timeline would hide the serializer's queries
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client_for(user).get(url, params)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(len(data["results"] if isinstance(data, dict) else data), rows)
+        return len(captured)
+
+    def add_memories(self, count):
+        zoe, _ = FamilyMember.objects.get_or_create(user=self.patient, name="Zoë")
+        for i in range(count):
+            memory = self.memory(f"M{i}")
+            memory.members.add(zoe)
+            MemoryLike.objects.create(memory=memory, user=self.family)
+
+    def test_memory_list(self):
+        self.add_memories(2)
+        small = self.queries(self.patient, "/api/memories/", {"page_size": 2}, rows=2)
+        family_small = self.queries(self.family, "/api/memories/", {"page_size": 2}, rows=2)
+        self.add_memories(8)
+        self.assertEqual(self.queries(self.patient, "/api/memories/", {"page_size": 10}, rows=10), small)
+        self.assertEqual(self.queries(self.family, "/api/memories/", {"page_size": 10}, rows=10), family_small)
+
+    def test_family_member_list(self):
+        memory = self.memory()
+        for i in range(2):
+            memory.members.add(FamilyMember.objects.create(user=self.patient, name=f"F{i}"))
+        small = self.queries(self.patient, "/api/family-members/", rows=2)
+        for i in range(2, 8):
+            memory.members.add(FamilyMember.objects.create(user=self.patient, name=f"F{i}"))
+        self.assertEqual(self.queries(self.patient, "/api/family-members/", rows=8), small)
+
+
+class NavigationTests(ApiTestCase):
+    def navigate(self, memory, user=None):
+        response = self.client_for(user or self.patient).get(f"/api/memories/{memory.pk}/navigation/")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return (
+            data["current_position"], data["total_memories"],
+            data["previous_memory"] and data["previous_memory"]["id"],
+            data["next_memory"] and data["next_memory"]["id"],
+        )
+
+    def test_ends_and_ties(self):
+        old, tied_low, tied_high = self.memory("Old"), self.memory("A"), self.memory("B")
+        moment = timezone.now()
+        Memory.objects.filter(pk=old.pk).update(created_at=moment - timedelta(days=1))
+        Memory.objects.filter(pk__in=[tied_low.pk, tied_high.pk]).update(created_at=moment)
+
+        # Newest first; equal created_at falls back to the higher id first
+        self.assertEqual(self.navigate(tied_high), (1, 3, None, tied_low.pk))
+        self.assertEqual(self.navigate(tied_low), (2, 3, tied_high.pk, old.pk))
+        self.assertEqual(self.navigate(old), (3, 3, tied_low.pk, None))
+        self.assertEqual(self.navigate(old, user=self.family), (3, 3, tied_low.pk, None))
+
+    def test_position_is_cached_until_timeline_changes(self):
+        first = self.memory("First")
+        self.assertEqual(self.navigate(first), (1, 1, None, None))
+        with CaptureQueriesContext(connection) as warm:
+            self.navigate(first)
+        self.assertFalse([query for query in warm if "COUNT(" in query["sql"]])
+
+        second = self.memory("Second")
+        self.assertEqual(self.navigate(first), (2, 2, second.pk, None))
+        self.assertEqual(self.navigate(second), (1, 2, None, first.pk))
+
+
+class BulkMediaTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.target = self.memory()
+        self.url = f"/api/memories/{self.target.pk}/media/bulk/"
+
+    def files(self, field, *contents):
+        return [SimpleUploadedFile(f"{field}{i}.png", content) for i, content in enumerate(contents)]
+
+    def test_uploads_run_concurrently_up_to_the_limit(self):
+        lock, active, peak = threading.Lock(), [0], [0]
+        real_store = media.store
+
+        def tracking_store(*args, **kwargs):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.05)
+            try:
+                return real_store(*args, **kwargs)
+            finally:
+                with lock:
+                    active[0] -= 1
+
+        images = self.files("images", *(png((i * 40, 0, 0)) for i in range(5)))
+        with self.settings(BULK_UPLOAD_CONCURRENCY=2), mock.patch("api.media.store", side_effect=tracking_store):
+            response = self.client_for(self.patient).post(self.url, {"images": images}, format="multipart")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(peak[0], 2)
+        self.assertEqual([image["order"] for image in response.data["images"]], [0, 1, 2, 3, 4])
+
+    def test_one_insert_per_type(self):
+        images = self.files("images", png("red"), png("green"), png("red"))
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client_for(self.patient).post(self.url, {"images": images}, format="multipart")
+        self.assertEqual(response.status_code, 201)
+        inserts = [query for query in captured if query["sql"].startswith('INSERT INTO "api_memoryimage"')]
+        self.assertEqual(len(inserts), 1)
+        self.target.refresh_from_db()
+        self.assertEqual(self.target.images_count, 3)
+
+    def test_each_file_checked_against_its_field(self):
+        response = self.client_for(self.patient).post(self.url, {
+            "images": self.files("images", png("red")),
+            "videos": self.files("videos", png("blue")),
+            "audio": [SimpleUploadedFile("note.txt", b"just text")],
+        }, format="multipart")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(len(response.data["images"]), 1)
+        self.assertEqual((response.data["videos"], response.data["audio"]), ([], []))
+        self.assertEqual(response.data["errors"], [
+            "Video 1: Unsupported video file (detected image/png)",
+            "Audio 1: Unsupported audio file (detected application/octet-stream)",
+        ])
+
+    def test_ndjson_stream(self):
+        response = self.client_for(self.patient).post(
+            self.url + "?stream=1",
+            {"images": self.files("images", png("red"), png("green")), "videos": self.files("videos", png("blue"))},
+            format="multipart",
+        )
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        events = [json.loads(line) for line in b"".join(response.streaming_content).splitlines()]
+        self.assertEqual(events[0], {
+            "event": "failed", "type": "video", "index": 0, "error": "Video 1: Unsupported video file (detected image/png)",
+        })
+        self.assertEqual(sorted((e["event"], e["index"]) for e in events[1:3]), [("uploaded", 0), ("uploaded", 1)])
+        self.assertEqual(events[-1]["event"], "done")
+        self.assertEqual(len(events[-1]["images"]), 2)
+
+
+class UploadSessionTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = self.client_for(self.patient)
+        self.content = png("red", (64, 64))
+        response = self.client.post(f"/api/memories/{self.memory().pk}/upload-sessions/", {
+            "kind": "image", "filename": "photo.png", "size": len(self.content),
+        }, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.session = UploadSession.objects.get(pk=response.data["session_id"])
+        self.url = f"/api/upload-sessions/{self.session.pk}/"
+
+    def put(self, offset, end=None):
+        body = self.content[offset:end]
+        return self.client.generic(
+            "PUT", self.url, body, content_type="application/offset+octet-stream", HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def complete(self):
+        return self.client.post(f"{self.url}complete/")
+
+    def test_chunks_must_follow_the_received_offset(self):
+        half = len(self.content) // 2
+        ahead = self.put(half)
+        self.assertEqual(ahead.status_code, 409)
+        self.assertEqual(ahead["Upload-Offset"], "0")
+
+        self.assertEqual(self.put(0, half)["Upload-Offset"], str(half))
+        duplicate = self.put(0, half)
+        self.assertEqual(duplicate.status_code, 409)
+        self.assertEqual(duplicate.data["error"], f"Offset mismatch: expected {half}")
+
+        self.assertEqual(self.put(half).status_code, 200)
+        with open(self.session.path, "rb") as fh:
+            self.assertEqual(fh.read(), self.content)
+
+    def test_chunk_past_declared_size(self):
+        self.content += b"extra"
+        self.assertEqual(self.put(0).status_code, 413)
+        self.session.refresh_from_db()
+        self.assertEqual(self.session.received, 0)
+
+    def test_complete_needs_every_byte(self):
+        self.put(0, 10)
+        response = self.complete()
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data["offset"], 10)
+
+        self.put(10)
+        response = self.complete()
+        self.assertEqual(response.status_code, 202)
+        job = MediaUploadJob.objects.get(pk=response.data["upload_job"]["job_id"])
+        self.assertEqual((job.kind, job.size, job.spool_path), ("image", len(self.content), self.session.path))
+        self.assertEqual(UploadSession.objects.get(pk=self.session.pk).path, "")  # the job owns the file now
+        # Completing again returns the same outcome instead of a second job
+        self.assertEqual(self.complete().data["upload_job"]["job_id"], job.pk)
+        self.assertEqual(MediaUploadJob.objects.count(), 1)
+
+    def test_expired_sessions_are_pruned(self):
+        self.put(0, 10)
+        fresh = media.open_session(self.session.memory, "image", "other.png", 10, {}, self.patient)
+        UploadSession.objects.filter(pk=self.session.pk).update(expires_at=timezone.now() - timedelta(minutes=1))
+        call_command("prune_upload_sessions", stdout=io.StringIO())
+        self.assertEqual(list(UploadSession.objects.values_list("pk", flat=True)), [fresh.pk])
+        self.assertFalse(os.path.exists(self.session.path))
+        self.assertTrue(os.path.exists(fresh.path))
+
+
+class DirectUploadTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        # Signing and verification are local HMACs: no request reaches Cloudinary
+        self.enterContext(self.settings(MEDIA_STORAGE_BACKEND="api.storage.CloudinaryMediaStorage"))
+        self.target = self.memory()
+
+    def issue(self, user=None, memory=None):
+        memory = memory or self.target
+        return self.client_for(user or self.family).post(
+            f"/api/memories/{memory.pk}/direct-uploads/", {"kind": "image", "caption": "Pier"}, format="json",
+        )
+
+    def storage_response(self, upload, **changes):
+        """What Cloudinary returns to the browser for the signed upload"""
+        config = cloudinary.config()
+        response = {"public_id": upload["public_id"], "version": 1700000000, "format": "jpg", "width": 800, "height": 600}
+        response["signature"] = cloudinary.utils.api_sign_request(
+            {"public_id": response["public_id"], "version": response["version"]},
+            config.api_secret, config.signature_algorithm, signature_version=1,
+        )
+        return {**response, "token": upload["token"], **changes}
+
+    def confirm(self, payload, user=None):
+        return self.client_for(user or self.family).post("/api/direct-uploads/confirm/", payload, format="json")
+
+    def test_confirm_creates_the_row_once(self):
+        upload = self.issue().data
+        self.assertTrue(upload["public_id"].startswith(f"memory_images/memory_{self.target.pk}/"))
+        payload = self.storage_response(upload)
+        response = self.confirm(payload)
+        self.assertEqual(response.status_code, 201)
+        image = MemoryImage.objects.get(memory=self.target)
+        self.assertEqual((image.caption, image.width, image.height), ("Pier", 800, 600))
+        self.assertEqual(self.confirm(payload).status_code, 200)
+        self.assertEqual(MemoryImage.objects.count(), 1)
+
+    def test_tampered_and_expired_tokens(self):
+        upload = self.issue().data
+        payload = self.storage_response(upload)
+        tampered = self.confirm({**payload, "token": payload["token"][:-2] + "xx"})
+        self.assertEqual((tampered.status_code, tampered.data["error"]), (400, "Invalid upload token"))
+
+        later = time.time() + settings.DIRECT_UPLOAD_TTL_SECONDS + 1
+        with mock.patch("django.core.signing.time.time", return_value=later):
+            expired = self.confirm(payload)
+        self.assertEqual((expired.status_code, expired.data["error"]), (400, "Upload token expired"))
+        self.assertFalse(MemoryImage.objects.exists())
+
+    def test_token_is_bound_to_user_and_memory_access(self):
+        stranger = User.objects.create_user("cat")
+        self.assertEqual(self.issue(user=stranger).status_code, 404)
+
+        payload = self.storage_response(self.issue().data)
+        borrowed = self.confirm(payload, user=stranger)
+        self.assertEqual((borrowed.status_code, borrowed.data["error"]), (400, "Invalid upload token"))
+
+        FamilyLink.objects.filter(family_member=self.family).delete()
+        self.assertEqual(self.confirm(payload).status_code, 404)
+        self.assertFalse(MemoryImage.objects.exists())
+
+    def test_storage_response_must_match_what_was_signed(self):
+        upload = self.issue().data
+        other = self.issue().data
+        cases = {
+            "public_id does not match the issued upload": self.storage_response(other, token=upload["token"]),
+            "Upload signature verification failed": self.storage_response(upload, version=1700000001),
+            "Invalid format": self.storage_response(upload, format="jpg/../x"),
+        }
+        for error, payload in cases.items():
+            response = self.confirm(payload)
+            self.assertEqual((response.status_code, response.data["error"]), (400, error))
+        self.assertFalse(MemoryImage.objects.exists())
+
+
+class StoredAssetTests(ApiTestCase):
+    def setUp(self):
+        super().setUp()
+        self.target = self.memory()
+        self.content = png("red")
+
+    def upload(self):
+        return media.upload_now(self.target, "image", SimpleUploadedFile("photo.png", self.content), {})
+
+    def assertStored(self, asset, exists=True):
+        self.assertEqual(default_storage.exists(asset.file), exists)
+
+    def test_identical_content_is_stored_once(self):
+        first, second = self.upload(), self.upload()
+        asset = StoredAsset.objects.get()
+        self.assertEqual((first.asset_id, second.asset_id, asset.ref_count), (asset.pk, asset.pk, 2))
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(len(os.listdir(os.path.join(self.media_root, "memory_images"))), 1)
+
+    def test_last_reference_deletes_the_file(self):
+        first, second = self.upload(), self.upload()
+        asset = StoredAsset.objects.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        asset.refresh_from_db()
+        self.assertEqual(asset.ref_count, 1)
+        self.assertStored(asset)
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(StoredAsset.objects.exists())
+        self.assertStored(asset, exists=False)
+
+    def test_failed_row_releases_the_reference(self):
+        kept = self.upload()
+        with mock.patch("api.media.create_media", side_effect=RuntimeError("database went away")):
+            with self.assertRaises(RuntimeError):
+                self.upload()
+        self.assertEqual(StoredAsset.objects.get().ref_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            kept.delete()
+            with mock.patch("api.media.create_media", side_effect=RuntimeError("database went away")):
+                with self.assertRaises(RuntimeError):
+                    self.upload()  # a fresh asset nobody uses
+        self.assertFalse(StoredAsset.objects.exists())
+        self.assertEqual(os.listdir(os.path.join(self.media_root, "memory_images")), [])
+
+    def test_failed_job_releases_the_reference(self):
+        self.upload()
+        os.makedirs(settings.MEDIA_SPOOL_DIR, exist_ok=True)
+        path = os.path.join(settings.MEDIA_SPOOL_DIR, "photo.png")
+        with open(path, "wb") as fh:
+            fh.write(self.content)
+        MediaUploadJob.objects.create(
+            memory=self.target, kind="image", spool_path=path, original_name="photo.png", size=len(self.content),
+        )
+        with self.settings(UPLOAD_JOB_MAX_ATTEMPTS=1):
+            with mock.patch("api.media.create_media", side_effect=RuntimeError("database went away")):
+                self.assertFalse(process_job(claim_next_job()))
+        self.assertEqual(MediaUploadJob.objects.get().status, "failed")
+        self.assertEqual(StoredAsset.objects.get().ref_count, 1)
+
+    def test_reference_is_taken_before_the_row_exists(self):
+        first = self.upload()
+        result, asset = media.store_for(self.target, "image", SimpleUploadedFile("photo.png", self.content))
+        # The only existing row goes before the new one is created: the upload's reference keeps the asset
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        second = media.create_media(self.target, "image", {}, result, asset)
+        asset.refresh_from_db()
+        self.assertEqual((second.asset_id, asset.ref_count), (asset.pk, 1))
+        self.assertStored(asset)
+
+    def test_asset_deleted_during_lookup_is_uploaded_again(self):
+        first = self.upload()
+        real_acquire = media.acquire_asset
+
+        def acquire_after_last_row_went(asset, n=1):
+            with self.captureOnCommitCallbacks(execute=True):
+                first.delete()
+            return real_acquire(asset, n)
+
+        with mock.patch("api.media.acquire_asset", side_effect=acquire_after_last_row_went):
+            second = self.upload()
+        asset = StoredAsset.objects.get()
+        self.assertEqual((second.asset_id, asset.ref_count), (asset.pk, 1))
+        self.assertStored(asset)
+
+    def test_bulk_upload_takes_one_reference_per_row(self):
+        self.upload()
+        response = self.client_for(self.patient).post(
+            f"/api/memories/{self.target.pk}/media/bulk/",
+            {"images": [SimpleUploadedFile(f"p{i}.png", self.content) for i in range(3)]}, format="multipart",
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(StoredAsset.objects.get().ref_count, 4)
+
+
+class ImageNormalizationTests(TestCase):
+    def jpeg(self, size, orientation=None):
+        exif = Image.Exif()
+        if orientation:
+            exif[0x0112] = orientation
+        buffer = io.BytesIO()
+        Image.new("RGB", size, "red").save(buffer, "JPEG", exif=exif)
+        return SimpleUploadedFile("photo.jpg", buffer.getvalue())
+
+    def opened(self, normalized):
+        return Image.open(io.BytesIO(normalized.read()))
+
+    def test_exif_orientation_is_applied_and_dropped(self):
+        normalized, _ = prepare_image(self.jpeg((40, 20), orientation=6), "photo.jpg")
+        self.assertEqual(normalized.name, "photo.webp")
+        with self.opened(normalized) as img:
+            self.assertEqual((img.format, img.size), ("WEBP", (20, 40)))
+            self.assertNotIn(0x0112, img.getexif())
+
+    @override_settings(IMAGE_MAX_EDGE=100, IMAGE_NORMALIZE_FORMAT="JPEG")
+    def test_longest_edge_is_capped(self):
+        normalized, _ = prepare_image(SimpleUploadedFile("wide.png", png("blue", (300, 150))))
+        self.assertEqual(normalized.name, "wide.jpg")
+        with self.opened(normalized) as img:
+            self.assertEqual((img.format, img.size), ("JPEG", (100, 50)))
+
+    def test_small_upright_image_is_kept(self):
+        upload = SimpleUploadedFile("dot.gif", GIF)  # re-encoding would only make it larger
+        self.assertIsNone(prepare_image(upload)[0])
+        self.assertEqual(upload.tell(), 0)
+        self.assertIsNone(prepare_image(upload, normalize=False)[0])
+
+    def test_unreadable_file(self):
+        self.assertEqual(prepare_image(SimpleUploadedFile("notes.png", b"not an image")), (None, None))
+
+    def test_info_describes_the_stored_image(self):
+        _, info = prepare_image(self.jpeg((40, 20), orientation=6))
+        self.assertEqual((info["width"], info["height"]), (20, 40))
+        _, info = prepare_image(self.jpeg((40, 20), orientation=6), normalize=False)
+        self.assertEqual((info["width"], info["height"]), (20, 40))  # as browsers display the original
+
+    def test_placeholder_is_a_tiny_webp(self):
+        _, info = prepare_image(SimpleUploadedFile("wide.png", png("blue", (300, 150))))
+        prefix = "data:image/webp;base64,"
+        self.assertTrue(info["placeholder"].startswith(prefix))
+        data = base64.b64decode(info["placeholder"][len(prefix):])
+        self.assertLess(len(data), 400)
+        with Image.open(io.BytesIO(data)) as img:
+            self.assertEqual(img.size, (16, 8))
+
+
+class ImageMetadataTests(ApiTestCase):
+    def test_upload_stores_dimensions_and_placeholder(self):
+        memory = self.memory()
+        with self.settings(MEDIA_UPLOADS_ASYNC=False, IMAGE_MAX_EDGE=100):
+            response = self.client_for(self.patient).post(
+                f"/api/memories/{memory.pk}/images/",
+                {"image": SimpleUploadedFile("wide.png", png("blue", (300, 150)))}, format="multipart",
+            )
+        self.assertEqual(response.status_code, 201)
+        image = MemoryImage.objects.get(memory=memory)
+        self.assertEqual((image.width, image.height), (100, 50))
+        self.assertTrue(image.placeholder.startswith("data:image/webp;base64,"))
+        self.assertEqual(
+            (response.data["width"], response.data["height"], response.data["placeholder"]),
+            (100, 50, image.placeholder),
+        )
+
+
+def wav(samples, rate=8000, width=2, channels=1):
+    """PCM WAV bytes of `samples` (floats in [-1, 1], interleaved when channels > 1)"""
+    if width == 1:
+        frames = bytes(round(sample * 127) + 128 for sample in samples)
+    else:
+        frames = struct.pack(f"<{len(samples)}h", *(round(sample * 32767) for sample in samples))
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as out:
+        out.setnchannels(channels)
+        out.setsampwidth(width)
+        out.setframerate(rate)
+        out.writeframes(frames)
+    return buffer.getvalue()
+
+
+def peaks(level):
+    """[(min, max), ...] of a stored waveform level"""
+    data = base64.b64decode(level["peaks"])
+    return [struct.unpack("bb", data[i:i + 2]) for i in range(0, len(data), 2)]
+
+
+@override_settings(AUDIO_DECODERS=["api.waveforms.decode_wav"])
+class WaveformTests(ApiTestCase):
+    def test_pyramid_from_wav(self):
+        # 1 s of a +/-0.5 square wave, then 1 s of silence: 200 buckets of 10 ms
+        samples = [0.5, -0.5] * 4000 + [0.0] * 8000
+        upload = SimpleUploadedFile("note.wav", wav(samples))
+        waveform = compute_waveform(upload)
+        self.assertEqual(upload.tell(), 0)
+        self.assertEqual(waveform["duration"], 2.0)
+        # Levels past the number of buckets collapse into one level with every bucket
+        self.assertEqual([level["resolution"] for level in waveform["levels"]], [64, 200])
+        coarse = peaks(waveform["levels"][0])
+        self.assertEqual((coarse[0], coarse[-1]), ((-64, 64), (0, 0)))
+        self.assertEqual(peaks(waveform["levels"][1])[99:101], [(-64, 64), (0, 0)])
+
+    def test_8bit_stereo_is_mixed_down(self):
+        # Left +0.5, right -0.5: the mono mix is silent
+        waveform = compute_waveform(SimpleUploadedFile("note.wav", wav([0.5, -0.5] * 800, width=1, channels=2)))
+        self.assertEqual(waveform["duration"], 0.1)
+        self.assertEqual(set(peaks(waveform["levels"][0])), {(0, 0)})
+
+    def test_not_a_wav(self):
+        self.assertIsNone(compute_waveform(SimpleUploadedFile("note.mp3", b"ID3" + bytes(64))))
+
+    def test_level_selection(self):
+        stored = {"duration": 2.0, "levels": [{"resolution": 64, "peaks": ""}, {"resolution": 200, "peaks": ""}]}
+        self.assertEqual(waveform_level(stored, 10)["resolution"], 64)
+        self.assertEqual(waveform_level(stored, 100)["resolution"], 200)
+        self.assertEqual(waveform_level(stored)["resolution"], 200)  # default 256: the finest there is
+        self.assertIsNone(waveform_level(None, 64))
+
+        factory = APIRequestFactory()
+        for value, expected in (("128", 128), ("0", None), ("-5", None), ("lots", None)):
+            self.assertEqual(resolution_param(factory.get("/", {"waveform_resolution": value})), expected)
+
+    def test_api_returns_the_requested_level(self):
+        memory = self.memory()
+        MemoryVoiceRecording.objects.create(
+            memory=memory, audio_url="https://example.com/a.mp3", waveform_peaks=compute_waveform(
+                SimpleUploadedFile("note.wav", wav([0.5, -0.5] * 4000 + [0.0] * 8000))
+            ),
+        )
+        client = self.client_for(self.patient)
+        for resolution, expected in ((None, 200), (32, 64), (150, 200)):
+            params = {"waveform_resolution": resolution} if resolution else {}
+            response = client.get(f"/api/memories/{memory.pk}/detail/", params)
+            self.assertEqual(response.json()["voice_recordings"][0]["waveform"]["resolution"], expected)
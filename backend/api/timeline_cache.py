@@ -0,0 +1,115 @@
+# api/timeline_cache.py
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import TimelineVersion
+from .serving import signing_window
+from .waveforms import resolution_param
+
+
+# ------------- settings ------------- #
+def _cache():
+    return caches[getattr(settings, "TIMELINE_CACHE_ALIAS", "default")]
+
+def _enabled():
+    return getattr(settings, "TIMELINE_CACHE_ENABLED", True)
+
+def _timeout():
+    return getattr(settings, "TIMELINE_CACHE_TIMEOUT", 3600)
+
+
+STATS_KEYS = {"hits": "timeline_cache:stats:hits", "misses": "timeline_cache:stats:misses"}
+
+
+# ------------- versions ------------- #
+def timeline_versions(request, access):
+    """
+    [(patient_id, version, updated_at)] for every patient the viewer can read.
+    One query, memoised on the request (shared by the ETag and cache-key code).
+    """
+    http_request = getattr(request, "_request", request)
+    rows = getattr(http_request, "_timeline_versions", None)
+    if rows is None:
+        found = {
+            patient_id: (version, updated_at)
+            for patient_id, version, updated_at in TimelineVersion.objects.filter(
+                patient_id__in=access.readable_patient_ids
+            ).values_list("patient_id", "version", "updated_at")
+        }
+        rows = sorted(
+            (patient_id, *found.get(patient_id, (0, None)))
+            for patient_id in access.readable_patient_ids
+        )
+        http_request._timeline_versions = rows
+    return rows
+
+
+# ------------- keys ------------- #
+def _digest(*parts):
+    return hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()[:20]
+
+def _scope(versions):
+    """`<patient>:v<version>` for a single patient; a digest when a family user spans several"""
+    pairs = [(patient_id, version) for patient_id, version, *_ in versions]
+    if len(pairs) == 1:
+        return f"{pairs[0][0]}:v{pairs[0][1]}"
+    return f"multi:{_digest(pairs)}"
+
+def list_key(request, versions):
+    # Payload URLs are absolute and signed, so the host and signing window are part of the
+    # key along with the paging params
+    parts = _digest(request.build_absolute_uri('/'), signing_window(), sorted(request.query_params.lists()))
+    return f"timeline:{_scope(versions)}:list:{parts}"
+
+def detail_key(request, memory_id, patient_id, version):
+    # The payload varies with the site origin, the URL signing window and the waveform level
+    parts = _digest(request.build_absolute_uri('/'), signing_window(), resolution_param(request))
+    return f"timeline:{patient_id}:v{version}:memory:{memory_id}:{parts}"
+
+def navigation_key(versions, memory_id):
+    return f"timeline:{_scope(versions)}:nav:{memory_id}"
+
+
+# ------------- get / set ------------- #
+def get_or_build(key, build):
+    """
+    Return (payload, hit). On a miss build() is called and its payload stored; the keys
+    embed timeline versions, so a write makes old entries unreachable instead of stale.
+    """
+    if not _enabled():
+        return build(), False
+    cache = _cache()
+    payload = cache.get(key)
+    if payload is not None:
+        _count("hits")
+        return payload, True
+    _count("misses")
+    payload = build()
+    cache.set(key, payload, _timeout())
+    return payload, False
+
+
+def _count(stat):
+    cache = _cache()
+    key = STATS_KEYS[stat]
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Key missing (first use or evicted); add() avoids clobbering a concurrent first write
+        if not cache.add(key, 1, None):
+            cache.incr(key)
+
+
+def stats():
+    cache = _cache()
+    values = cache.get_many(list(STATS_KEYS.values()))
+    hits = values.get(STATS_KEYS["hits"], 0)
+    misses = values.get(STATS_KEYS["misses"], 0)
+    total = hits + misses
+    return {"hits": hits, "misses": misses, "hit_rate": round(hits / total, 4) if total else None}
+
+
+def reset_stats():
+    _cache().delete_many(list(STATS_KEYS.values()))
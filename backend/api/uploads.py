@@ -0,0 +1,105 @@
+# api/uploads.py
+"""
+Upload handler that inspects files while they stream in (settings.FILE_UPLOAD_HANDLERS).
+
+Each file is written to a temporary file, and the same pass computes its SHA-256, its byte
+size and a content type sniffed from the leading magic bytes. The finished
+TemporaryUploadedFile carries these as .sha256 and .sniffed_type, so the media pipeline
+never reads the file a second time.
+
+A file that grows past the limit for its form field (settings.MEDIA_MAX_UPLOAD_SIZE) stops
+the upload there: UploadTooLarge is raised out of request.data / request.FILES, so whichever
+API view parses the form answers 413 instead of seeing the file silently missing.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+SNIFF_BYTES = 32
+UNKNOWN_TYPE = "application/octet-stream"
+
+# Form field -> upload kind, for the size limit; files in any other field get the "other" limit
+FIELD_KINDS = {
+    "image": "image", "images": "image", "video": "video", "videos": "video", "audio": "recording",
+    "avatar": "avatar", "file": "import",
+}
+
+# ISO base media (MP4/MOV/HEIC/M4A) major brands -> content type
+FTYP_BRANDS = {
+    b"heic": "image/heic", b"heix": "image/heic", b"mif1": "image/heif", b"msf1": "image/heif",
+    b"avif": "image/avif", b"M4A ": "audio/mp4", b"M4B ": "audio/mp4", b"qt  ": "video/quicktime",
+    b"3gp4": "video/3gpp", b"3gp5": "video/3gpp", b"3g2a": "video/3gpp2",
+}
+
+
+def sniff_content_type(head):
+    """Content type from a file's first bytes (UNKNOWN_TYPE when no signature matches)"""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if head.startswith(b"RIFF") and len(head) >= 12:
+        return {b"WEBP": "image/webp", b"WAVE": "audio/wav", b"AVI ": "video/x-msvideo"}.get(head[8:12], UNKNOWN_TYPE)
+    if head[4:8] == b"ftyp":
+        return FTYP_BRANDS.get(head[8:12], "video/mp4")
+    if head[:4] in (b"II*\x00", b"MM\x00*"):
+        return "image/tiff"
+    if head.startswith(b"BM"):
+        return "image/bmp"
+    if head.startswith(b"\x1a\x45\xdf\xa3"):
+        return "video/webm"  # Matroska/WebM, also what browsers record audio notes as
+    if head.startswith(b"OggS"):
+        return "audio/ogg"
+    if head.startswith(b"fLaC"):
+        return "audio/flac"
+    if head.startswith(b"ID3") or (len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        return "audio/mpeg"  # ID3 tag or MPEG audio frame sync (also ADTS AAC)
+    return UNKNOWN_TYPE
+
+
+def size_limit(field_name):
+    return settings.MEDIA_MAX_UPLOAD_SIZE[FIELD_KINDS.get(field_name, "other")]
+
+
+class UploadTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_code = "upload_too_large"
+
+    def __init__(self, field, file_name, limit):
+        # Set directly rather than through APIException, which would turn the limit into a string
+        self.detail = {"error": f"{file_name} is too large (max {limit} bytes)", "field": field,
+                       "file": file_name, "limit": limit}
+
+
+class InspectingUploadHandler(TemporaryFileUploadHandler):
+    def new_file(self, field_name, file_name, content_type, content_length, charset=None, content_type_extra=None):
+        super().new_file(field_name, file_name, content_type, content_length, charset, content_type_extra)
+        self.sha256 = hashlib.sha256()
+        self.head = b""
+        self.limit = size_limit(field_name)
+        if content_length:
+            self.check_size(content_length)  # the part declared its size: refuse before reading it
+
+    def receive_data_chunk(self, raw_data, start):
+        if len(self.head) < SNIFF_BYTES:
+            self.head += raw_data[:SNIFF_BYTES - len(self.head)]
+        self.check_size(start + len(raw_data))
+        self.sha256.update(raw_data)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.sha256 = self.sha256.hexdigest()
+        file.sniffed_type = sniff_content_type(self.head)
+        return file
+
+    def check_size(self, size):
+        if size > self.limit:
+            self.file.close()
+            # Stop reading the body now instead of receiving the rest of an oversized file
+            raise UploadTooLarge(self.field_name, self.file_name, self.limit)
@@ -14,6 +14,11 @@ urlpatterns = [
     
     # Memories - Standard endpoints
     path("memories/", views.memories_list_create, name="memories_list_create"),
+    path("memories/changes/", views.memory_changes, name="memory_changes"),
+    path("memories/search/", views.search_memories_view, name="search_memories"),
+    path("memories/import/", views.import_memories, name="import_memories"),
+    path("memories/export/", views.export_memories, name="export_memories"),
+    path("memories/bulk-tag/", views.bulk_tag_memories, name="bulk_tag_memories"),
     path("memories/<int:pk>/", views.memory_detail, name="memory_detail"),
     
     # ✅ ADD THIS - Enhanced memory detail with all media
@@ -39,8 +44,20 @@ urlpatterns = [
     path("memory-tags/<int:pk>/", views.memory_tag_detail, name="memory_tag_detail"),
     path("memory-comments/<int:pk>/", views.memory_comment_detail, name="memory_comment_detail"),
     
+    # Asynchronous media uploads
+    path("upload-jobs/<int:pk>/", views.upload_job_status, name="upload_job_status"),
+    path("memories/<int:memory_id>/direct-uploads/", views.create_direct_upload, name="create_direct_upload"),
+    path("direct-uploads/confirm/", views.confirm_direct_upload, name="confirm_direct_upload"),
+    path("memories/<int:memory_id>/upload-sessions/", views.create_upload_session, name="create_upload_session"),
+    path("upload-sessions/<uuid:pk>/", views.upload_session_detail, name="upload_session_detail"),
+    path("upload-sessions/<uuid:pk>/complete/", views.complete_upload_session, name="complete_upload_session"),
+    
+    # Resized renditions of local images (see api/variants.py)
+    path("media/variants/<str:variant>/<path:name>", views.image_variant, name="image_variant"),
+    
     # Helper endpoints
     path("memories/<int:memory_id>/media/", views.get_memory_media, name="get_memory_media"),
+    path("memories/<int:memory_id>/media/bulk/", views.bulk_add_memory_media, name="bulk_add_memory_media"),
     path("memories/<int:memory_id>/interactions/", views.get_memory_interactions, name="get_memory_interactions"),
     
     # Family links and codes
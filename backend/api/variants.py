@@ -0,0 +1,90 @@
+# api/variants.py
+"""
+Responsive renditions of memory images (the "image_variants" field of the serializers).
+
+Cloudinary delivery URLs get transformation URLs computed locally. Local ImageField files
+point at the image_variant view (signed like their MEDIA_URL), which renders the variant
+with Pillow on first request and caches it under MEDIA_ROOT/variants/. Any other remote
+URL is returned unchanged for every variant, so clients can always pick a size.
+"""
+from functools import lru_cache
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+from django.utils.encoding import filepath_to_uri
+from PIL import Image, ImageOps
+
+from .serving import signed_query
+
+# name -> (Cloudinary transformation, bounding box, crop to fill the box)
+IMAGE_VARIANTS = {
+    "thumbnail": ("c_fill,w_200,h_200,q_auto,f_auto", (200, 200), True),
+    "medium": ("c_limit,w_800,h_800,q_auto,f_auto", (800, 800), False),
+    "full": ("c_limit,w_2000,h_2000,q_auto,f_auto", (2000, 2000), False),
+}
+
+# Upload folders of the image fields that have variants (Memory.image, MemoryImage.image)
+VARIANT_SOURCES = ("memories/", "memory_images/")
+CACHE_DIR = "variants"
+
+
+def is_cloudinary(url):
+    return "res.cloudinary.com" in url and "/upload/" in url
+
+
+def remote_variant_url(url, variant):
+    """Variant of a remote URL: a Cloudinary transformation URL, other URLs as-is"""
+    if url and is_cloudinary(url):
+        return url.replace("/upload/", f"/upload/{IMAGE_VARIANTS[variant][0]}/", 1)
+    return url
+
+
+@lru_cache(maxsize=None)
+def _local_prefix(variant):
+    return reverse("image_variant", args=[variant, "x"])[:-1]
+
+
+def local_variant_url(variant, name):
+    """
+    Site-relative URL of a local file's variant (quoted like FieldFile.url), signed for the
+    source `name` so <img> tags can load it (see api.serving)
+    """
+    return f"{_local_prefix(variant)}{filepath_to_uri(name)}?{signed_query(name)}"
+
+
+def image_variants(url, file, absolute):
+    """
+    {variant: url} for an image stored remotely (`url`) or as a local FieldFile; None
+    without an image. `absolute` turns a site-relative URL into what the API returns.
+    """
+    if url:
+        return {variant: remote_variant_url(url, variant) for variant in IMAGE_VARIANTS}
+    if file:
+        return {variant: absolute(local_variant_url(variant, file.name)) for variant in IMAGE_VARIANTS}
+    return None
+
+
+def render_variant(variant, name):
+    """
+    Storage name of the cached variant of local image `name`, rendered first if needed.
+    Raises OSError (incl. PIL.UnidentifiedImageError) when the source is missing or unreadable.
+    """
+    cached = f"{CACHE_DIR}/{variant}/{name}.webp"
+    if default_storage.exists(cached):
+        return cached
+    _, box, crop = IMAGE_VARIANTS[variant]
+    with default_storage.open(name, "rb") as fh, Image.open(fh) as img:
+        img = ImageOps.exif_transpose(img)
+        if crop:
+            img = ImageOps.fit(img, box, Image.Resampling.LANCZOS)
+        else:
+            img.thumbnail(box, Image.Resampling.LANCZOS)
+        if img.mode not in ("RGB", "RGBA"):
+            img = img.convert("RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB")
+        out = BytesIO()
+        img.save(out, "WEBP", quality=settings.IMAGE_VARIANT_QUALITY, method=4)
+    # Two first requests may race: storage then keeps both and we serve whichever we saved
+    return default_storage.save(cached, ContentFile(out.getvalue()))
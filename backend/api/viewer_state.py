@@ -0,0 +1,119 @@
+# api/viewer_state.py
+from functools import cached_property
+
+from django.db.models import Count
+
+from .access import get_access
+from .models import FamilyLink, Memory, MemoryLike
+
+
+class ViewerState:
+    """
+    Viewer-dependent values (is_liked, can_edit, memories_count) for a whole page of objects.
+
+    Views build one per request from the memories / family members they are about to
+    serialize and pass it as context["viewer_state"]. Each value is resolved lazily with
+    one query for the entire page, so serializer method fields never query per object.
+    """
+
+    def __init__(self, user, memories=(), family_members=(), access=None, memory_ids=()):
+        self.user = user
+        self.access = access
+        self.memories = list(memories)
+        self._family_members = list(family_members)
+        # Bare ids are enough for is_liked (e.g. when overlaying a cached payload)
+        self.memory_ids = [m.pk for m in self.memories] + list(memory_ids)
+
+    @property
+    def is_authenticated(self):
+        return bool(self.user and self.user.is_authenticated)
+
+    # ------------- likes ------------- #
+    @cached_property
+    def liked_memory_ids(self):
+        if not self.is_authenticated or not self.memory_ids:
+            return frozenset()
+        return frozenset(
+            MemoryLike.objects.filter(
+                user=self.user, memory_id__in=self.memory_ids
+            ).values_list("memory_id", flat=True)
+        )
+
+    def is_liked(self, memory):
+        return memory.pk in self.liked_memory_ids
+
+    # ------------- edit rights ------------- #
+    @cached_property
+    def editable_patient_ids(self):
+        if not self.is_authenticated:
+            return frozenset()
+        if self.access is not None:
+            # Already resolved (and cached) for this request - no query
+            return self.access.writable_patient_ids
+        owner_ids = {m.user_id for m in self.memories} - {self.user.pk}
+        linked = set()
+        if owner_ids:
+            linked = set(
+                FamilyLink.objects.filter(
+                    family_member=self.user, status="APPROVED", patient_id__in=owner_ids
+                ).values_list("patient_id", flat=True)
+            )
+        return frozenset(linked | {self.user.pk})
+
+    def can_edit(self, memory):
+        return memory.user_id in self.editable_patient_ids
+
+    # ------------- family member memory counts ------------- #
+    @cached_property
+    def family_members(self):
+        """Family members given explicitly plus those tagged on the page's memories"""
+        members = {fm.pk: fm for fm in self._family_members}
+        for memory in self.memories:
+            # `members` is prefetched by the list/detail views, so this does not query per memory
+            for fm in memory.members.all():
+                members.setdefault(fm.pk, fm)
+        return members
+
+    @cached_property
+    def member_memory_counts(self):
+        if not self.family_members:
+            return {}
+        Through = Memory.members.through
+        rows = (
+            Through.objects.filter(familymember_id__in=list(self.family_members))
+            .values("familymember_id")
+            .annotate(total=Count("memory_id"))
+        )
+        return {row["familymember_id"]: row["total"] for row in rows}
+
+    def memories_count(self, family_member):
+        if family_member.pk not in self.family_members:
+            # Not part of the page we primed for - resolve it on its own
+            self._family_members.append(family_member)
+            self.__dict__.pop("family_members", None)
+            self.__dict__.pop("member_memory_counts", None)
+        return self.member_memory_counts.get(family_member.pk, 0)
+
+
+def overlay_viewer_fields(request, items):
+    """
+    Re-resolve the per-viewer fields of already serialized memories (e.g. a payload shared
+    through the timeline cache) for the current viewer - one query for is_liked.
+    """
+    if not items:
+        return items
+    viewer = ViewerState(request.user, access=get_access(request), memory_ids=[item["id"] for item in items])
+    for item in items:
+        if "is_liked" in item:
+            item["is_liked"] = item["id"] in viewer.liked_memory_ids
+        if "can_edit" in item:
+            item["can_edit"] = item["user"] in viewer.editable_patient_ids
+    return items
+
+
+def viewer_context(request, memories=(), family_members=()):
+    """Serializer context carrying a ViewerState primed for the given objects"""
+    return {
+        "request": request,
+        "viewer_state": ViewerState(request.user, memories, family_members, access=get_access(request)),
+    }
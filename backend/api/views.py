@@ -1,5 +1,7 @@
 # api/views.py
+from django.conf import settings
 from django.contrib.auth import authenticate, get_user_model
+from django.urls import reverse
 from django.utils import timezone
 from datetime import timedelta
 from rest_framework.decorators import api_view, permission_classes
@@ -8,6 +10,10 @@ from rest_framework.response import Response
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.db.models import Q, Count, Prefetch
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import default_storage
+from django.http import FileResponse, StreamingHttpResponse
+from PIL import Image
 
 import cloudinary
 import cloudinary.uploader  # Cloudinary upload
@@ -26,30 +32,66 @@ from .serializers import (
     MemorySerializer, MemoryDetailSerializer, FamilyMemberSerializer,
     PatientConnectCodeSerializer, FamilyLinkSerializer,
     MemoryImageSerializer, MemoryVideoSerializer, MemoryVoiceRecordingSerializer,
-    MemoryPersonSerializer, MemoryTagSerializer, MemoryLikeSerializer, MemoryCommentSerializer
+    MemoryPersonSerializer, MemoryTagSerializer, MemoryLikeSerializer, MemoryCommentSerializer,
+    PersonInputSerializer, TagInputSerializer
 )
 from .models import (
     Memory, FamilyMember, PatientConnectCode, FamilyLink,
     MemoryImage, MemoryVideo, MemoryVoiceRecording, MemoryPerson, MemoryTag,
-    MemoryLike, MemoryComment
+    MemoryLike, MemoryComment, MediaUploadJob, UploadSession
 )
+from .access import get_access, invalidate_access, is_family, is_patient
+from .conditional import memory_validators, not_modified, set_validators, timeline_validators
+from .fast_serializers import FastSerializer
+from .renderers import ORJSONRenderer
+from .pagination import MemoryCursorPagination, SearchPagination
+from .search import search_memories
+from .sync import SyncTokenExpired, collect_changes
+from .viewer_state import overlay_viewer_fields, viewer_context
+from .waveforms import resolution_param
+from . import bulk_import, export, media, navigation, serving, tagging, timeline_cache, variants
 
 User = get_user_model()
 
 # ------------- helpers ------------- #
-def is_patient(user):
-    return getattr(user, "role", "patient") == "patient"
+def get_memory_or_error(request, memory_id, queryset=None):
+    """
+    Fetch a memory the user can read, scoped by the request's MemoryAccess.
+    Returns (memory, None) or (None, error Response).
+    """
+    access = get_access(request)
+    if not access.has_role:
+        return None, Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
+    try:
+        return access.memories(queryset).get(id=memory_id), None
+    except Memory.DoesNotExist:
+        return None, Response({"error": "Memory not found"}, status=status.HTTP_404_NOT_FOUND)
 
-def is_family(user):
-    return getattr(user, "role", "family") == "family"
+def memory_detail_queryset():
+    """Memories with everything MemoryDetailSerializer renders"""
+    return Memory.objects.select_related('user').prefetch_related(
+        'images', 'videos', 'voice_recordings', 'tagged_people',
+        'event_tags', 'likes__user', 'comments__user', 'members'
+    )
 
-def can_access_patient_data(family_user, patient_id):
-    """Check if family member has access to patient's data"""
-    return FamilyLink.objects.filter(
-        family_member=family_user,
-        patient_id=patient_id,
-        status="APPROVED"
-    ).exists()
+def rejected_upload(kind, file_obj):
+    """
+    415 when the uploaded bytes are not a `kind` file (the sniffed type decides, not the
+    client's Content-Type); else None. Oversized files never get this far: reading
+    request.FILES raises UploadTooLarge, a 413 (api.uploads).
+    """
+    if file_obj is not None:
+        error = media.content_type_error(kind, file_obj)
+        if error:
+            return Response({"error": error}, status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+    return None
+
+def form_fields(request):
+    """
+    Mutable copy of the request's non-file fields. Uploaded files arrive as open temp
+    files (api.uploads), which request.data.copy() cannot deep-copy.
+    """
+    return request.POST.copy() if request.FILES else request.data.copy()
 
 # ------------------ AUTH ------------------ #
 @api_view(["POST"])
@@ -107,7 +149,8 @@ def get_user(request):
 def family_members_list_create(request):
     if request.method == "GET":
         qs = FamilyMember.objects.filter(user=request.user).order_by("-id")
-        ser = FamilyMemberSerializer(qs, many=True, context={"request": request})
+        qs = list(qs)
+        ser = FamilyMemberSerializer(qs, many=True, context=viewer_context(request, family_members=qs))
         return Response(ser.data, status=status.HTTP_200_OK)
 
     ser = FamilyMemberSerializer(data=request.data, context={"request": request})
@@ -174,41 +217,45 @@ def family_member_detail(request, pk):
 @permission_classes([IsAuthenticated])
 def memories_list_create(request):
     if request.method == "GET":
-        # Role-based memory access with optimized queries
-        if is_patient(request.user):
-            # Patients see their own memories
-            memories = Memory.objects.filter(user=request.user).select_related('user').prefetch_related(
-                'images', 'videos', 'voice_recordings', 'likes', 'members'
-            ).annotate(
-                images_count=Count('images'),
-                videos_count=Count('videos'),
-                recordings_count=Count('voice_recordings'),
-                likes_count=Count('likes')
-            ).order_by("-id")
-            print(f"👤 Patient {request.user.username} accessing their own memories")
-        elif is_family(request.user):
-            # Family members see memories from all their connected patients
-            connected_patients = FamilyLink.objects.filter(
-                family_member=request.user, 
-                status="APPROVED"
-            ).values_list('patient', flat=True)
-            
-            memories = Memory.objects.filter(user__in=connected_patients).select_related('user').prefetch_related(
-                'images', 'videos', 'voice_recordings', 'likes', 'members'
-            ).annotate(
-                images_count=Count('images'),
-                videos_count=Count('videos'),
-                recordings_count=Count('voice_recordings'),
-                likes_count=Count('likes')
-            ).order_by("-id")
-            print(f"👪 Family member {request.user.username} accessing memories from {len(connected_patients)} connected patients")
-        else:
-            # Default: no access
-            memories = Memory.objects.none()
-            print(f"❌ User {request.user.username} has no role-based access to memories")
-        
-        serializer = MemorySerializer(memories, many=True, context={"request": request})
-        return Response(serializer.data, status=status.HTTP_200_OK)
+        # Role-based memory access: patients see their own memories, family members
+        # see those of every connected patient. Counts come from Memory's counter
+        # columns, so no joins/annotations are needed.
+        access = get_access(request)
+        memories = access.memories().select_related('user').prefetch_related(
+            'members'
+        ).order_by("-id")
+        print(f"👀 {request.user.username} ({access.role}) accessing memories from {len(access.readable_patient_ids)} patient(s)")
+
+        # Conditional GET: validators come from the patients' timeline versions, so an
+        # unchanged timeline is answered with 304 before anything is loaded or serialized
+        etag, last_modified = timeline_validators(request, access)
+        unchanged = not_modified(request, etag, last_modified)
+        if unchanged is not None:
+            return unchanged
+
+        # Cursor pagination when the client asks for it; legacy clients still get the full list
+        paginator = MemoryCursorPagination()
+        paginated = paginator.is_requested(request)
+
+        # Read-only fast path: same output as MemorySerializer (see tests.py)
+        def build():
+            if paginated:
+                page = paginator.paginate_queryset(memories, request)
+                fast = FastSerializer(viewer_context(request, page))
+                return paginator.get_paginated_response(fast.many(fast.memory, page)).data
+            rows = list(memories)
+            fast = FastSerializer(viewer_context(request, rows))
+            return fast.many(fast.memory, rows)
+
+        # Serialized timelines are shared by every viewer of the same patients (versioned
+        # cache keys); only the per-viewer fields are re-resolved on a hit
+        key = timeline_cache.list_key(request, timeline_cache.timeline_versions(request, access))
+        payload, hit = timeline_cache.get_or_build(key, build)
+        if hit:
+            overlay_viewer_fields(request, payload["results"] if paginated else payload)
+        response = Response(payload, status=status.HTTP_200_OK)
+        response["X-Timeline-Cache"] = "hit" if hit else "miss"
+        return set_validators(response, etag, last_modified)
 
     # POST: Allow both patients and family members to create memories
     patient_id = request.data.get('patient_id')  # Family members specify which patient
@@ -226,7 +273,7 @@ def memories_list_create(request):
             )
         
         # Check if family member has access to this patient
-        if not can_access_patient_data(request.user, patient_id):
+        if not get_access(request).can_write(patient_id):
             return Response(
                 {"error": "You don't have permission to create memories for this patient"}, 
                 status=status.HTTP_403_FORBIDDEN
@@ -266,55 +313,59 @@ def memories_list_create(request):
         print("No file found in request.FILES['image']")
     print("=== END DEBUG ===")
 
-    # Prepare data for serializer
-    data = request.data.copy()
+    rejected = rejected_upload("memory", file_obj)
+    if rejected:
+        return rejected
 
-    # Handle Cloudinary upload if file is present
-    if file_obj:
-        try:
-            print(f"📤 Uploading to Cloudinary: {file_obj.name}")
-            # Debug: Print current cloudinary config
-            print(f"🔧 Cloudinary config - Cloud: {cloudinary.config().cloud_name}, API Key: {cloudinary.config().api_key}")
-            
-            upload_res = cloudinary.uploader.upload(file_obj, folder="memories")
-            secure_url = upload_res.get("secure_url") or upload_res.get("url")
-            data["image_url"] = secure_url
-            print(f"✅ Cloudinary upload success: {secure_url}")
-        except Exception as e:
-            print(f"❌ Cloudinary upload failed: {e}")
-            return Response({"error": f"Cloudinary upload failed: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+    # Prepare data for serializer
+    data = form_fields(request)
 
     # Validate and create memory for the target user
     serializer = MemorySerializer(data=data, context={"request": request})
-    if serializer.is_valid():
-        instance = serializer.save(user=target_user)  # Save for target user, not request user
-        out = MemorySerializer(instance, context={"request": request}).data
-        print(f"✅ Memory created successfully: ID {instance.id} for {target_user.username}")
-        return Response(out, status=status.HTTP_201_CREATED)
-    else:
+    if not serializer.is_valid():
         print(f"❌ Memory validation errors: {serializer.errors}")
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    # Save for target user, not request user
+    response = save_memory_with_image(request, serializer, file_obj, status.HTTP_201_CREATED, user=target_user)
+    print(f"✅ Memory created successfully: ID {response.data.get('id')} for {target_user.username}")
+    return response
+
+def save_memory_with_image(request, serializer, file_obj, success_status, **save_kwargs):
+    """
+    Save a validated MemorySerializer and attach its image: uploaded inline when async
+    uploads are off, otherwise spooled as an upload job and answered with 202 + the job.
+    """
+    upload = None
+    if file_obj and not settings.MEDIA_UPLOADS_ASYNC:
+        try:
+            print(f"📤 Uploading memory image: {file_obj.name}")
+            upload = media.store(file_obj, "memory", filename=file_obj.name)
+        except Exception as e:
+            print(f"❌ Memory image upload failed: {e}")
+            return Response({"error": f"Cloudinary upload failed: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+    instance = serializer.save(**save_kwargs)
+    job = None
+    if upload:
+        media.create_media(instance, "memory", {}, upload)
+    elif file_obj:
+        job = media.enqueue_upload(instance, "memory", file_obj, {}, request.user)
+
+    out = MemorySerializer(instance, context={"request": request}).data
+    if job:
+        # The memory is saved; its image follows once the upload job completes
+        out["upload_job"] = upload_job_payload(request, job)
+        return Response(out, status=status.HTTP_202_ACCEPTED)
+    return Response(out, status=success_status)
+
 @api_view(["GET", "PUT", "DELETE"])
 @permission_classes([IsAuthenticated])
 def memory_detail(request, pk):
+    access = get_access(request)
     try:
-        # Role-based memory detail access
-        if is_patient(request.user):
-            # Patients can only access their own memories
-            memory = Memory.objects.get(pk=pk, user=request.user)
-        elif is_family(request.user):
-            # Family members can access memories from connected patients
-            connected_patients = FamilyLink.objects.filter(
-                family_member=request.user, 
-                status="APPROVED"
-            ).values_list('patient', flat=True)
-            
-            memory = Memory.objects.get(pk=pk, user__in=connected_patients)
-            print(f"👪 Family member {request.user.username} accessing memory from connected patient")
-        else:
-            raise Memory.DoesNotExist("No permission to access this memory")
-            
+        # Role-based memory detail access: own memories, or those of connected patients
+        memory = access.memories().get(pk=pk)
     except Memory.DoesNotExist:
         return Response({"error": "Memory not found"}, status=status.HTTP_404_NOT_FOUND)
 
@@ -323,34 +374,25 @@ def memory_detail(request, pk):
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     # PUT/DELETE: Allow both memory owner (patient) and connected family members
-    if is_patient(request.user) and memory.user != request.user:
-        return Response(
-            {"error": "You can only modify your own memories"}, 
-            status=status.HTTP_403_FORBIDDEN
-        )
-    elif is_family(request.user) and not can_access_patient_data(request.user, memory.user.id):
+    if not access.can_write(memory.user_id):
         return Response(
             {"error": "You don't have permission to modify this patient's memories"}, 
             status=status.HTTP_403_FORBIDDEN
         )
 
-    # Handle file upload for updates
-    data = request.data.copy()
-    file_obj = request.FILES.get("image")
-
-    if file_obj:
-        try:
-            upload_res = cloudinary.uploader.upload(file_obj, folder="memories")
-            data["image_url"] = upload_res.get("secure_url") or upload_res.get("url")
-        except Exception as e:
-            return Response({"error": f"Cloudinary upload failed: {e}"}, status=status.HTTP_400_BAD_REQUEST)
-
     if request.method == "PUT":
+        # Handle file upload for updates
+        data = form_fields(request)
+        file_obj = request.FILES.get("image")
+        rejected = rejected_upload("memory", file_obj)
+        if rejected:
+            return rejected
         serializer = MemorySerializer(memory, data=data, partial=True, context={"request": request})
         if serializer.is_valid():
-            instance = serializer.save()  # Don't change the user - keep original owner
-            print(f"✅ Memory updated: ID {instance.id} by {request.user.username}")
-            return Response(MemorySerializer(instance, context={"request": request}).data, status=status.HTTP_200_OK)
+            # Don't change the user - keep original owner
+            response = save_memory_with_image(request, serializer, file_obj, status.HTTP_200_OK)
+            print(f"✅ Memory updated: ID {memory.id} by {request.user.username}")
+            return response
         else:
             print(f"❌ Memory update errors: {serializer.errors}")
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
@@ -366,43 +408,45 @@ def memory_detail(request, pk):
 @permission_classes([IsAuthenticated])
 def memory_detail_enhanced(request, pk):
     """Enhanced memory detail with all media for the MemoryDetail component"""
+    access = get_access(request)
+
+    if request.method == "GET":
+        # Conditional GET from the memory's updated_at and the patient's timeline version -
+        # one narrow query, no prefetches
+        state = access.memories().filter(pk=pk).values_list(
+            "updated_at", "user_id", "user__timeline_version__version", "user__timeline_version__updated_at"
+        ).first()
+        if state is None:
+            return Response({"error": "Memory not found"}, status=status.HTTP_404_NOT_FOUND)
+        updated_at, patient_id, version, version_updated_at = state
+        etag, last_modified = memory_validators(request, pk, updated_at, version, version_updated_at)
+        unchanged = not_modified(request, etag, last_modified)
+        if unchanged is not None:
+            return unchanged
+
+        def build():
+            memory = memory_detail_queryset().get(pk=pk)
+            return FastSerializer(viewer_context(request, [memory])).memory_detail(memory)
+
+        key = timeline_cache.detail_key(request, pk, patient_id, version or 0)
+        try:
+            payload, hit = timeline_cache.get_or_build(key, build)
+        except Memory.DoesNotExist:
+            return Response({"error": "Memory not found"}, status=status.HTTP_404_NOT_FOUND)
+        if hit:
+            overlay_viewer_fields(request, [payload])
+        response = Response(payload, status=status.HTTP_200_OK)
+        response["X-Timeline-Cache"] = "hit" if hit else "miss"
+        return set_validators(response, etag, last_modified)
+
     try:
         # Role-based memory detail access with all related data
-        base_query = Memory.objects.select_related('user').prefetch_related(
-            'images', 'videos', 'voice_recordings', 'tagged_people', 
-            'event_tags', 'likes', 'comments__user', 'members'
-        )
-        
-        if is_patient(request.user):
-            # Patients can only access their own memories
-            memory = base_query.get(pk=pk, user=request.user)
-        elif is_family(request.user):
-            # Family members can access memories from connected patients
-            connected_patients = FamilyLink.objects.filter(
-                family_member=request.user, 
-                status="APPROVED"
-            ).values_list('patient', flat=True)
-            
-            memory = base_query.get(pk=pk, user__in=connected_patients)
-            print(f"👪 Family member {request.user.username} accessing enhanced memory from connected patient")
-        else:
-            raise Memory.DoesNotExist("No permission to access this memory")
-            
+        memory = access.memories(memory_detail_queryset()).get(pk=pk)
     except Memory.DoesNotExist:
         return Response({"error": "Memory not found"}, status=status.HTTP_404_NOT_FOUND)
 
-    if request.method == "GET":
-        # Use enhanced serializer with all related media
-        serializer = MemoryDetailSerializer(memory, context={"request": request})
-        return Response(serializer.data, status=status.HTTP_200_OK)
-
     # PUT/DELETE: Allow both memory owner (patient) and connected family members
-    if is_patient(request.user) and memory.user != request.user:
-        return Response(
-            {"error": "You can only modify your own memories"}, 
-            status=status.HTTP_403_FORBIDDEN
-        )
-    elif is_family(request.user) and not can_access_patient_data(request.user, memory.user.id):
+    if not access.can_write(memory.user_id):
         return Response(
             {"error": "You don't have permission to modify this patient's memories"}, 
             status=status.HTTP_403_FORBIDDEN
@@ -428,221 +472,388 @@ def memory_detail_enhanced(request, pk):
 @permission_classes([IsAuthenticated])
 def add_memory_image(request, memory_id):
     """Add image to memory"""
-    try:
-        if is_patient(request.user):
-            memory = Memory.objects.get(id=memory_id, user=request.user)
-        elif is_family(request.user):
-            connected_patients = FamilyLink.objects.filter(
-                family_member=request.user, 
-                status="APPROVED"
-            ).values_list('patient', flat=True)
-            memory = Memory.objects.get(id=memory_id, user__in=connected_patients)
-        else:
-            return Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
-    except Memory.DoesNotExist:
-        return Response({"error": "Memory not found"}, status=status.HTTP_404_NOT_FOUND)
-    
-    # ✅ FIX: Don't copy request.data when it contains files
-    data = {
-        'memory': memory.id,
-        'caption': request.data.get('caption', ''),
-        'order': request.data.get('order', 0),
-    }
-    
-    # Handle Cloudinary upload
-    file_obj = request.FILES.get("image")
-    if file_obj:
-        try:
-            print(f"📷 Uploading image to Cloudinary: {file_obj.name}")
-            upload_res = cloudinary.uploader.upload(file_obj, folder="memory_images")
-            data["image_url"] = upload_res.get("secure_url")
-            print(f"✅ Image upload successful: {data['image_url']}")
-        except Exception as e:
-            print(f"❌ Cloudinary image upload failed: {e}")
-            return Response({"error": f"Image upload failed: {e}"}, status=status.HTTP_400_BAD_REQUEST)
-    else:
-        return Response({"error": "No image file provided"}, status=status.HTTP_400_BAD_REQUEST)
-    
-    serializer = MemoryImageSerializer(data=data)
-    if serializer.is_valid():
-        image = serializer.save()
-        return Response(MemoryImageSerializer(image).data, status=status.HTTP_201_CREATED)
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    return upload_memory_media(request, memory_id, "image")
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def add_memory_video(request, memory_id):
     """Add video to memory"""
-    try:
-        if is_patient(request.user):
-            memory = Memory.objects.get(id=memory_id, user=request.user)
-        elif is_family(request.user):
-            connected_patients = FamilyLink.objects.filter(
-                family_member=request.user, 
-                status="APPROVED"
-            ).values_list('patient', flat=True)
-            memory = Memory.objects.get(id=memory_id, user__in=connected_patients)
-        else:
-            return Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
-    except Memory.DoesNotExist:
-        return Response({"error": "Memory not found"}, status=status.HTTP_404_NOT_FOUND)
-    
-    # ✅ FIX: Don't copy request.data when it contains files
-    data = {
-        'memory': memory.id,
-        'caption': request.data.get('caption', ''),
-        'order': request.data.get('order', 0),
-    }
-    
-    # Handle Cloudinary upload for video
-    file_obj = request.FILES.get("video")
-    if file_obj:
-        try:
-            print(f"📹 Uploading video to Cloudinary: {file_obj.name}")
-            upload_res = cloudinary.uploader.upload(file_obj, 
-                                                  folder="memory_videos",
-                                                  resource_type="video")
-            data["video_url"] = upload_res.get("secure_url")
-            
-            # Extract duration if available
-            if upload_res.get("duration"):
-                minutes = int(upload_res["duration"] // 60)
-                seconds = int(upload_res["duration"] % 60)
-                data["duration"] = f"{minutes:02d}:{seconds:02d}"
-                
-            # Extract thumbnail URL if available
-            if upload_res.get("secure_url"):
-                # Cloudinary auto-generates thumbnail for videos
-                thumbnail_url = upload_res["secure_url"].replace("/video/upload/", "/video/upload/c_thumb,w_300,h_200/")
-                data["thumbnail_url"] = thumbnail_url
-                
-            print(f"✅ Video upload successful: {data['video_url']}")
-        except Exception as e:
-            print(f"❌ Cloudinary video upload failed: {e}")
-            return Response({"error": f"Video upload failed: {e}"}, status=status.HTTP_400_BAD_REQUEST)
-    else:
-        return Response({"error": "No video file provided"}, status=status.HTTP_400_BAD_REQUEST)
-    
-    serializer = MemoryVideoSerializer(data=data)
-    if serializer.is_valid():
-        video = serializer.save()
-        return Response(MemoryVideoSerializer(video).data, status=status.HTTP_201_CREATED)
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    return upload_memory_media(request, memory_id, "video")
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def add_memory_voice_recording(request, memory_id):
     """Add voice recording to memory"""
+    return upload_memory_media(request, memory_id, "recording")
+
+def upload_memory_media(request, memory_id, kind):
+    """
+    Shared body of the media upload views. With MEDIA_UPLOADS_ASYNC the file is spooled
+    and a job queued (202 + job to poll); otherwise it is uploaded within the request (201).
+    """
+    memory, error = get_memory_or_error(request, memory_id)
+    if error:
+        return error
+
+    spec = media.MEDIA_KINDS[kind]
+    file_obj = request.FILES.get(spec["upload_field"])
+    rejected = rejected_upload(kind, file_obj)
+    if rejected:
+        return rejected
+    if not file_obj:
+        return Response({"error": f"No {spec['upload_field']} file provided"}, status=status.HTTP_400_BAD_REQUEST)
+
+    metadata, errors = media.validate_metadata(kind, memory, request.data)
+    if errors:
+        return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+    if settings.MEDIA_UPLOADS_ASYNC:
+        job = media.enqueue_upload(memory, kind, file_obj, metadata, request.user)
+        print(f"📥 {spec['label']} spooled for memory {memory.id}: job {job.id} ({file_obj.size} bytes)")
+        return Response(upload_job_payload(request, job), status=status.HTTP_202_ACCEPTED)
+
     try:
-        if is_patient(request.user):
-            memory = Memory.objects.get(id=memory_id, user=request.user)
-        elif is_family(request.user):
-            connected_patients = FamilyLink.objects.filter(
-                family_member=request.user, 
-                status="APPROVED"
-            ).values_list('patient', flat=True)
-            memory = Memory.objects.get(id=memory_id, user__in=connected_patients)
+        print(f"📤 Uploading {kind}: {file_obj.name}")
+        instance = media.upload_now(memory, kind, file_obj, metadata)
+    except Exception as e:
+        print(f"❌ {spec['label']} upload failed: {e}")
+        return Response({"error": f"{spec['label']} upload failed: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(spec["serializer"](instance).data, status=status.HTTP_201_CREATED)
+
+def upload_job_payload(request, job):
+    data = {
+        "job_id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "memory": job.memory_id,
+        "attempts": job.attempts,
+        "error": job.last_error or None,
+        "created_at": job.created_at,
+        "finished_at": job.finished_at,
+        "status_url": request.build_absolute_uri(reverse("upload_job_status", args=[job.id])),
+    }
+    if job.status == "succeeded" and job.result_id:
+        if job.kind == "memory":
+            fast = FastSerializer({"request": request})
+            data["result"] = {"id": job.memory_id, "resolved_image_url": fast.resolved(job.memory.image_url, job.memory.image)}
         else:
-            return Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
-    except Memory.DoesNotExist:
-        return Response({"error": "Memory not found"}, status=status.HTTP_404_NOT_FOUND)
-    
-    # ✅ FIX: Don't copy request.data when it contains files
+            data["result"] = media_result(request, job.kind, job.result_id)
+    return data
+
+def media_result(request, kind, pk):
+    """Serialized media row created by an upload, or None if it has been deleted since"""
+    fast = FastSerializer({"request": request})
+    instance = media.MEDIA_KINDS[kind]["model"].objects.filter(pk=pk).first()
+    method = {"image": fast.image, "video": fast.video, "recording": fast.voice_recording}[kind]
+    return method(instance) if instance else None
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def upload_job_status(request, pk):
+    """Poll an asynchronous media upload"""
+    job = MediaUploadJob.objects.select_related("memory").filter(pk=pk).first()
+    if job is None or not (job.created_by_id == request.user.id or get_access(request).can_read(job.memory.user_id)):
+        return Response({"error": "Upload job not found"}, status=status.HTTP_404_NOT_FOUND)
+    response = Response(upload_job_payload(request, job), status=status.HTTP_200_OK)
+    if job.status in ("pending", "processing"):
+        response["Retry-After"] = "2"
+    return response
+
+# ------------------ DIRECT UPLOADS ------------------ #
+# POST memories/<id>/direct-uploads/ {kind, caption...} -> signed form fields + token
+#   (the client posts the file with those fields to upload_url, i.e. straight to Cloudinary)
+# POST direct-uploads/confirm/ {token, public_id, version, signature, format, duration}
+#   -> 201 media row once the storage response signature checks out
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def create_direct_upload(request, memory_id):
+    """Issue signed, single-file upload parameters scoped to a memory and media type"""
+    memory, error = get_memory_or_error(request, memory_id)
+    if error:
+        return error
+
+    kind = request.data.get("kind")
+    if kind not in media.DIRECT_UPLOAD_KINDS:
+        return Response({"error": "kind must be one of image, video, recording"}, status=status.HTTP_400_BAD_REQUEST)
+    metadata, errors = media.validate_metadata(kind, memory, request.data)
+    if errors:
+        return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        upload = media.sign_direct_upload(memory, kind, metadata, request.user)
+    except media.DirectUploadError as e:
+        return Response({"error": str(e)}, status=status.HTTP_501_NOT_IMPLEMENTED)
+    upload["confirm_url"] = request.build_absolute_uri(reverse("confirm_direct_upload"))
+    upload["expires_in"] = settings.DIRECT_UPLOAD_TTL_SECONDS
+    response = Response(upload, status=status.HTTP_200_OK)
+    response["Cache-Control"] = "no-store"
+    return response
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def confirm_direct_upload(request):
+    """Verify a finished direct upload and create its MemoryImage / MemoryVideo / MemoryVoiceRecording"""
+    try:
+        claim = media.read_direct_upload_token(str(request.data.get("token") or ""))
+    except media.DirectUploadError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if claim["user"] != request.user.id:
+        return Response({"error": "Invalid upload token"}, status=status.HTTP_400_BAD_REQUEST)
+    memory, error = get_memory_or_error(request, claim["memory"])
+    if error:
+        return error
+
+    try:
+        instance, created = media.confirm_direct_upload(memory, claim, request.data)
+    except media.DirectUploadError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if created:
+        print(f"✅ Direct {claim['kind']} upload confirmed for memory {memory.id}: {claim['public_id']}")
+    return Response(
+        media_result(request, claim["kind"], instance.pk),
+        status=status.HTTP_201_CREATED if created else status.HTTP_200_OK,
+    )
+
+# ------------------ RESUMABLE UPLOADS ------------------ #
+# POST memories/<id>/upload-sessions/ {kind, filename, size, caption...}  -> session
+# PUT upload-sessions/<id>/ (Upload-Offset: n, raw bytes)                 -> new offset
+# HEAD/GET upload-sessions/<id>/                                           -> offset to resume from
+# POST upload-sessions/<id>/complete/                                      -> 202 job / 201 media row
+
+def upload_session_payload(request, session):
     data = {
-        'memory': memory.id,
-        'speaker_name': request.data.get('speaker_name', 'Unknown Speaker'),
-        'speaker_relation': request.data.get('speaker_relation', ''),
-        'order': request.data.get('order', 0),
+        "session_id": str(session.pk),
+        "kind": session.kind,
+        "memory": session.memory_id,
+        "filename": session.filename,
+        "size": session.size,
+        "offset": session.received,
+        "status": session.status,
+        "expires_at": session.expires_at,
+        "upload_url": request.build_absolute_uri(reverse("upload_session_detail", args=[session.pk])),
+        "complete_url": request.build_absolute_uri(reverse("complete_upload_session", args=[session.pk])),
     }
-    
-    # Handle Cloudinary upload for audio
-    file_obj = request.FILES.get("audio")
-    if file_obj:
-        try:
-            print(f"🎤 Uploading audio to Cloudinary: {file_obj.name}")
-            upload_res = cloudinary.uploader.upload(file_obj, 
-                                                  folder="memory_audio",
-                                                  resource_type="video")  # Cloudinary uses "video" for audio files
-            data["audio_url"] = upload_res.get("secure_url")
-            
-            # Extract duration if available
-            if upload_res.get("duration"):
-                minutes = int(upload_res["duration"] // 60)
-                seconds = int(upload_res["duration"] % 60)
-                data["duration"] = f"{minutes:02d}:{seconds:02d}"
-                
-            print(f"✅ Audio upload successful: {data['audio_url']}")
-        except Exception as e:
-            print(f"❌ Cloudinary audio upload failed: {e}")
-            return Response({"error": f"Audio upload failed: {e}"}, status=status.HTTP_400_BAD_REQUEST)
-    else:
-        return Response({"error": "No audio file provided"}, status=status.HTTP_400_BAD_REQUEST)
-    
-    serializer = MemoryVoiceRecordingSerializer(data=data)
-    if serializer.is_valid():
-        recording = serializer.save()
-        return Response(MemoryVoiceRecordingSerializer(recording).data, status=status.HTTP_201_CREATED)
-    return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+    if session.job_id:
+        data["upload_job"] = upload_job_payload(request, session.job)
+    if session.result_id:
+        data["result"] = media_result(request, session.kind, session.result_id)
+    return data
+
+def upload_session_response(request, session, status_code=status.HTTP_200_OK):
+    response = Response(upload_session_payload(request, session), status=status_code)
+    response["Upload-Offset"] = str(session.received)
+    response["Upload-Length"] = str(session.size)
+    response["Cache-Control"] = "no-store"
+    return response
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
-def add_memory_people(request, memory_id):
-    """Add people tags to memory"""
+def create_upload_session(request, memory_id):
+    """Start a resumable chunked upload of a video, recording or image"""
+    memory, error = get_memory_or_error(request, memory_id)
+    if error:
+        return error
+
+    kind = request.data.get("kind")
+    if kind not in dict(UploadSession.KIND_CHOICES):
+        return Response({"error": "kind must be one of image, video, recording"}, status=status.HTTP_400_BAD_REQUEST)
+    filename = str(request.data.get("filename") or "").strip()
+    if not filename:
+        return Response({"error": "filename is required"}, status=status.HTTP_400_BAD_REQUEST)
     try:
-        if is_patient(request.user):
-            memory = Memory.objects.get(id=memory_id, user=request.user)
-        elif is_family(request.user):
-            connected_patients = FamilyLink.objects.filter(
-                family_member=request.user, 
-                status="APPROVED"
-            ).values_list('patient', flat=True)
-            memory = Memory.objects.get(id=memory_id, user__in=connected_patients)
-        else:
-            return Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
-    except Memory.DoesNotExist:
-        return Response({"error": "Memory not found"}, status=status.HTTP_404_NOT_FOUND)
-    
-    people = request.data.get('people', [])
-    created_people = []
-    
-    for person_data in people:
-        person_data['memory'] = memory.id
-        serializer = MemoryPersonSerializer(data=person_data)
+        size = int(request.data.get("size"))
+    except (TypeError, ValueError):
+        return Response({"error": "size must be the total number of bytes"}, status=status.HTTP_400_BAD_REQUEST)
+    if size <= 0:
+        return Response({"error": "size must be the total number of bytes"}, status=status.HTTP_400_BAD_REQUEST)
+    limit = min(settings.UPLOAD_SESSION_MAX_SIZE, settings.MEDIA_MAX_UPLOAD_SIZE[kind])
+    if size > limit:
+        return Response({"error": f"File too large (max {limit} bytes)"}, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+    metadata, errors = media.validate_metadata(kind, memory, request.data)
+    if errors:
+        return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+    session = media.open_session(memory, kind, filename, size, metadata, request.user)
+    print(f"📥 Upload session {session.pk} opened for memory {memory.id}: {kind}, {size} bytes")
+    response = upload_session_response(request, session, status.HTTP_201_CREATED)
+    response["Location"] = reverse("upload_session_detail", args=[session.pk])
+    return response
+
+def get_upload_session(request, pk):
+    """Sessions are private to the user who opened them"""
+    return UploadSession.objects.select_related("memory", "job__memory").filter(pk=pk, created_by=request.user).first()
+
+@api_view(["GET", "HEAD", "PUT", "DELETE"])
+@permission_classes([IsAuthenticated])
+def upload_session_detail(request, pk):
+    """Query the received offset (GET/HEAD), append a chunk (PUT) or cancel (DELETE)"""
+    session = get_upload_session(request, pk)
+    if session is None:
+        return Response({"error": "Upload session not found"}, status=status.HTTP_404_NOT_FOUND)
+
+    if request.method in ("GET", "HEAD"):
+        return upload_session_response(request, session)
+
+    if request.method == "DELETE":
+        if session.status != "active":
+            return Response({"error": "Upload already completed"}, status=status.HTTP_409_CONFLICT)
+        session.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    # PUT: the body is read straight from the request stream (never request.data), so a
+    # chunk is written to disk as it arrives instead of being buffered in memory
+    if session.status != "active":
+        return Response({"error": "Upload already completed"}, status=status.HTTP_409_CONFLICT)
+    try:
+        offset = int(request.headers["Upload-Offset"])
+        length = int(request.headers["Content-Length"])
+    except (KeyError, ValueError):
+        return Response(
+            {"error": "Upload-Offset and Content-Length headers are required"}, status=status.HTTP_400_BAD_REQUEST
+        )
+    if offset != session.received:
+        # The client lost track (e.g. a chunk it thought failed was partly stored): resume from here
+        response = upload_session_response(request, session, status.HTTP_409_CONFLICT)
+        response.data["error"] = f"Offset mismatch: expected {session.received}"
+        return response
+    if length < 0 or offset + length > session.size:
+        return Response(
+            {"error": f"Chunk exceeds the declared size of {session.size} bytes"},
+            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        )
+
+    received, complete = media.write_chunk(session, offset, request.stream, length)
+    if not complete:
+        response = upload_session_response(request, session, status.HTTP_409_CONFLICT)
+        response.data["error"] = f"Chunk was not fully stored; resume from offset {received}"
+        return response
+    return upload_session_response(request, session)
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def complete_upload_session(request, pk):
+    """Hand a fully received upload to the media pipeline (same result as the single-shot upload views)"""
+    session = get_upload_session(request, pk)
+    if session is None:
+        return Response({"error": "Upload session not found"}, status=status.HTTP_404_NOT_FOUND)
+    memory, error = get_memory_or_error(request, session.memory_id)
+    if error:
+        return error
+    if session.status == "completed":
+        # Idempotent: a retried completion returns the original outcome
+        code = status.HTTP_202_ACCEPTED if session.job_id else status.HTTP_201_CREATED
+        return upload_session_response(request, session, code)
+    if session.received != session.size:
+        response = upload_session_response(request, session, status.HTTP_409_CONFLICT)
+        response.data["error"] = f"Upload incomplete: {session.received} of {session.size} bytes received"
+        return response
+
+    error = media.content_type_error(session.kind, session.path)
+    if error:
+        return Response({"error": error}, status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+
+    label = media.MEDIA_KINDS[session.kind]["label"]
+    try:
+        completed = media.complete_session(session, request.user)
+    except Exception as e:
+        print(f"❌ {label} upload failed: {e}")
+        return Response({"error": f"{label} upload failed: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+    if completed is None:
+        session.refresh_from_db()
+        return upload_session_response(request, session, status.HTTP_409_CONFLICT)
+    print(f"✅ Upload session {session.pk} completed for memory {memory.id}")
+    code = status.HTTP_202_ACCEPTED if completed.job_id else status.HTTP_201_CREATED
+    return upload_session_response(request, completed, code)
+
+def attach_people_and_tags(memories, payload):
+    """
+    Validate the "people" and/or "tags" lists of `payload` in one pass, then attach them to
+    `memories` (api/tagging.py). Returns ({kind: {"created": [...], "skipped": [...]}}, None),
+    or (None, 400 Response with per-item errors) when any item is invalid; nothing is
+    attached then.
+    """
+    serializers_by_kind = {"people": PersonInputSerializer, "tags": TagInputSerializer}
+    validated, errors = {}, {}
+    for kind, serializer_class in serializers_by_kind.items():
+        if kind not in payload:
+            continue
+        serializer = serializer_class(data=payload[kind], many=True)
         if serializer.is_valid():
-            person = serializer.save()
-            created_people.append(MemoryPersonSerializer(person).data)
-    
-    return Response(created_people, status=status.HTTP_201_CREATED)
+            validated[kind] = serializer.validated_data
+        else:
+            errors[kind] = serializer.errors
+    if errors:
+        return None, Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+    fast = FastSerializer()
+    render = {"people": fast.person, "tags": fast.tag}
+    return {
+        kind: {"created": fast.many(render[kind], created), "skipped": skipped}
+        for kind, (created, skipped) in tagging.attach(memories, validated).items()
+    }, None
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def add_memory_people(request, memory_id):
+    """Add people tags to memory; names it already has are skipped"""
+    memory, error = get_memory_or_error(request, memory_id)
+    if error:
+        return error
+    result, error = attach_people_and_tags([memory], {"people": request.data.get('people', [])})
+    if error:
+        return error
+    return Response(result["people"], status=status.HTTP_201_CREATED)
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])  
 def add_memory_tags(request, memory_id):
-    """Add event tags to memory"""
+    """Add event tags to memory; tags it already has are skipped"""
+    memory, error = get_memory_or_error(request, memory_id)
+    if error:
+        return error
+    result, error = attach_people_and_tags([memory], {"tags": request.data.get('tags', [])})
+    if error:
+        return error
+    return Response(result["tags"], status=status.HTTP_201_CREATED)
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def bulk_tag_memories(request):
+    """
+    Attach the same people and/or tags to many memories at once:
+    {"memory_ids": [...], "people": [...], "tags": [...]}. Every memory must be writable.
+    """
+    memory_ids = request.data.get("memory_ids")
+    if not isinstance(memory_ids, list) or not memory_ids:
+        return Response({"error": "memory_ids must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
+    if len(memory_ids) > settings.BULK_TAG_MAX_MEMORIES:
+        return Response(
+            {"error": f"At most {settings.BULK_TAG_MAX_MEMORIES} memories per request"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
     try:
-        if is_patient(request.user):
-            memory = Memory.objects.get(id=memory_id, user=request.user)
-        elif is_family(request.user):
-            connected_patients = FamilyLink.objects.filter(
-                family_member=request.user, 
-                status="APPROVED"
-            ).values_list('patient', flat=True)
-            memory = Memory.objects.get(id=memory_id, user__in=connected_patients)
-        else:
-            return Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
-    except Memory.DoesNotExist:
-        return Response({"error": "Memory not found"}, status=status.HTTP_404_NOT_FOUND)
-    
-    tags = request.data.get('tags', [])
-    created_tags = []
-    
-    for tag_data in tags:
-        tag_data['memory'] = memory.id
-        serializer = MemoryTagSerializer(data=tag_data)
-        if serializer.is_valid():
-            tag = serializer.save()
-            created_tags.append(MemoryTagSerializer(tag).data)
-    
-    return Response(created_tags, status=status.HTTP_201_CREATED)
+        memory_ids = list(dict.fromkeys(int(pk) for pk in memory_ids))
+    except (TypeError, ValueError):
+        return Response({"error": "memory_ids must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+    if "people" not in request.data and "tags" not in request.data:
+        return Response({"error": "Provide people and/or tags"}, status=status.HTTP_400_BAD_REQUEST)
+
+    access = get_access(request)
+    memories = list(access.memories().filter(pk__in=memory_ids).only("id", "user_id"))
+    missing = sorted(set(memory_ids) - {memory.pk for memory in memories})
+    if missing:
+        return Response({"error": "Memories not found", "memory_ids": missing}, status=status.HTTP_404_NOT_FOUND)
+    if not all(access.can_write(memory.user_id) for memory in memories):
+        return Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
+
+    payload = {kind: request.data[kind] for kind in ("people", "tags") if kind in request.data}
+    result, error = attach_people_and_tags(memories, payload)
+    if error:
+        return error
+    print(f"🏷️ Bulk-tagged {len(memories)} memories")
+    return Response(result, status=status.HTTP_201_CREATED)
 
 # ------------------ INDIVIDUAL MEDIA ITEM MANAGEMENT ------------------ #
 
@@ -653,9 +864,7 @@ def memory_image_detail(request, pk):
     try:
         image = MemoryImage.objects.select_related('memory').get(pk=pk)
         # Check permissions
-        if is_patient(request.user) and image.memory.user != request.user:
-            return Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
-        elif is_family(request.user) and not can_access_patient_data(request.user, image.memory.user.id):
+        if not get_access(request).can_write(image.memory.user_id):
             return Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
     except MemoryImage.DoesNotExist:
         return Response({"error": "Image not found"}, status=status.HTTP_404_NOT_FOUND)
@@ -681,9 +890,7 @@ def memory_video_detail(request, pk):
     try:
         video = MemoryVideo.objects.select_related('memory').get(pk=pk)
         # Check permissions
-        if is_patient(request.user) and video.memory.user != request.user:
-            return Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
-        elif is_family(request.user) and not can_access_patient_data(request.user, video.memory.user.id):
+        if not get_access(request).can_write(video.memory.user_id):
             return Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
     except MemoryVideo.DoesNotExist:
         return Response({"error": "Video not found"}, status=status.HTTP_404_NOT_FOUND)
@@ -709,18 +916,18 @@ def memory_voice_recording_detail(request, pk):
     try:
         recording = MemoryVoiceRecording.objects.select_related('memory').get(pk=pk)
         # Check permissions
-        if is_patient(request.user) and recording.memory.user != request.user:
-            return Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
-        elif is_family(request.user) and not can_access_patient_data(request.user, recording.memory.user.id):
+        if not get_access(request).can_write(recording.memory.user_id):
             return Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
     except MemoryVoiceRecording.DoesNotExist:
         return Response({"error": "Recording not found"}, status=status.HTTP_404_NOT_FOUND)
     
     if request.method == "GET":
-        return Response(MemoryVoiceRecordingSerializer(recording).data, status=status.HTTP_200_OK)
+        context = {"waveform_resolution": resolution_param(request)}
+        return Response(MemoryVoiceRecordingSerializer(recording, context=context).data, status=status.HTTP_200_OK)
     
     elif request.method == "PUT":
-        serializer = MemoryVoiceRecordingSerializer(recording, data=request.data, partial=True)
+        context = {"waveform_resolution": resolution_param(request)}
+        serializer = MemoryVoiceRecordingSerializer(recording, data=request.data, partial=True, context=context)
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data, status=status.HTTP_200_OK)
@@ -737,9 +944,7 @@ def memory_person_detail(request, pk):
     try:
         person = MemoryPerson.objects.select_related('memory').get(pk=pk)
         # Check permissions
-        if is_patient(request.user) and person.memory.user != request.user:
-            return Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
-        elif is_family(request.user) and not can_access_patient_data(request.user, person.memory.user.id):
+        if not get_access(request).can_write(person.memory.user_id):
             return Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
     except MemoryPerson.DoesNotExist:
         return Response({"error": "Person not found"}, status=status.HTTP_404_NOT_FOUND)
@@ -765,9 +970,7 @@ def memory_tag_detail(request, pk):
     try:
         tag = MemoryTag.objects.select_related('memory').get(pk=pk)
         # Check permissions
-        if is_patient(request.user) and tag.memory.user != request.user:
-            return Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
-        elif is_family(request.user) and not can_access_patient_data(request.user, tag.memory.user.id):
+        if not get_access(request).can_write(tag.memory.user_id):
             return Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
     except MemoryTag.DoesNotExist:
         return Response({"error": "Tag not found"}, status=status.HTTP_404_NOT_FOUND)
@@ -793,9 +996,8 @@ def memory_comment_detail(request, pk):
     try:
         comment = MemoryComment.objects.select_related('memory', 'user').get(pk=pk)
         # Check permissions - only comment author or memory owner can edit
-        if comment.user != request.user and comment.memory.user != request.user:
-            if is_family(request.user) and not can_access_patient_data(request.user, comment.memory.user.id):
-                return Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
+        if comment.user_id != request.user.id and not get_access(request).can_read(comment.memory.user_id):
+            return Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
     except MemoryComment.DoesNotExist:
         return Response({"error": "Comment not found"}, status=status.HTTP_404_NOT_FOUND)
     
@@ -827,20 +1029,9 @@ def memory_comment_detail(request, pk):
 @permission_classes([IsAuthenticated])
 def toggle_memory_like(request, memory_id):
     """Toggle like/unlike for a memory"""
-    try:
-        # Check if user can access this memory
-        if is_patient(request.user):
-            memory = Memory.objects.get(id=memory_id, user=request.user)
-        elif is_family(request.user):
-            connected_patients = FamilyLink.objects.filter(
-                family_member=request.user, 
-                status="APPROVED"
-            ).values_list('patient', flat=True)
-            memory = Memory.objects.get(id=memory_id, user__in=connected_patients)
-        else:
-            return Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
-    except Memory.DoesNotExist:
-        return Response({"error": "Memory not found"}, status=status.HTTP_404_NOT_FOUND)
+    memory, error = get_memory_or_error(request, memory_id)
+    if error:
+        return error
     
     like, created = MemoryLike.objects.get_or_create(
         memory=memory,
@@ -862,20 +1053,9 @@ def toggle_memory_like(request, memory_id):
 @permission_classes([IsAuthenticated])
 def add_memory_comment(request, memory_id):
     """Add comment to memory"""
-    try:
-        # Check if user can access this memory
-        if is_patient(request.user):
-            memory = Memory.objects.get(id=memory_id, user=request.user)
-        elif is_family(request.user):
-            connected_patients = FamilyLink.objects.filter(
-                family_member=request.user, 
-                status="APPROVED"
-            ).values_list('patient', flat=True)
-            memory = Memory.objects.get(id=memory_id, user__in=connected_patients)
-        else:
-            return Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
-    except Memory.DoesNotExist:
-        return Response({"error": "Memory not found"}, status=status.HTTP_404_NOT_FOUND)
+    memory, error = get_memory_or_error(request, memory_id)
+    if error:
+        return error
     
     data = request.data.copy()
     data['memory'] = memory.id
@@ -893,26 +1073,17 @@ def add_memory_comment(request, memory_id):
 @permission_classes([IsAuthenticated])
 def get_memory_media(request, memory_id):
     """Get all media for a specific memory"""
-    try:
-        if is_patient(request.user):
-            memory = Memory.objects.get(id=memory_id, user=request.user)
-        elif is_family(request.user):
-            connected_patients = FamilyLink.objects.filter(
-                family_member=request.user, 
-                status="APPROVED"
-            ).values_list('patient', flat=True)
-            memory = Memory.objects.get(id=memory_id, user__in=connected_patients)
-        else:
-            return Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
-    except Memory.DoesNotExist:
-        return Response({"error": "Memory not found"}, status=status.HTTP_404_NOT_FOUND)
+    memory, error = get_memory_or_error(request, memory_id)
+    if error:
+        return error
     
+    fast = FastSerializer({"waveform_resolution": resolution_param(request)})
     data = {
-        "images": MemoryImageSerializer(memory.images.all(), many=True).data,
-        "videos": MemoryVideoSerializer(memory.videos.all(), many=True).data,
-        "voice_recordings": MemoryVoiceRecordingSerializer(memory.voice_recordings.all(), many=True).data,
-        "people": MemoryPersonSerializer(memory.tagged_people.all(), many=True).data,
-        "tags": MemoryTagSerializer(memory.event_tags.all(), many=True).data,
+        "images": fast.many(fast.image, memory.images.all()),
+        "videos": fast.many(fast.video, memory.videos.all()),
+        "voice_recordings": fast.many(fast.voice_recording, memory.voice_recordings.all()),
+        "people": fast.many(fast.person, memory.tagged_people.all()),
+        "tags": fast.many(fast.tag, memory.event_tags.all()),
     }
     
     return Response(data, status=status.HTTP_200_OK)
@@ -921,25 +1092,15 @@ def get_memory_media(request, memory_id):
 @permission_classes([IsAuthenticated])
 def get_memory_interactions(request, memory_id):
     """Get all interactions (likes, comments) for a specific memory"""
-    try:
-        if is_patient(request.user):
-            memory = Memory.objects.get(id=memory_id, user=request.user)
-        elif is_family(request.user):
-            connected_patients = FamilyLink.objects.filter(
-                family_member=request.user, 
-                status="APPROVED"
-            ).values_list('patient', flat=True)
-            memory = Memory.objects.get(id=memory_id, user__in=connected_patients)
-        else:
-            return Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
-    except Memory.DoesNotExist:
-        return Response({"error": "Memory not found"}, status=status.HTTP_404_NOT_FOUND)
+    memory, error = get_memory_or_error(request, memory_id)
+    if error:
+        return error
     
     data = {
         "likes": MemoryLikeSerializer(memory.likes.all(), many=True).data,
         "comments": MemoryCommentSerializer(memory.comments.all(), many=True).data,
-        "likes_count": memory.likes.count(),
-        "comments_count": memory.comments.count(),
+        "likes_count": memory.likes_count,
+        "comments_count": memory.comments_count,
         "is_liked_by_user": memory.likes.filter(user=request.user).exists(),
     }
     
@@ -1017,6 +1178,7 @@ def connect_with_code(request):
         print(f"ℹ️ FamilyMember record already exists: {request.user.username} for patient {patient.username}")
 
     code_obj.delete()  # one-time use
+    invalidate_access(request.user.id)  # new patient must be visible on the very next request
     
     return Response({
         "message": "Connected successfully", 
@@ -1036,149 +1198,296 @@ def my_patients(request):
     data = [{"id": l.patient.id, "username": l.patient.username, "name": getattr(l.patient, "full_name", l.patient.username), "avatar": None, "relation": l.relation or ""} for l in links]
     return Response(data, status=status.HTTP_200_OK)
 
+# ------------------ SEARCH ------------------ #
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def search_memories_view(request):
+    """
+    Ranked full-text search (?q=) over the memories the viewer can read: title, description,
+    location, tag, event tags, tagged people and voice transcripts. Each result carries
+    `search_rank` and a `highlight` HTML snippet: the text escaped, matches wrapped in <mark>.
+    """
+    access = get_access(request)
+    query = request.query_params.get("q", "").strip()
+    if not query:
+        return Response({"error": "Query parameter 'q' is required"}, status=status.HTTP_400_BAD_REQUEST)
+
+    paginator = SearchPagination(request)
+    hits, total = search_memories(query, access.readable_patient_ids, paginator.page_size, paginator.offset)
+
+    ranked = {memory_id: (rank, highlight) for memory_id, rank, highlight in hits}
+    found = Memory.objects.filter(id__in=list(ranked)).select_related('user').prefetch_related('members').in_bulk()
+    # The index is refreshed on commit, so a just-deleted memory may still be listed - skip it
+    memories = [found[memory_id] for memory_id, _, _ in hits if memory_id in found]
+
+    fast = FastSerializer(viewer_context(request, memories))
+    results = fast.many(fast.memory, memories)
+    for item in results:
+        item["search_rank"], item["highlight"] = ranked[item["id"]]
+    print(f"🔎 {request.user.username} searched {query!r}: {total} match(es)")
+    return paginator.get_paginated_response(results, total)
+
+# ------------------ DELTA SYNC ------------------ #
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def memory_changes(request):
+    """
+    Memories and media created/updated since ?since=<sync_token>, plus tombstones for
+    deletions. Without a token the full collection is returned. Always returns a new token.
+    """
+    access = get_access(request)
+    if not access.has_role:
+        return Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
+
+    try:
+        changes = collect_changes(access, request.query_params.get("since"))
+    except SyncTokenExpired:
+        return Response(
+            {"error": "Sync token expired, full resync required", "reset": True},
+            status=status.HTTP_410_GONE
+        )
+    except (ValueError, KeyError, TypeError):
+        return Response({"error": "Invalid sync token"}, status=status.HTTP_400_BAD_REQUEST)
+
+    memories = list(changes["memories"].select_related('user').prefetch_related('members'))
+    fast = FastSerializer(viewer_context(request, memories))
+    data = {
+        "sync_token": changes["sync_token"],
+        "memories": fast.many(fast.memory, memories),
+        "images": fast.many(fast.image, changes["images"]),
+        "videos": fast.many(fast.video, changes["videos"]),
+        "voice_recordings": fast.many(fast.voice_recording, changes["voice_recordings"]),
+        "deleted": [
+            {"type": t.object_type, "id": t.object_id, "memory_id": t.memory_id, "deleted_at": t.deleted_at}
+            for t in changes["tombstones"]
+        ],
+        "revoked_patients": changes["revoked_patients"],
+        "full_patients": changes["full_patients"],
+    }
+    print(f"🔄 Sync for {request.user.username}: {len(memories)} memories, {len(data['deleted'])} deletions")
+    return Response(data, status=status.HTTP_200_OK)
+
 # ------------------ MEMORY NAVIGATION HELPER ENDPOINTS ------------------ #
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def get_memory_navigation(request, memory_id):
     """Get previous and next memory for navigation"""
-    try:
-        if is_patient(request.user):
-            current_memory = Memory.objects.get(id=memory_id, user=request.user)
-            all_memories = Memory.objects.filter(user=request.user).order_by('-created_at')
-        elif is_family(request.user):
-            connected_patients = FamilyLink.objects.filter(
-                family_member=request.user, 
-                status="APPROVED"
-            ).values_list('patient', flat=True)
-            current_memory = Memory.objects.get(id=memory_id, user__in=connected_patients)
-            all_memories = Memory.objects.filter(user__in=connected_patients).order_by('-created_at')
-        else:
-            return Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
-    except Memory.DoesNotExist:
-        return Response({"error": "Memory not found"}, status=status.HTTP_404_NOT_FOUND)
-    
-    memory_ids = list(all_memories.values_list('id', flat=True))
-    current_index = memory_ids.index(memory_id) if memory_id in memory_ids else -1
-    
-    prev_memory = None
-    next_memory = None
-    
-    if current_index > 0:
-        prev_memory_obj = all_memories.filter(id=memory_ids[current_index - 1]).first()
-        if prev_memory_obj:
-            prev_memory = {
-                "id": prev_memory_obj.id,
-                "title": prev_memory_obj.title,
-                "date": prev_memory_obj.date
-            }
-    
-    if current_index < len(memory_ids) - 1 and current_index != -1:
-        next_memory_obj = all_memories.filter(id=memory_ids[current_index + 1]).first()
-        if next_memory_obj:
-            next_memory = {
-                "id": next_memory_obj.id,
-                "title": next_memory_obj.title,
-                "date": next_memory_obj.date
-            }
-    
+    current_memory, error = get_memory_or_error(request, memory_id)
+    if error:
+        return error
+    # Keyset seeks on (user, created_at, id) instead of materialising every id of the timeline
+    access = get_access(request)
+    timeline = access.memories()
+    prev_memory, next_memory = navigation.neighbours(timeline, current_memory)
+    current_position, total_memories = navigation.position(request, access, timeline, current_memory)
+
     return Response({
-        "current_position": current_index + 1,
-        "total_memories": len(memory_ids),
-        "previous_memory": prev_memory,
-        "next_memory": next_memory
+        "current_position": current_position,
+        "total_memories": total_memories,
+        "previous_memory": navigation.summary(request, prev_memory),
+        "next_memory": navigation.summary(request, next_memory)
     }, status=status.HTTP_200_OK)
 
+# ------------------ IMAGE VARIANTS ------------------ #
+
+@api_view(["GET"])
+@permission_classes([serving.SignedMediaURL | IsAuthenticated])
+def image_variant(request, variant, name):
+    """
+    Resized rendition of a locally stored memory image, rendered on first request and then
+    served from the on-disk cache. Access-checked like MEDIA_URL (see serve_media): the
+    signed URLs from the serializers, or the JWT of a user who can read the patient.
+    """
+    if variant not in variants.IMAGE_VARIANTS or not name.startswith(variants.VARIANT_SOURCES):
+        return Response({"error": "Image not found"}, status=status.HTTP_404_NOT_FOUND)
+    patient_id = serving.media_owner(name)
+    if patient_id is None or not (serving.is_signed(request, name) or get_access(request).can_read(patient_id)):
+        return Response({"error": "Image not found"}, status=status.HTTP_404_NOT_FOUND)
+    try:
+        cached = variants.render_variant(variant, name)
+    except (OSError, SuspiciousFileOperation, Image.DecompressionBombError):
+        return Response({"error": "Image not found"}, status=status.HTTP_404_NOT_FOUND)
+    response = FileResponse(default_storage.open(cached, "rb"), content_type="image/webp")
+    response["Cache-Control"] = "private, max-age=86400"  # stored names are never reused
+    return response
+
+# ------------------ IMPORT / EXPORT ------------------ #
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def import_memories(request):
+    """
+    Bulk-create memories from NDJSON (application/x-ndjson) or CSV (text/csv) streamed as the
+    request body, or from a multipart "file" (.csv or .ndjson/.jsonl). Family members pass
+    ?patient_id=. Answers with the created/failed counts and per-line errors (api/bulk_import.py).
+    """
+    patient_id = request.user.pk if is_patient(request.user) else request.query_params.get("patient_id")
+    if not patient_id:
+        return Response({"error": "Family members must specify patient_id"}, status=status.HTTP_400_BAD_REQUEST)
+    if not get_access(request).can_write(patient_id):
+        return Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
+    patient = User.objects.get(pk=patient_id)
+
+    if request.content_type.startswith("multipart/form-data"):
+        upload = request.FILES.get("file")
+        if upload is None:
+            return Response({"error": "No file provided"}, status=status.HTTP_400_BAD_REQUEST)
+        lines, is_csv = upload, upload.name.lower().endswith(".csv")
+    else:
+        # Read the body line by line as it arrives instead of parsing request.data
+        lines, is_csv = request._request, request.content_type in ("text/csv", "application/csv")
+
+    rows = bulk_import.csv_rows(lines) if is_csv else bulk_import.ndjson_rows(lines)
+    report = bulk_import.import_memories(patient, rows)
+    print(f"📥 Imported {report['created']} memories for {patient.username} ({report['failed']} failed)")
+    code = status.HTTP_201_CREATED if report["created"] else status.HTTP_400_BAD_REQUEST
+    return Response(report, status=code)
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def export_memories(request):
+    """
+    Stream a ZIP of all of a patient's memories: manifest.json plus every media file (see
+    api/export.py). Patients export their own; family members pass ?patient_id=.
+    """
+    patient_id = request.user.pk if is_patient(request.user) else request.query_params.get("patient_id")
+    if not patient_id:
+        return Response({"error": "Family members must specify patient_id"}, status=status.HTTP_400_BAD_REQUEST)
+    if not get_access(request).can_read(patient_id):
+        return Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
+    patient = User.objects.get(pk=patient_id)
+
+    print(f"📦 Exporting memories of {patient.username} for {request.user.username}")
+    response = StreamingHttpResponse(export.export_archive(patient), content_type="application/zip")
+    response["Content-Disposition"] = f'attachment; filename="{export.archive_filename(patient)}"'
+    return response
+
+# ------------------ PROTECTED MEDIA FILES ------------------ #
+
+@api_view(["GET", "HEAD"])
+@permission_classes([serving.SignedMediaURL | IsAuthenticated])
+def serve_media(request, name):
+    """
+    A locally stored media file (MEDIA_URL) behind a valid signature or for users who can
+    read its patient's memories, with Range/If-Range support or an X-Accel-Redirect/X-Sendfile
+    handoff (see api.serving)
+    """
+    patient_id = serving.media_owner(name)
+    response = None
+    if patient_id is not None and (serving.is_signed(request, name) or get_access(request).can_read(patient_id)):
+        try:
+            response = serving.file_response(request, name)
+        except SuspiciousFileOperation:
+            response = None
+    if response is None:
+        return Response({"error": "File not found"}, status=status.HTTP_404_NOT_FOUND)
+    return response
+
 # ------------------ BULK OPERATIONS ------------------ #
 
+BULK_MEDIA_FIELDS = {"images": "image", "videos": "video", "audio": "recording"}  # form field -> media kind
+BULK_SERIALIZERS = {"image": "image", "video": "video", "recording": "voice_recording"}
+
+def bulk_metadata(kind, index):
+    metadata = dict(media.MEDIA_KINDS[kind]["metadata"])
+    if "order" in metadata:
+        metadata["order"] = index
+    return metadata
+
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def bulk_add_memory_media(request, memory_id):
-    """Bulk add multiple media items to a memory"""
-    try:
-        if is_patient(request.user):
-            memory = Memory.objects.get(id=memory_id, user=request.user)
-        elif is_family(request.user):
-            connected_patients = FamilyLink.objects.filter(
-                family_member=request.user, 
-                status="APPROVED"
-            ).values_list('patient', flat=True)
-            memory = Memory.objects.get(id=memory_id, user__in=connected_patients)
-        else:
-            return Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
-    except Memory.DoesNotExist:
-        return Response({"error": "Memory not found"}, status=status.HTTP_404_NOT_FOUND)
-    
-    results = {
-        "images": [],
-        "videos": [],
-        "audio": [],
-        "errors": []
-    }
-    
-    # Handle multiple image uploads
-    if 'images' in request.FILES:
-        images = request.FILES.getlist('images')
-        for i, image_file in enumerate(images):
-            try:
-                upload_res = cloudinary.uploader.upload(image_file, folder="memory_images")
-                image_data = {
-                    'memory': memory.id,
-                    'image_url': upload_res.get("secure_url"),
-                    'order': i
-                }
-                serializer = MemoryImageSerializer(data=image_data)
-                if serializer.is_valid():
-                    image_obj = serializer.save()
-                    results["images"].append(MemoryImageSerializer(image_obj).data)
-                else:
-                    results["errors"].append(f"Image {i+1}: {serializer.errors}")
-            except Exception as e:
-                results["errors"].append(f"Image {i+1} upload failed: {str(e)}")
-    
-    # Handle multiple video uploads
-    if 'videos' in request.FILES:
-        videos = request.FILES.getlist('videos')
-        for i, video_file in enumerate(videos):
-            try:
-                upload_res = cloudinary.uploader.upload(
-                    video_file, 
-                    folder="memory_videos",
-                    resource_type="video"
-                )
-                video_data = {
-                    'memory': memory.id,
-                    'video_url': upload_res.get("secure_url"),
-                    'order': i
-                }
-                serializer = MemoryVideoSerializer(data=video_data)
-                if serializer.is_valid():
-                    video_obj = serializer.save()
-                    results["videos"].append(MemoryVideoSerializer(video_obj).data)
+    """
+    Bulk add multiple media items to a memory. Files are uploaded concurrently (at most
+    settings.BULK_UPLOAD_CONCURRENCY at a time) and the rows inserted with one bulk_create per
+    media type. With ?stream=1 or Accept: application/x-ndjson, one JSON line is streamed per
+    item as its upload finishes, followed by a final "done" line with the created rows.
+    """
+    memory, error = get_memory_or_error(request, memory_id)
+    if error:
+        return error
+
+    items = [
+        (kind, file_obj)
+        for field, kind in BULK_MEDIA_FIELDS.items()
+        for file_obj in request.FILES.getlist(field)
+    ]
+    if not items:
+        return Response({"error": "No media files provided"}, status=status.HTTP_400_BAD_REQUEST)
+    if len(items) > settings.BULK_UPLOAD_MAX_FILES:
+        return Response(
+            {"error": f"At most {settings.BULK_UPLOAD_MAX_FILES} files per request"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    # Position of each file within its own type - the "order" of images/videos, as before
+    indexes, seen = [], {}
+    for kind, _ in items:
+        indexes.append(seen.get(kind, 0))
+        seen[kind] = indexes[-1] + 1
+    # Files whose bytes are not of their type are reported, not uploaded
+    unsupported = {}
+    for position, (kind, file_obj) in enumerate(items):
+        error = media.content_type_error(kind, file_obj)
+        if error:
+            unsupported[position] = f"{media.MEDIA_KINDS[kind]['label']} {indexes[position] + 1}: {error}"
+    accepted = [position for position in range(len(items)) if position not in unsupported]
+
+    def events():
+        uploaded = {kind: [] for kind in BULK_MEDIA_FIELDS.values()}
+        errors = []
+        try:
+            for position, error in unsupported.items():
+                errors.append(error)
+                yield {"event": "failed", "type": items[position][0], "index": indexes[position], "error": error}
+            for i, result, asset, exc in media.upload_concurrently(memory, [items[p] for p in accepted]):
+                position = accepted[i]
+                kind, index = items[position][0], indexes[position]
+                spec = media.MEDIA_KINDS[kind]
+                if exc is not None:
+                    errors.append(f"{spec['label']} {index + 1} upload failed: {exc}")
+                    yield {"event": "failed", "type": kind, "index": index, "error": errors[-1]}
                 else:
-                    results["errors"].append(f"Video {i+1}: {serializer.errors}")
-            except Exception as e:
-                results["errors"].append(f"Video {i+1} upload failed: {str(e)}")
-    
-    return Response(results, status=status.HTTP_201_CREATED)
+                    uploaded[kind].append((index, result, asset))
+                    yield {"event": "uploaded", "type": kind, "index": index}
+
+            results = {"images": [], "videos": [], "audio": [], "errors": errors}
+            fast = FastSerializer({"waveform_resolution": resolution_param(request)})
+            for field, kind in BULK_MEDIA_FIELDS.items():
+                rows = [
+                    (bulk_metadata(kind, index), result, asset)
+                    for index, result, asset in sorted(uploaded.pop(kind), key=lambda item: item[0])
+                ]
+                objs = media.bulk_create_media(memory, kind, rows)
+                results[field] = fast.many(getattr(fast, BULK_SERIALIZERS[kind]), objs)
+        finally:
+            # A stream the client closed early leaves uploads whose rows were never created
+            media.release_unused(asset for pending in uploaded.values() for _, _, asset in pending)
+        print(f"📦 Bulk upload for memory {memory.id}: {len(items) - len(errors)} stored, {len(errors)} failed")
+        yield {"event": "done", **results}
+
+    accept = request.META.get("HTTP_ACCEPT", "")
+    if request.query_params.get("stream") in ("1", "true") or "application/x-ndjson" in accept:
+        renderer = ORJSONRenderer()
+        return StreamingHttpResponse(
+            (renderer.render(event) + b"\n" for event in events()), content_type="application/x-ndjson"
+        )
+
+    *_, done = events()
+    done.pop("event")
+    return Response(done, status=status.HTTP_201_CREATED)
 
 @api_view(["DELETE"])
 @permission_classes([IsAuthenticated])
 def bulk_delete_memory_media(request, memory_id):
     """Bulk delete multiple media items from a memory"""
-    try:
-        if is_patient(request.user):
-            memory = Memory.objects.get(id=memory_id, user=request.user)
-        elif is_family(request.user):
-            connected_patients = FamilyLink.objects.filter(
-                family_member=request.user, 
-                status="APPROVED"
-            ).values_list('patient', flat=True)
-            memory = Memory.objects.get(id=memory_id, user__in=connected_patients)
-        else:
-            return Response({"error": "Permission denied"}, status=status.HTTP_403_FORBIDDEN)
-    except Memory.DoesNotExist:
-        return Response({"error": "Memory not found"}, status=status.HTTP_404_NOT_FOUND)
+    memory, error = get_memory_or_error(request, memory_id)
+    if error:
+        return error
     
     image_ids = request.data.get('image_ids', [])
     video_ids = request.data.get('video_ids', [])
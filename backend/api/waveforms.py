@@ -0,0 +1,200 @@
+# api/waveforms.py
+"""
+Waveform peaks of voice recordings, computed once at upload (MemoryVoiceRecording.waveform_peaks).
+
+Audio is decoded by the first of settings.AUDIO_DECODERS that reads the file: decode_wav
+handles PCM WAV with the standard library, decode_ffmpeg everything else when an ffmpeg
+binary is on PATH. Samples are reduced to min/max peaks per 10 ms bucket, then to a pyramid
+with one level per settings.WAVEFORM_RESOLUTIONS (number of min/max pairs). Each level is
+stored as {"resolution": n, "peaks": base64 of n interleaved int8 (min, max) pairs scaled
+to +/-127 of full scale}. The API returns the single level a client asks for with
+?waveform_resolution=. NumPy is optional: without it recordings get no peaks.
+"""
+import base64
+import os
+import shutil
+import struct
+import subprocess
+import tempfile
+import threading
+import wave
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+try:
+    import numpy as np
+except ImportError:  # optional: without it no waveform is computed
+    np = None
+
+BUCKETS_PER_SECOND = 100
+CHUNK_FRAMES = 1 << 16
+FFMPEG_SAMPLE_RATE = 8000  # plenty for 10 ms peaks
+
+
+class AudioDecodeError(Exception):
+    """A decoder recognised the file but could not read it to the end"""
+
+
+def compute_waveform(file):
+    """
+    {"duration": seconds, "levels": [...]} for an audio file (path or file object, left
+    rewound), or None without NumPy or a decoder that reads it.
+    """
+    if np is None:
+        return None
+    try:
+        for path in settings.AUDIO_DECODERS:
+            decoded = import_string(path)(file)
+            if decoded is None:
+                continue
+            sample_rate, chunks = decoded
+            try:
+                return build_pyramid(sample_rate, chunks)
+            except AudioDecodeError as exc:
+                print(f"⚠️ Waveform not computed: {exc}")
+                return None
+        return None
+    finally:
+        if not isinstance(file, (str, os.PathLike)):
+            file.seek(0)
+
+
+def build_pyramid(sample_rate, chunks):
+    block = max(sample_rate // BUCKETS_PER_SECOND, 1)
+    mins, maxs, rest, total = [], [], np.empty(0, np.float32), 0
+    for chunk in chunks:
+        total += len(chunk)
+        data = np.concatenate((rest, chunk))
+        whole = len(data) // block * block
+        if whole:
+            frames = data[:whole].reshape(-1, block)
+            mins.append(frames.min(axis=1))
+            maxs.append(frames.max(axis=1))
+        rest = data[whole:]
+    if len(rest):
+        mins.append(rest.min(keepdims=True))
+        maxs.append(rest.max(keepdims=True))
+    if not total:
+        return None
+
+    mins, maxs = np.concatenate(mins), np.concatenate(maxs)
+    levels = {}
+    for resolution in sorted(settings.WAVEFORM_RESOLUTIONS):
+        if resolution >= len(mins):
+            level_min, level_max = mins, maxs  # shorter than this level: every bucket
+        else:
+            starts = np.arange(resolution) * len(mins) // resolution
+            level_min, level_max = np.minimum.reduceat(mins, starts), np.maximum.reduceat(maxs, starts)
+        levels.setdefault(len(level_min), _pack(level_min, level_max))
+    return {
+        "duration": total / sample_rate,
+        "levels": [{"resolution": n, "peaks": peaks} for n, peaks in sorted(levels.items())],
+    }
+
+
+def _pack(level_min, level_max):
+    pairs = np.column_stack((level_min, level_max))
+    quantized = np.clip(np.rint(pairs * 127), -127, 127).astype(np.int8)
+    return base64.b64encode(quantized.tobytes()).decode("ascii")
+
+
+def waveform_level(peaks, resolution=None):
+    """
+    The stored level for a client: the coarsest with at least `resolution` pairs (default
+    settings.WAVEFORM_DEFAULT_RESOLUTION), else the finest there is. None without peaks.
+    """
+    if not peaks or not peaks.get("levels"):
+        return None
+    resolution = resolution or settings.WAVEFORM_DEFAULT_RESOLUTION
+    levels = peaks["levels"]
+    return next((level for level in levels if level["resolution"] >= resolution), levels[-1])
+
+
+def resolution_param(request):
+    """Positive int ?waveform_resolution= of the request, else None"""
+    if request is None:
+        return None
+    try:
+        return max(int(request.GET.get("waveform_resolution", "")), 0) or None
+    except ValueError:
+        return None
+
+
+# ------------------ DECODERS ------------------ #
+# A decoder takes a path or file object and returns (sample_rate, iterable of mono float32
+# chunks in [-1, 1]), or None when the file is not a format it handles. Errors while
+# reading are raised as AudioDecodeError.
+
+def decode_wav(file):
+    """PCM WAV (8/16/24/32-bit) with the standard library wave module"""
+    try:
+        reader = wave.open(file, "rb")
+    except (wave.Error, EOFError, struct.error):
+        return None  # not a PCM WAV file
+    return reader.getframerate(), _wav_chunks(reader)
+
+
+def _wav_chunks(reader):
+    channels, width = reader.getnchannels(), reader.getsampwidth()
+    try:
+        with reader:
+            while frames := reader.readframes(CHUNK_FRAMES):
+                raw = np.frombuffer(frames, np.uint8)
+                raw = raw[:len(raw) // (width * channels) * width * channels]
+                if width == 1:  # unsigned 8-bit
+                    samples = (raw.astype(np.float32) - 128) / 128
+                elif width == 3:  # little-endian 24-bit: widen to int32
+                    wide = np.zeros((len(raw) // 3, 4), np.uint8)
+                    wide[:, 1:] = raw.reshape(-1, 3)
+                    samples = wide.view("<i4").ravel().astype(np.float32) / 2 ** 31
+                else:
+                    dtype = {2: "<i2", 4: "<i4"}[width]
+                    samples = raw.view(dtype).astype(np.float32) / 2 ** (8 * width - 1)
+                yield samples.reshape(-1, channels).mean(axis=1)
+    except (wave.Error, EOFError, struct.error, KeyError) as exc:
+        raise AudioDecodeError(f"unreadable WAV data ({exc!r})") from exc
+
+
+def decode_ffmpeg(file):
+    """Any format ffmpeg reads; needs the ffmpeg binary and a file on disk"""
+    binary = shutil.which("ffmpeg")
+    path = file if isinstance(file, (str, os.PathLike)) else getattr(file, "temporary_file_path", lambda: None)()
+    if binary is None or path is None:
+        return None
+    command = [
+        binary, "-v", "error", "-nostdin", "-i", os.fspath(path),
+        "-f", "f32le", "-ac", "1", "-ar", str(FFMPEG_SAMPLE_RATE), "-",
+    ]
+    return FFMPEG_SAMPLE_RATE, _ffmpeg_chunks(command)
+
+
+def _ffmpeg_chunks(command):
+    # stderr goes to a file: a pipe nobody reads until stdout ends would fill up and stall
+    # ffmpeg on a damaged file that logs an error per frame
+    with tempfile.TemporaryFile() as errors:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=errors)
+        timed_out = threading.Event()
+
+        def expire():
+            timed_out.set()
+            process.kill()  # the read below then sees EOF
+
+        timer = threading.Timer(settings.WAVEFORM_FFMPEG_TIMEOUT, expire)
+        timer.start()
+        try:
+            while data := process.stdout.read(CHUNK_FRAMES * 4):
+                yield np.frombuffer(data[:len(data) // 4 * 4], "<f4")
+            code = process.wait()
+            if timed_out.is_set():
+                raise AudioDecodeError(f"ffmpeg timed out after {settings.WAVEFORM_FFMPEG_TIMEOUT}s")
+            if code != 0:
+                errors.seek(0)
+                message = errors.read()[-2000:].decode(errors="replace").strip()
+                raise AudioDecodeError(message or "ffmpeg failed")
+        finally:
+            timer.cancel()
+            if process.poll() is None:
+                process.kill()
+            process.wait()
+            process.stdout.close()
@@ -1,5 +1,6 @@
 from pathlib import Path
 from datetime import timedelta
+from importlib.util import find_spec
 import os
 import cloudinary  # Add this import [web:137]
 from decouple import config
@@ -70,6 +71,107 @@ DATABASES = {
     }
 }
 
+# Cache (locmem by default; point CACHE_BACKEND/CACHE_LOCATION at a shared backend such as
+# Redis or Memcached in production so invalidations reach every worker)
+CACHES = {
+    "default": {
+        "BACKEND": config("CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": config("CACHE_LOCATION", default="relive"),
+    }
+}
+
+# How long a family user's approved patient ids are cached (invalidated on FamilyLink changes)
+ACCESS_CACHE_TIMEOUT = config("ACCESS_CACHE_TIMEOUT", default=300, cast=int)
+
+# Versioned cache of serialized memory timelines / details (keys embed the patient's
+# timeline version, so writes never need to delete entries)
+TIMELINE_CACHE_ENABLED = config("TIMELINE_CACHE_ENABLED", default=True, cast=bool)
+TIMELINE_CACHE_ALIAS = config("TIMELINE_CACHE_ALIAS", default="default")
+TIMELINE_CACHE_TIMEOUT = config("TIMELINE_CACHE_TIMEOUT", default=3600, cast=int)
+
+# Delta sync (/api/memories/changes/): tombstones older than the retention window are pruned
+# by `manage.py prune_sync_tombstones`, and tokens older than it get 410 + full resync
+SYNC_TOMBSTONE_RETENTION_DAYS = config("SYNC_TOMBSTONE_RETENTION_DAYS", default=30, cast=int)
+SYNC_TOKEN_OVERLAP_SECONDS = config("SYNC_TOKEN_OVERLAP_SECONDS", default=5, cast=int)
+
+# Media uploads: files are spooled to MEDIA_SPOOL_DIR and pushed to storage by
+# `manage.py process_upload_jobs` (the API answers 202 + job id). Set MEDIA_UPLOADS_ASYNC=False
+# to upload inside the request instead. MEDIA_STORAGE_BACKEND is swappable, e.g.
+# "api.storage.LocalMediaStorage" to keep files under MEDIA_ROOT (offline/dev/tests).
+MEDIA_UPLOADS_ASYNC = config("MEDIA_UPLOADS_ASYNC", default=True, cast=bool)
+MEDIA_STORAGE_BACKEND = config("MEDIA_STORAGE_BACKEND", default="api.storage.CloudinaryMediaStorage")
+MEDIA_SPOOL_DIR = config("MEDIA_SPOOL_DIR", default=str(BASE_DIR / "upload_spool"))
+UPLOAD_JOB_MAX_ATTEMPTS = config("UPLOAD_JOB_MAX_ATTEMPTS", default=5, cast=int)
+UPLOAD_JOB_RETRY_DELAY = config("UPLOAD_JOB_RETRY_DELAY", default=30, cast=int)  # seconds, doubled per attempt
+UPLOAD_JOB_STALE_SECONDS = config("UPLOAD_JOB_STALE_SECONDS", default=1800, cast=int)  # reclaim jobs of dead workers
+UPLOAD_JOB_HEARTBEAT_SECONDS = config("UPLOAD_JOB_HEARTBEAT_SECONDS", default=60, cast=int)  # well under the above
+
+# Uploaded files stream to a temp file while being hashed, sized and sniffed (api.uploads);
+# a file larger than the limit for its form field stops the upload (413) as soon as it crosses it
+FILE_UPLOAD_HANDLERS = ["api.uploads.InspectingUploadHandler"]
+MEDIA_MAX_UPLOAD_SIZE = {  # bytes, per upload kind (api.uploads.FIELD_KINDS)
+    "image": config("MAX_IMAGE_UPLOAD_SIZE", default=25 * 1024 ** 2, cast=int),
+    "video": config("MAX_VIDEO_UPLOAD_SIZE", default=2 * 1024 ** 3, cast=int),
+    "recording": config("MAX_AUDIO_UPLOAD_SIZE", default=200 * 1024 ** 2, cast=int),
+    "avatar": config("MAX_AVATAR_UPLOAD_SIZE", default=5 * 1024 ** 2, cast=int),
+    "import": config("MAX_IMPORT_UPLOAD_SIZE", default=100 * 1024 ** 2, cast=int),  # CSV/NDJSON file
+    "other": config("MAX_OTHER_UPLOAD_SIZE", default=5 * 1024 ** 2, cast=int),  # fields no view expects
+}
+
+# Images are normalized before upload (api/normalize.py): EXIF orientation applied, longest
+# edge capped, re-encoded as WEBP or JPEG. IMAGE_KEEP_ORIGINAL also stores the untouched file.
+IMAGE_NORMALIZE = config("IMAGE_NORMALIZE", default=True, cast=bool)
+IMAGE_MAX_EDGE = config("IMAGE_MAX_EDGE", default=2560, cast=int)
+IMAGE_NORMALIZE_FORMAT = config("IMAGE_NORMALIZE_FORMAT", default="WEBP")
+IMAGE_NORMALIZE_QUALITY = config("IMAGE_NORMALIZE_QUALITY", default=82, cast=int)
+IMAGE_KEEP_ORIGINAL = config("IMAGE_KEEP_ORIGINAL", default=False, cast=bool)
+
+# Voice recording waveforms (api/waveforms.py): peaks computed at upload with NumPy, kept as a
+# pyramid with one level per resolution (min/max pairs); ?waveform_resolution= picks a level
+AUDIO_DECODERS = ["api.waveforms.decode_wav", "api.waveforms.decode_ffmpeg"]
+WAVEFORM_FFMPEG_TIMEOUT = config("WAVEFORM_FFMPEG_TIMEOUT", default=120, cast=int)  # seconds per recording
+WAVEFORM_RESOLUTIONS = (64, 256, 1024, 4096)
+WAVEFORM_DEFAULT_RESOLUTION = config("WAVEFORM_DEFAULT_RESOLUTION", default=256, cast=int)
+
+# Local media under MEDIA_URL is served by api.serving with access checks. In production, let
+# the web server send the bytes: "x-accel-redirect" (nginx `internal` location at
+# MEDIA_ACCEL_REDIRECT_PREFIX, aliased to MEDIA_ROOT) or "x-sendfile" (Apache/lighttpd)
+MEDIA_SENDFILE = config("MEDIA_SENDFILE", default="")
+MEDIA_ACCEL_REDIRECT_PREFIX = config("MEDIA_ACCEL_REDIRECT_PREFIX", default="/protected-media/")
+# The API hands out local media URLs signed for this many seconds (up to twice as long: the
+# expiry is rounded up so URLs, and the payloads caching them, stay stable within a window)
+MEDIA_URL_SIGNATURE_TTL = config("MEDIA_URL_SIGNATURE_TTL", default=3600, cast=int)
+
+# WebP quality of the cached image variants rendered for local files (api/variants.py)
+IMAGE_VARIANT_QUALITY = config("IMAGE_VARIANT_QUALITY", default=80, cast=int)
+
+# Resumable chunked uploads (/api/memories/<id>/upload-sessions/): partial files live in
+# MEDIA_SPOOL_DIR; sessions idle for UPLOAD_SESSION_TTL_HOURS are removed by
+# `manage.py prune_upload_sessions`
+UPLOAD_SESSION_MAX_SIZE = config("UPLOAD_SESSION_MAX_SIZE", default=2 * 1024 ** 3, cast=int)  # bytes
+UPLOAD_SESSION_TTL_HOURS = config("UPLOAD_SESSION_TTL_HOURS", default=24, cast=int)
+
+# Direct uploads (/api/memories/<id>/direct-uploads/): how long the confirmation token stays
+# valid (Cloudinary itself rejects upload signatures older than an hour)
+DIRECT_UPLOAD_TTL_SECONDS = config("DIRECT_UPLOAD_TTL_SECONDS", default=6 * 3600, cast=int)
+
+# Bulk media endpoint (/api/memories/<id>/media/bulk/): uploads in flight per request, and
+# files per request (Django rejects more than DATA_UPLOAD_MAX_NUMBER_FILES before the view runs)
+BULK_UPLOAD_CONCURRENCY = config("BULK_UPLOAD_CONCURRENCY", default=8, cast=int)
+BULK_UPLOAD_MAX_FILES = config("BULK_UPLOAD_MAX_FILES", default=200, cast=int)
+DATA_UPLOAD_MAX_NUMBER_FILES = BULK_UPLOAD_MAX_FILES
+
+# Bulk memory import (/api/memories/import/, `manage.py import_memories`): rows per insert transaction
+IMPORT_BATCH_SIZE = config("IMPORT_BATCH_SIZE", default=500, cast=int)
+
+# Memory export (/api/memories/export/, `manage.py export_memories`): the only hosts whose
+# stored media URLs are downloaded into the archive (plus MEDIA_URL's host when absolute).
+# URLs are client-supplied, so anything else is listed in export_errors.json instead.
+EXPORT_FETCH_HOSTS = config("EXPORT_FETCH_HOSTS", default="res.cloudinary.com").split(",")
+
+# Bulk tagging (/api/memories/bulk-tag/): memories per request
+BULK_TAG_MAX_MEMORIES = config("BULK_TAG_MAX_MEMORIES", default=500, cast=int)
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {"NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator"},
@@ -88,6 +190,11 @@ USE_TZ = True
 STATIC_URL = "static/"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
+# Local file URLs carry an access signature (api/serving.py)
+STORAGES = {
+    "default": {"BACKEND": "api.serving.SignedFileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 # CORS
@@ -102,8 +209,22 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.IsAuthenticated",
     ),
+    # orjson-backed JSON by default; MessagePack for `Accept: application/msgpack` when installed
+    "DEFAULT_RENDERER_CLASSES": [
+        "api.renderers.ORJSONRenderer",
+        *(["api.renderers.MessagePackRenderer"] if find_spec("msgpack") else []),
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
 }
 
+# Memory timeline pagination (opt-in via ?cursor= / ?page_size= / ?ordering=)
+MEMORIES_PAGE_SIZE = config("MEMORIES_PAGE_SIZE", default=50, cast=int)
+MEMORIES_MAX_PAGE_SIZE = config("MEMORIES_MAX_PAGE_SIZE", default=200, cast=int)
+
+# Memory search (/api/memories/search/?q=&page=&page_size=)
+SEARCH_PAGE_SIZE = config("SEARCH_PAGE_SIZE", default=20, cast=int)
+SEARCH_MAX_PAGE_SIZE = config("SEARCH_MAX_PAGE_SIZE", default=100, cast=int)
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=60),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),
@@ -2,7 +2,8 @@ from django.contrib import admin
 from django.urls import path, include
 from django.http import JsonResponse
 from django.conf import settings
-from django.conf.urls.static import static
+
+from api.views import serve_media
 
 def home(request):
     return JsonResponse({"message": "Welcome to ReLive API 🎉"})
@@ -11,8 +12,6 @@ urlpatterns = [
     path("", home, name="home"),
     path("admin/", admin.site.urls),
     path("api/", include("api.urls")),  # Connects all API routes
+    # User-uploaded media files, access-checked and Range-capable (api/serving.py)
+    path(f"{settings.MEDIA_URL.lstrip('/')}<path:name>", serve_media, name="serve_media"),
 ]
-
-# Serve user-uploaded media files in development
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)